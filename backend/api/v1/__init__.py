@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 
 from .auth import router as auth_router
+from .backtest import router as backtest_router
 from .dashboard import router as dashboard_router
 from .market import router as market_router
 from .notification import router as notification_router
@@ -8,6 +9,7 @@ from .role import router as role_router
 from .selector import router as selector_router
 from .strategy import router as strategy_router
 from .sync import router as sync_router
+from .tuning import router as tuning_router
 from .user import router as user_router
 
 router = APIRouter()
@@ -17,6 +19,8 @@ router.include_router(dashboard_router, prefix="/overview", tags=["总览"])
 router.include_router(market_router, prefix="/watchlist", tags=["自选股票"])
 router.include_router(sync_router, prefix="/sync", tags=["数据同步"])
 router.include_router(strategy_router, prefix="/strategy", tags=["策略"])
+router.include_router(backtest_router, prefix="/backtest", tags=["回测"])
+router.include_router(tuning_router, prefix="/tuning", tags=["参数调优"])
 router.include_router(selector_router, prefix="/selector", tags=["选股器"])
 router.include_router(notification_router, prefix="/notification", tags=["通知管理"])
 router.include_router(user_router, prefix="/users", tags=["用户管理"])
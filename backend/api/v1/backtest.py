@@ -1,13 +1,121 @@
-from fastapi import APIRouter
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from backend.models.strategy import StrategyBacktest
+from backend.schemas.backtest import BacktestJobSchema, BacktestListParams, WalkForwardCreateSchema
+from backend.schemas.base import BaseResponse, PaginatedResponse
+from backend.schemas.strategy import BatchBacktestCreateSchema, BatchBacktestProgressSchema
+from backend.services.backtest import batch_backtest_service
+from backend.services.backtest_queue import backtest_queue
+from backend.services.walk_forward import walk_forward_service
 
 router = APIRouter()
 
 
-@router.get("", summary="获取回测列表")
-async def get_backtests():
-    pass
+@router.get("", response_model=PaginatedResponse[BacktestJobSchema], summary="获取回测列表")
+async def get_backtests(params: BacktestListParams = Depends()):
+    try:
+        query = StrategyBacktest.all()
+        if params.strategy_id:
+            query = query.filter(strategy_id=params.strategy_id)
+        if params.status:
+            query = query.filter(status=params.status)
+
+        total = await query.count()
+        records = await query.offset(params.offset).limit(params.limit).order_by("-created_at")
+        items = [BacktestJobSchema.from_record(r) for r in records]
+        return PaginatedResponse.create(items=items, total=total, page=params.page, page_size=params.page_size)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取回测列表失败: {str(e)}")
+
+
+@router.post("/batch", response_model=BaseResponse[BatchBacktestProgressSchema], summary="提交批量回测")
+async def start_batch_backtest(batch_in: BatchBacktestCreateSchema):
+    try:
+        progress = await batch_backtest_service.start(
+            strategy_id=batch_in.strategy_id,
+            codes=batch_in.codes,
+            param_grid=batch_in.param_grid,
+            start_date=batch_in.start_date,
+            end_date=batch_in.end_date,
+            init_cash=batch_in.initial_capital,
+            name=batch_in.name,
+        )
+        return BaseResponse.success(data=BatchBacktestProgressSchema(**progress), message="批量回测已提交")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"提交批量回测失败: {str(e)}")
+
+
+@router.get("/batch", response_model=BaseResponse[List[BatchBacktestProgressSchema]], summary="获取批量回测列表")
+async def list_batch_backtests():
+    progress = batch_backtest_service.list_progress()
+    return BaseResponse.success(data=[BatchBacktestProgressSchema(**p) for p in progress])
+
+
+@router.get("/batch/{batch_id}", response_model=BaseResponse[BatchBacktestProgressSchema], summary="获取批量回测进度")
+async def get_batch_backtest(batch_id: str):
+    progress = batch_backtest_service.get_progress(batch_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail="批量回测不存在")
+    return BaseResponse.success(data=BatchBacktestProgressSchema(**progress))
+
+
+@router.post("/batch/{batch_id}/cancel", response_model=BaseResponse, summary="取消批量回测")
+async def cancel_batch_backtest(batch_id: str):
+    if not batch_backtest_service.get_progress(batch_id):
+        raise HTTPException(status_code=404, detail="批量回测不存在")
+    if not batch_backtest_service.cancel(batch_id):
+        raise HTTPException(status_code=400, detail="批量回测已结束")
+    return BaseResponse.success(message="批量回测已取消")
+
+
+@router.post("/walk-forward", response_model=BaseResponse[BacktestJobSchema], summary="提交滚动窗口优化")
+async def start_walk_forward(wf_in: WalkForwardCreateSchema):
+    try:
+        record = await walk_forward_service.start(
+            strategy_id=wf_in.strategy_id,
+            template_id=wf_in.template_id,
+            codes=wf_in.codes,
+            start_date=wf_in.start_date,
+            end_date=wf_in.end_date,
+            in_sample_days=wf_in.in_sample_days,
+            out_sample_days=wf_in.out_sample_days,
+            anchored=wf_in.anchored,
+            objective=wf_in.objective,
+            param_grid=wf_in.param_grid,
+            grid_points=wf_in.grid_points,
+            n_jobs=wf_in.n_jobs,
+            init_cash=wf_in.initial_capital,
+            name=wf_in.name,
+        )
+        return BaseResponse.success(data=BacktestJobSchema.from_record(record), message="滚动窗口优化已提交")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"提交滚动窗口优化失败: {str(e)}")
+
+
+@router.get("/{backtest_id}", response_model=BaseResponse[BacktestJobSchema], summary="获取回测详情")
+async def get_backtest(backtest_id: str):
+    try:
+        record = await StrategyBacktest.get_or_none(id=backtest_id)
+        if not record:
+            raise HTTPException(status_code=404, detail="回测记录不存在")
+        position = await backtest_queue.queue_position(record)
+        return BaseResponse.success(data=BacktestJobSchema.from_record(record, position))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取回测详情失败: {str(e)}")
 
 
-@router.get("/run", summary="回测执行")
-def run_backtest():
-    pass
+@router.post("/{backtest_id}/cancel", response_model=BaseResponse, summary="取消回测")
+async def cancel_backtest(backtest_id: str):
+    if walk_forward_service.cancel(backtest_id):
+        return BaseResponse.success(message="滚动窗口优化已取消")
+    if not await backtest_queue.cancel(backtest_id):
+        raise HTTPException(status_code=400, detail="回测任务不存在或已结束")
+    return BaseResponse.success(message="回测已取消")
@@ -1,9 +1,9 @@
 from fastapi import APIRouter
 
-from backend.core.provider import get_price_quotes
 from backend.schemas.base import BaseResponse
 from backend.schemas.dashboard import OverView
 from backend.services.market import watchlist_stock_service
+from backend.services.quote import quote_service
 
 router = APIRouter()
 
@@ -18,7 +18,7 @@ async def get_overview():
     _, watchlist_items = await watchlist_stock_service.get_list(page=1, page_size=100)
     holdings = [(item.stock_code, item.holding_num) for item in watchlist_items]
 
-    quotes = get_price_quotes(holdings)
+    quotes = await quote_service.get_quotes(holdings)
 
     # 计算最新总持仓市值
     total_market_value = sum(q.market_value for q in quotes)
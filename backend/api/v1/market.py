@@ -1,16 +1,18 @@
 """自选行情，关注自选股票的实时/历史行情展示"""
 
-from datetime import date
+import json
+from datetime import date, datetime
 from typing import List, Literal
 
 from aiocache import Cache, cached
 from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 
-from backend.core.provider import get_price_quotes
 from backend.models.stock import Stock
 from backend.schemas.base import BaseResponse, OptionItem, PaginatedResponse
 from backend.schemas.market import (
     DateBar,
+    MinuteBar,
     StockQuote,
     WatchlistStockCreate,
     WatchlistStockReorder,
@@ -19,6 +21,9 @@ from backend.schemas.market import (
 )
 from backend.services.daily import daily_line_service
 from backend.services.market import watchlist_stock_service
+from backend.services.minute import minute_line_service
+from backend.services.quote import quote_service
+from backend.services.quote_stream import quote_stream_hub
 
 router = APIRouter()
 
@@ -74,11 +79,46 @@ async def get_realtime_stock_data(
     # 2. 预加载关联的 stock 信息，收集股票代码
     holding_stocks = [(item.stock_code, item.holding_num) for item in items]
 
-    stock_quotes = get_price_quotes(holding_stocks, force_refresh)
+    stock_quotes = await quote_service.get_quotes(holding_stocks, force_refresh)
 
     return BaseResponse[list[StockQuote]].success(data=stock_quotes)
 
 
+@router.get("/stream", summary="订阅自选股票实时行情推送")
+async def stream_realtime_stock_data(
+    codes: str | None = Query(None, description="股票代码，逗号分隔，为空时为全部自选股票"),
+):
+    """
+    以 Server-Sent Events 推送实时行情
+
+    - 首条消息为全量行情（event: snapshot），之后只推送变化的快照（event: tick）和分钟线增量（event: bars）
+    - 所有连接共用一个后台轮询，不会因连接数增加而增加上游请求
+    """
+    _, items = await watchlist_stock_service.get_list(page=1, page_size=100)
+    holdings = {item.stock_code: item.holding_num for item in items}
+    if codes:
+        holdings = {code.strip(): holdings.get(code.strip(), 0) for code in codes.split(",") if code.strip()}
+    if not holdings:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="没有可订阅的股票")
+
+    async def _events():
+        subscription = await quote_stream_hub.subscribe(holdings)
+        try:
+            async for message in quote_stream_hub.events(subscription):
+                if message["type"] == "ping":
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: {message['type']}\ndata: {json.dumps(message, ensure_ascii=False)}\n\n"
+        finally:
+            quote_stream_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get(
     "/{id}",
     response_model=BaseResponse[WatchlistStockResponse],
@@ -180,7 +220,7 @@ async def get_history_quotes(
     获取股票历史行情数据
 
     - **period**: daily(日线) / weekly(周线) / monthly(月线)
-    - 周线/月线会从日线数据聚合计算
+    - 周线/月线读取 TimescaleDB 连续聚合，不可用时由日线聚合计算
     """
     # 1. 获取自选股票信息，拿到 stock_code
     watchlist = await watchlist_stock_service.get(id)
@@ -191,77 +231,33 @@ async def get_history_quotes(
     await watchlist.fetch_related("stock")
     stock_code = watchlist.stock.full_stock_code
 
-    # 2. 获取日线数据（周/月线需要更多数据来聚合）
-    fetch_limit = limit if period == "daily" else limit * 31
-    daily_data = await daily_line_service.get_history(
+    # 2. 日线直接读取，周线/月线优先读取连续聚合
+    data = await daily_line_service.get_kline(
         stock_code=stock_code,
+        period=period,
         start_date=start_date,
         end_date=end_date,
-        limit=fetch_limit,
+        limit=limit,
     )
+    return BaseResponse[List[DateBar]].success(data=data)
 
-    if not daily_data:
-        return BaseResponse.success(data=[])
-
-    # 3. 根据 period 处理
-    if period == "daily":
-        # 将日线数据转换为 DateBar 对象
-        date_bars = [
-            DateBar(
-                stock_code=d.stock_code,
-                trade_date=d.trade_date,
-                open=d.open,
-                high=d.high,
-                low=d.low,
-                close=d.close,
-                volume=d.volume,
-                turnover=d.turnover,
-            )
-            for d in daily_data
-        ]
-        return BaseResponse[List[DateBar]].success(data=date_bars)
-
-    return BaseResponse[List[DateBar]].success(
-        data=_aggregate_kline(stock_code, daily_data, period, limit)
-    )
 
+@router.get(
+    "/{id}/minutes",
+    response_model=BaseResponse[list[MinuteBar]],
+    summary="获取单只股票已归档的分钟线",
+)
+async def get_minute_lines(
+    id: int,
+    start: datetime = Query(..., description="开始时间"),
+    end: datetime | None = Query(None, description="结束时间，为空时不限"),
+    limit: int = Query(2410, ge=1, le=50000, description="返回数量"),
+):
+    """读取收盘后归档到本地的 1 分钟线（见 services/minute.py），不请求上游"""
+    watchlist = await watchlist_stock_service.get(id)
+    if not watchlist:
+        raise HTTPException(status_code=404, detail="自选股票不存在")
 
-def _aggregate_kline(
-    stock_code: str,
-    daily_data: list,
-    period: Literal["weekly", "monthly"],
-    limit: int,
-) -> list[DateBar]:
-    """将日线聚合为周线/月线"""
-    from collections import defaultdict
-    from decimal import Decimal
-
-    groups = defaultdict(list)
-
-    for item in daily_data:
-        td = item.trade_date
-        if period == "weekly":
-            # 按周分组 (ISO 周)
-            key = td.isocalendar()[:2]  # (year, week)
-        else:
-            # 按月分组
-            key = (td.year, td.month)
-        groups[key].append(item)
-
-    result = []
-    for key in sorted(groups.keys(), reverse=True)[:limit]:
-        items = sorted(groups[key], key=lambda x: x.trade_date)
-        result.append(
-            DateBar(
-                stock_code=stock_code,
-                trade_date=items[-1].trade_date,
-                open=items[0].open,
-                close=items[-1].close,
-                high=max(i.high for i in items),
-                low=min(i.low for i in items),
-                volume=sum(i.volume for i in items),
-                turnover=sum(i.turnover or Decimal(0) for i in items),
-            )
-        )
-
-    return result[::-1]
+    await watchlist.fetch_related("stock")
+    bars = await minute_line_service.get_range(watchlist.stock.full_stock_code, start, end, limit)
+    return BaseResponse[list[MinuteBar]].success(data=bars)
@@ -10,9 +10,14 @@ from backend.models.stock import Stock
 from backend.schemas.base import BaseResponse, PaginatedResponse
 from backend.schemas.selector import (
     SelectorCreateSchema,
+    SelectorExplainSchema,
     SelectorFieldSchema,
     SelectorListItemSchema,
     SelectorListParams,
+    SelectorPreviewResultSchema,
+    SelectorPreviewSchema,
+    SelectorReplayResultSchema,
+    SelectorReplaySchema,
     SelectorResultSchema,
     SelectorSchema,
     SelectorUpdateSchema,
@@ -182,6 +187,26 @@ async def delete_selector(selector_id: int):
         raise HTTPException(status_code=500, detail=f"删除选股器失败: {str(e)}")
 
 
+@router.post("/execute-all", response_model=BaseResponse[List[dict]], summary="批量执行全部启用的选股器")
+async def execute_all_selectors(trade_date: date | None = None):
+    try:
+        results = await selector_engine.execute_all(trade_date)
+        return BaseResponse.success(data=results, message=f"已执行 {len(results)} 个选股器")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"批量执行选股失败: {str(e)}")
+
+
+@router.post("/preview", response_model=BaseResponse[SelectorPreviewResultSchema], summary="试算选股条件")
+async def preview_selector(preview_in: SelectorPreviewSchema):
+    try:
+        result = await selector_engine.preview(preview_in.rule.model_dump(), preview_in.trade_date)
+        return BaseResponse.success(data=SelectorPreviewResultSchema(**result))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"试算选股失败: {str(e)}")
+
+
 @router.post("/{selector_id}/execute", response_model=BaseResponse[dict], summary="执行选股")
 async def execute_selector(selector_id: int, trade_date: date | None = None):
     try:
@@ -197,6 +222,52 @@ async def execute_selector(selector_id: int, trade_date: date | None = None):
         raise HTTPException(status_code=500, detail=f"执行选股失败: {str(e)}")
 
 
+@router.post(
+    "/{selector_id}/replay",
+    response_model=BaseResponse[SelectorReplayResultSchema],
+    summary="选股历史回放",
+)
+async def replay_selector(selector_id: int, replay_in: SelectorReplaySchema):
+    try:
+        selector = await Selector.get_or_none(id=selector_id)
+        if not selector:
+            raise HTTPException(status_code=404, detail="选股器不存在")
+        if replay_in.start_date > replay_in.end_date:
+            raise HTTPException(status_code=400, detail="开始日期不能晚于截止日期")
+
+        result = await selector_engine.replay(selector, replay_in.start_date, replay_in.end_date, replay_in.horizons)
+        return BaseResponse.success(data=SelectorReplayResultSchema(**result))
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"选股回放失败: {str(e)}")
+
+
+@router.get(
+    "/{selector_id}/explain",
+    response_model=BaseResponse[SelectorExplainSchema],
+    summary="查看选股执行计划",
+)
+async def explain_selector(
+    selector_id: int,
+    trade_date: date | None = None,
+    analyze: bool = Query(False, description="是否实际执行并返回耗时（EXPLAIN ANALYZE）"),
+):
+    try:
+        selector = await Selector.get_or_none(id=selector_id)
+        if not selector:
+            raise HTTPException(status_code=404, detail="选股器不存在")
+
+        result = await selector_engine.explain(selector, trade_date, analyze=analyze)
+        return BaseResponse.success(data=SelectorExplainSchema(**result))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取执行计划失败: {str(e)}")
+
+
 @router.get(
     "/{selector_id}/results",
     response_model=PaginatedResponse[SelectorResultSchema],
@@ -2,6 +2,7 @@
 
 from fastapi import APIRouter, Depends, HTTPException
 
+from backend.schemas.backtest import BacktestJobSchema
 from backend.schemas.base import BaseResponse, PaginatedResponse
 from backend.schemas.strategy import (
     StrategyBacktestCreateSchema,
@@ -14,6 +15,7 @@ from backend.schemas.strategy import (
     StrategyTagSchema,
     StrategyUpdateSchema,
 )
+from backend.services.backtest_queue import backtest_queue
 from backend.services.strategy import strategy_service, strategy_tag_service
 from backend.strategy_templates import (
     CodeValidateRequest,
@@ -173,17 +175,33 @@ async def delete_strategy(strategy_id: str):
         return BaseResponse.error(message=f"删除策略失败: {str(e)}")
 
 
-@router.post("/{strategy_id}/backtest", response_model=BaseResponse[str], summary="启动策略回测")
+@router.post("/{strategy_id}/backtest", response_model=BaseResponse[BacktestJobSchema], summary="启动策略回测")
 async def start_backtest(strategy_id: str, backtest_in: StrategyBacktestCreateSchema):
-    """启动策略回测"""
+    """提交回测任务，由回测工作进程异步执行，通过 /backtest/{id} 查询进度与结果"""
     try:
         strategy = await strategy_service.get(strategy_id)
         if not strategy:
             raise HTTPException(status_code=404, detail="策略不存在")
-
-        return BaseResponse.success(data=f"策略 {strategy.name} 回测已启动", message="回测启动成功")
+        if backtest_in.start_date >= backtest_in.end_date:
+            raise HTTPException(status_code=400, detail="回测开始日期必须早于结束日期")
+
+        record = await backtest_queue.enqueue(
+            strategy=strategy,
+            name=backtest_in.name,
+            codes=backtest_in.codes,
+            start_date=backtest_in.start_date,
+            end_date=backtest_in.end_date,
+            init_cash=float(backtest_in.initial_capital),
+            params=backtest_in.params,
+        )
+        position = await backtest_queue.queue_position(record)
+        return BaseResponse.success(data=BacktestJobSchema.from_record(record, position), message="回测已提交")
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"启动回测失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"启动回测失败: {str(e)}")
 
 
 @router.get(
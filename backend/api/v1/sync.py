@@ -1,15 +1,28 @@
-from datetime import datetime
+from datetime import date, datetime
 
-from fastapi import APIRouter, BackgroundTasks, Query
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query
+from fastapi.responses import FileResponse
 
+from backend.enums.sync import SyncType
 from backend.schemas import (
     BaseResponse,
+    MinuteArchiveRequest,
     PaginatedData,
+    ProviderHealthItem,
+    ParquetExportRequest,
+    ParquetImportRequest,
+    ParquetPartitionItem,
     SyncLogItem,
     SyncSummaryResponse,
     TriggerRequest,
     SchedulerUpdateRequest,
 )
+from backend.schemas.market import MinuteBar
+from backend.core.config import Settings
+from backend.core.source_router import source_router
+from backend.services.backfill import backfill_service
+from backend.services.minute import minute_line_service
+from backend.services.parquet_io import get_dataset, parquet_service, partition_path
 from backend.services.sync import sync_service
 from backend.utils import get_previous_trading_day
 
@@ -46,7 +59,12 @@ async def trigger_sync_task(body: TriggerRequest, background_tasks: BackgroundTa
         end_date = datetime.strptime(body.data_range[1], "%Y-%m-%d")
 
     try:
-        background_tasks.add_task(sync_service.sync_stock_daily_line, start_date=start_date, end_date=end_date)
+        if body.type == SyncType.BACKFILL:
+            if await backfill_service.is_running():
+                return BaseResponse.error(message="已有补数任务在运行中")
+            background_tasks.add_task(backfill_service.run, start_date=start_date, end_date=end_date)
+        else:
+            background_tasks.add_task(sync_service.sync_stock_daily_line, start_date=start_date, end_date=end_date)
 
         return BaseResponse.success(message="任务已提交到后台队列")
 
@@ -61,3 +79,85 @@ async def update_scheduler_config(body: SchedulerUpdateRequest):
         return BaseResponse.success(message="调度配置已更新")
     except Exception as e:
         return BaseResponse.error(message=str(e))
+
+
+@router.post("/export", response_model=BaseResponse, summary="导出 Parquet")
+async def export_parquet(body: ParquetExportRequest, background_tasks: BackgroundTasks):
+    try:
+        get_dataset(body.dataset)
+        background_tasks.add_task(
+            parquet_service.export,
+            body.dataset,
+            body.start_date,
+            body.end_date,
+            overwrite=body.overwrite,
+        )
+        return BaseResponse.success(message="导出任务已提交到后台队列")
+    except Exception as e:
+        return BaseResponse.error(message=str(e))
+
+
+@router.post("/import", response_model=BaseResponse, summary="从 Parquet 导入")
+async def import_parquet(body: ParquetImportRequest, background_tasks: BackgroundTasks):
+    try:
+        get_dataset(body.dataset)
+        # 只从 PARQUET_DIR 导入，其他目录只能通过命令行（python -m backend.services.parquet_io import --root）
+        background_tasks.add_task(
+            parquet_service.import_, body.dataset, None, body.start_date, body.end_date, body.codes
+        )
+        return BaseResponse.success(message="导入任务已提交到后台队列")
+    except Exception as e:
+        return BaseResponse.error(message=str(e))
+
+
+@router.get("/providers", response_model=BaseResponse[list[ProviderHealthItem]], summary="获取行情数据源健康状况")
+async def get_provider_health():
+    return BaseResponse.success(data=[vars(health) for health in source_router.health()])
+
+
+@router.post("/minute-archive", response_model=BaseResponse, summary="归档分钟线")
+async def archive_minute_lines(body: MinuteArchiveRequest, background_tasks: BackgroundTasks):
+    """归档指定交易日的 1 分钟线，上游只保留最近一个交易日左右，错过收盘后的定时归档时用于补归档"""
+    background_tasks.add_task(minute_line_service.archive, body.trade_date, body.codes)
+    return BaseResponse.success(message="分钟线归档任务已提交到后台队列")
+
+
+@router.get(
+    "/minute-archive/{stock_code}",
+    response_model=BaseResponse[list[MinuteBar]],
+    summary="按股票代码获取已归档的分钟线",
+)
+async def get_archived_minute_lines(
+    stock_code: str,
+    start: datetime = Query(..., description="开始时间（北京时间）"),
+    end: datetime | None = Query(None, description="结束时间（北京时间），为空时不限"),
+    limit: int = Query(2410, ge=1, le=50000, description="返回数量"),
+):
+    """读取已归档的 1 分钟线，选股结果中不在自选股里的股票同样可查"""
+    bars = await minute_line_service.get_range(stock_code, start, end, limit)
+    return BaseResponse[list[MinuteBar]].success(data=bars)
+
+
+@router.get(
+    "/export/{dataset}/partitions",
+    response_model=BaseResponse[list[ParquetPartitionItem]],
+    summary="获取已导出的分区",
+)
+async def get_parquet_partitions(dataset: str):
+    try:
+        return BaseResponse.success(data=parquet_service.list_partitions(dataset))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/export/{dataset}/{year}/{month}", summary="下载 Parquet 分区文件")
+async def download_parquet_partition(dataset: str, year: int, month: int):
+    try:
+        get_dataset(dataset)
+        path = partition_path(Settings.PARQUET_DIR, dataset, date(year, month, 1))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="分区未导出")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{dataset}-{year}-{month:02d}.parquet")
+
@@ -1,15 +1,96 @@
 """参数调优，基于 Optuna 的策略参数自动优化"""
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException
+
+from backend.models.strategy import StrategyTuning
+from backend.schemas.base import BaseResponse, PaginatedResponse
+from backend.schemas.tuning import TuningCreateSchema, TuningListParams, TuningSchema
+from backend.services.tuning import tuning_service
 
 router = APIRouter()
 
 
-@router.get("", summary="获取调优记录")
-async def get_tuning_record():
-    pass
+def _to_schema(record: StrategyTuning) -> TuningSchema:
+    return TuningSchema(
+        id=str(record.id),
+        strategy_id=str(record.strategy_id) if record.strategy_id else None,
+        name=record.name,
+        template_id=record.template_id,
+        study_name=record.study_name,
+        stock_codes=record.stock_codes,
+        start_date=record.start_date,
+        end_date=record.end_date,
+        initial_capital=float(record.initial_capital),
+        objective=record.objective,
+        n_trials=record.n_trials,
+        n_jobs=record.n_jobs,
+        status=record.status,
+        best_params=record.best_params,
+        best_value=record.best_value,
+        best_trials=record.best_trials,
+        completed_trials=record.completed_trials,
+        pruned_trials=record.pruned_trials,
+        failed_trials=record.failed_trials,
+        error_message=record.error_message,
+        created_at=record.created_at,
+        completed_at=record.completed_at,
+    )
+
+
+@router.get("", response_model=PaginatedResponse[TuningSchema], summary="获取调优记录")
+async def get_tuning_record(params: TuningListParams = Depends()):
+    try:
+        query = StrategyTuning.all()
+        if params.template_id:
+            query = query.filter(template_id=params.template_id)
+        if params.status:
+            query = query.filter(status=params.status)
+
+        total = await query.count()
+        records = await query.offset(params.offset).limit(params.limit).order_by("-created_at")
+        items = [_to_schema(r) for r in records]
+        return PaginatedResponse.create(items=items, total=total, page=params.page, page_size=params.page_size)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取调优记录失败: {str(e)}")
+
+
+@router.post("", response_model=BaseResponse[TuningSchema], summary="添加调优训练")
+async def add_tuning_training(tuning_in: TuningCreateSchema):
+    try:
+        record = await tuning_service.start(
+            template_id=tuning_in.template_id,
+            codes=tuning_in.codes,
+            start_date=tuning_in.start_date,
+            end_date=tuning_in.end_date,
+            n_trials=tuning_in.n_trials,
+            n_jobs=tuning_in.n_jobs,
+            objective=tuning_in.objective,
+            init_cash=tuning_in.initial_capital,
+            name=tuning_in.name,
+            strategy_id=tuning_in.strategy_id,
+        )
+        return BaseResponse.success(data=_to_schema(record), message="调优任务已提交")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"提交调优任务失败: {str(e)}")
+
+
+@router.get("/{tuning_id}", response_model=BaseResponse[TuningSchema], summary="获取调优详情")
+async def get_tuning_detail(tuning_id: str):
+    try:
+        record = await tuning_service.get_detail(tuning_id)
+        if not record:
+            raise HTTPException(status_code=404, detail="调优记录不存在")
+        return BaseResponse.success(data=_to_schema(record))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取调优详情失败: {str(e)}")
 
 
-@router.post("", summary="添加调优训练")
-async def add_tuning_training():
-    pass
+@router.post("/{tuning_id}/cancel", response_model=BaseResponse, summary="取消调优")
+async def cancel_tuning(tuning_id: str):
+    if not await tuning_service.cancel(tuning_id):
+        raise HTTPException(status_code=400, detail="调优任务不存在或已结束")
+    return BaseResponse.success(message="调优任务正在停止，当前试验完成后结束")
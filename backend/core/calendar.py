@@ -0,0 +1,124 @@
+"""交易日历
+
+由 Holiday 表一次性加载为升序的交易日列表（排除周末和节假日），常驻内存：
+- 日期 → 序号用字典，O(1)；前后交易日、偏移、区间计数用二分查找，O(log n)
+- 节假日同步后调用 load 重新加载；首次使用时自动加载
+"""
+
+import asyncio
+import bisect
+from datetime import date, datetime, timedelta
+
+from backend.core.logger import logger
+from backend.models import Holiday
+
+# 日历起始日（上交所开业）
+CALENDAR_START = date(1990, 12, 19)
+
+
+def _to_date(day: date | datetime) -> date:
+    return day.date() if isinstance(day, datetime) else day
+
+
+class TradingCalendar:
+    """交易日历，日期参数均可传入 date 或 datetime（取日期部分）"""
+
+    def __init__(self):
+        self._days: list[date] = []
+        self._index: dict[date, int] = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    @property
+    def days(self) -> list[date]:
+        """全部交易日（升序），调用方不应修改"""
+        return self._days
+
+    async def load(self) -> None:
+        """从 Holiday 表重新加载，覆盖到明年年底（尚未公布节假日的年份只排除周末）"""
+        async with self._lock:
+            end = date(date.today().year + 1, 12, 31)
+            holidays = set(await Holiday.filter(date__lte=end).values_list("date", flat=True))
+
+            days = []
+            current = CALENDAR_START
+            while current <= end:
+                if current.weekday() < 5 and current not in holidays:
+                    days.append(current)
+                current += timedelta(days=1)
+
+            self._days = days
+            self._index = {d: i for i, d in enumerate(days)}
+            self._loaded = True
+        logger.info(f"交易日历已加载: {days[0]} ~ {days[-1]}, 共 {len(days)} 个交易日")
+
+    async def ensure_loaded(self) -> "TradingCalendar":
+        if not self._loaded:
+            await self.load()
+        return self
+
+    # ------------------------------------------------------------------
+    #                               查询
+    # ------------------------------------------------------------------
+
+    def is_trading_day(self, day: date | datetime) -> bool:
+        return _to_date(day) in self._index
+
+    def index(self, day: date | datetime) -> int | None:
+        """交易日的序号，非交易日为 None"""
+        return self._index.get(_to_date(day))
+
+    def day(self, index: int) -> date:
+        """序号对应的交易日"""
+        if not 0 <= index < len(self._days):
+            raise ValueError(f"交易日序号超出日历范围: {index}")
+        return self._days[index]
+
+    def next_trading_day(self, day: date | datetime) -> date:
+        """严格晚于 day 的第一个交易日"""
+        return self.day(bisect.bisect_right(self._days, _to_date(day)))
+
+    def prev_trading_day(self, day: date | datetime) -> date:
+        """严格早于 day 的最后一个交易日"""
+        return self.day(bisect.bisect_left(self._days, _to_date(day)) - 1)
+
+    def offset(self, day: date | datetime, n: int) -> date:
+        """
+        相对 day 第 n 个交易日
+
+        day 为交易日时即向后（n > 0）或向前（n < 0）数 n 个交易日；
+        day 不是交易日时，n > 0 从其后的第一个交易日起算 1，n < 0 从其前的最后一个交易日起算 -1，
+        n = 0 返回不晚于 day 的最后一个交易日。
+        """
+        day = _to_date(day)
+        if n < 0:
+            return self.day(bisect.bisect_left(self._days, day) + n)
+        return self.day(bisect.bisect_right(self._days, day) - 1 + n)
+
+    def count(self, start: date | datetime, end: date | datetime) -> int:
+        """[start, end] 内的交易日数"""
+        start, end = _to_date(start), _to_date(end)
+        if start > end:
+            return 0
+        return bisect.bisect_right(self._days, end) - bisect.bisect_left(self._days, start)
+
+    def trading_days(self, start: date | datetime, end: date | datetime) -> list[date]:
+        """[start, end] 内的交易日（升序）"""
+        start, end = _to_date(start), _to_date(end)
+        return self._days[bisect.bisect_left(self._days, start) : bisect.bisect_right(self._days, end)]
+
+    def has_trading_day_between(self, low: date | datetime, high: date | datetime) -> bool:
+        """是否存在 low < d < high 的交易日"""
+        return bisect.bisect_left(self._days, _to_date(high)) > bisect.bisect_right(self._days, _to_date(low))
+
+
+trading_calendar = TradingCalendar()
+
+
+async def get_trading_calendar() -> TradingCalendar:
+    """获取已加载的交易日历"""
+    return await trading_calendar.ensure_loaded()
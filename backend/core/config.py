@@ -20,6 +20,61 @@ class Settings:
     INIT_CACHE = float(os.environ.get("COMMISSION") or 10000.00)
     COMMISSION = os.environ.get("COMMISSION") or 0.0005
 
+    # 行情数据源：最大并发请求数、各数据源每秒请求数上限
+    PROVIDER_CONCURRENCY = int(os.environ.get("PROVIDER_CONCURRENCY") or 32)
+    PROVIDER_TX_RATE = float(os.environ.get("PROVIDER_TX_RATE") or 50)
+    PROVIDER_SINA_RATE = float(os.environ.get("PROVIDER_SINA_RATE") or 10)
+    # 数据源路由（见 core/source_router.py）：是否对冲请求、样本不足时的对冲延迟（秒），
+    # 连续失败多少次熔断、熔断冷却时间（秒）
+    PROVIDER_HEDGE = (os.environ.get("PROVIDER_HEDGE") or "true").lower() == "true"
+    PROVIDER_HEDGE_DELAY = float(os.environ.get("PROVIDER_HEDGE_DELAY") or 1)
+    PROVIDER_BREAKER_FAILURES = int(os.environ.get("PROVIDER_BREAKER_FAILURES") or 5)
+    PROVIDER_BREAKER_COOLDOWN = float(os.environ.get("PROVIDER_BREAKER_COOLDOWN") or 30)
+    # 行情推送：交易时段内的轮询间隔（秒），非交易时段按 QUOTE_STREAM_IDLE_INTERVAL 轮询
+    QUOTE_STREAM_INTERVAL = float(os.environ.get("QUOTE_STREAM_INTERVAL") or 3)
+    QUOTE_STREAM_IDLE_INTERVAL = float(os.environ.get("QUOTE_STREAM_IDLE_INTERVAL") or 60)
+
+    # 历史补数：每个分片的股票数、交易日数，以及并行执行的分片数
+    BACKFILL_SHARD_STOCKS = int(os.environ.get("BACKFILL_SHARD_STOCKS") or 200)
+    BACKFILL_SHARD_DAYS = int(os.environ.get("BACKFILL_SHARD_DAYS") or 250)
+    BACKFILL_PARALLEL = int(os.environ.get("BACKFILL_PARALLEL") or 4)
+
+    # 选股内存面板：是否启用、常驻的交易日数
+    SELECTOR_PANEL_ENABLED = (os.environ.get("SELECTOR_PANEL_ENABLED") or "false").lower() == "true"
+    SELECTOR_PANEL_DAYS = int(os.environ.get("SELECTOR_PANEL_DAYS") or 60)
+
+    # 选股结果缓存条数（LRU）
+    SELECTOR_CACHE_SIZE = int(os.environ.get("SELECTOR_CACHE_SIZE") or 256)
+
+    # 日线同步完成后是否批量执行全部启用的选股器
+    SELECTOR_BATCH_AFTER_SYNC = (os.environ.get("SELECTOR_BATCH_AFTER_SYNC") or "true").lower() == "true"
+
+    # 本地列式行情库：启用后回测、行情接口从内存映射文件读取日线，同步完成后追加
+    MARKET_STORE_ENABLED = (os.environ.get("MARKET_STORE_ENABLED") or "false").lower() == "true"
+    MARKET_STORE_DIR = os.environ.get("MARKET_STORE_DIR") or "data/market_store"
+
+    # TimescaleDB：是否将日线、分钟线表迁移为超表并使用周线/月线连续聚合，日线、分钟线分块压缩的时间（天）
+    TIMESCALE_ENABLED = (os.environ.get("TIMESCALE_ENABLED") or "true").lower() == "true"
+    TIMESCALE_COMPRESS_AFTER_DAYS = int(os.environ.get("TIMESCALE_COMPRESS_AFTER_DAYS") or 365)
+    TIMESCALE_MINUTE_COMPRESS_AFTER_DAYS = int(os.environ.get("TIMESCALE_MINUTE_COMPRESS_AFTER_DAYS") or 7)
+
+    # 分钟线归档：是否在收盘后归档自选股与选股结果的当日 1 分钟线，归档时间（HH:MM）
+    MINUTE_ARCHIVE_ENABLED = (os.environ.get("MINUTE_ARCHIVE_ENABLED") or "true").lower() == "true"
+    MINUTE_ARCHIVE_TIME = os.environ.get("MINUTE_ARCHIVE_TIME") or "15:30"
+
+    # Parquet 导出目录（见 services/parquet_io.py）
+    PARQUET_DIR = os.environ.get("PARQUET_DIR") or "data/parquet"
+
+    # 批量回测进程数，0 表示与 CPU 核数相同
+    BACKTEST_WORKERS = int(os.environ.get("BACKTEST_WORKERS") or 0)
+
+    # 回测任务队列工作进程数，0 表示不在服务内启动（可用 python -m backend.services.backtest_queue 单独运行）
+    BACKTEST_QUEUE_WORKERS = int(os.environ.get("BACKTEST_QUEUE_WORKERS") or 2)
+
+    # 参数调优：Optuna 存储（SQLite 或 PostgreSQL 连接串）、默认并行进程数（0 表示与 CPU 核数相同）
+    TUNING_STORAGE = os.environ.get("TUNING_STORAGE") or "sqlite:///optuna.db"
+    TUNING_WORKERS = int(os.environ.get("TUNING_WORKERS") or 0)
+
     # 通知机器人配置（可选，数据库配置优先）
     DINGTALK_WEBHOOK = os.environ.get("DINGTALK_WEBHOOK")
     DINGTALK_SECRET = os.environ.get("DINGTALK_SECRET")
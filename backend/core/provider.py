@@ -1,11 +1,18 @@
+import asyncio
+import functools
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
 from datetime import date, datetime
-from typing import List, Literal
+from typing import AsyncIterator, Iterable, List, Literal
 
+import httpx
 import requests
-from cachetools import TTLCache, cached
 
+from backend.core.config import Settings
 from backend.core.logger import logger
-from backend.schemas.market import DateBar, MinuteBar, StockQuote
+from backend.core.source_router import source_router
+from backend.schemas.market import DateBar, MinuteBar
 from backend.utils import format_code
 
 # 全局 Session，复用 TCP 连接，统一 Header
@@ -21,8 +28,97 @@ SESSION.headers.update(
     }
 )
 
-# 创建全局缓存对象
-_today_minutes_cache = TTLCache(maxsize=256, ttl=60)
+# 腾讯批量行情接口每个请求的代码数
+QUOTE_BATCH_SIZE = 60
+
+# 计入数据源失败率的异常：网络错误、HTTP 错误状态；解析失败（如股票没有数据）只切换数据源
+_SOURCE_ERRORS = (httpx.TransportError, httpx.HTTPStatusError, requests.RequestException)
+
+
+class TokenBucket:
+    """
+    令牌桶限流器（协程安全）
+
+    - rate: 每秒补充的令牌数，即稳态下的最大请求速率
+    - capacity: 桶容量，允许的瞬时突发请求数
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        # asyncio.Lock 绑定首次使用时的事件循环，按事件循环懒加载（如测试、脚本中多次 asyncio.run）
+        self._lock: asyncio.Lock | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._lock
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        """获取一个令牌，令牌不足时等待"""
+        async with self._get_lock():
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# 每个数据源独立限流，避免触发上游风控
+_RATE_LIMITERS = {
+    "tencent": TokenBucket(Settings.PROVIDER_TX_RATE),
+    "sina": TokenBucket(Settings.PROVIDER_SINA_RATE),
+}
+
+# 当前请求是否已由 source_router 预先获取了令牌（见 _acquire_token），_arequest_json 不再重复获取
+_token_held: ContextVar[bool] = ContextVar("token_held", default=False)
+
+
+async def _acquire_token(source: str) -> None:
+    """经 source_router 路由的请求先获取令牌，排队等待不计入该数据源的耗时统计"""
+    await _RATE_LIMITERS[source].acquire()
+    _token_held.set(True)
+
+
+# 全局异步 Client，连接池复用，懒加载（需要在事件循环中创建）；连接池绑定创建时的事件循环，换了事件循环时重新创建
+_async_client: httpx.AsyncClient | None = None
+_async_client_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client.is_closed or _async_client_loop is not loop:
+        _async_client_loop = loop
+        _async_client = httpx.AsyncClient(
+            headers=dict(SESSION.headers),
+            timeout=10,
+            limits=httpx.Limits(
+                max_connections=Settings.PROVIDER_CONCURRENCY,
+                max_keepalive_connections=Settings.PROVIDER_CONCURRENCY,
+            ),
+        )
+    return _async_client
+
+
+async def close_async_client() -> None:
+    """关闭全局异步 Client（应用关闭时调用）"""
+    global _async_client, _async_client_loop
+    if _async_client is not None and not _async_client.is_closed and _async_client_loop is asyncio.get_running_loop():
+        await _async_client.aclose()
+    _async_client = None
+    _async_client_loop = None
 
 
 def _normalize_end_date(end_date: str | date | datetime | None) -> str:
@@ -66,10 +162,23 @@ def _request_json(url: str) -> dict:
     return resp.json()
 
 
-def _fetch_tx_daily(code: str, end_date: str, count: int, unit: str) -> list[list]:
-    """拉取日/周/月线原始数据，返回 [[date, open, close, high, low, vol], ...]"""
-    url = f"http://web.ifzq.gtimg.cn/appstock/app/fqkline/get" f"?param={code},{unit},,{end_date},{count},qfq"
-    data = _request_json(url)["data"][code]
+async def _arequest_json(url: str, source: str) -> dict:
+    """异步发送 GET 请求（按数据源限流），返回解析后的 JSON，失败则抛出异常。"""
+    if _token_held.get():
+        _token_held.set(False)
+    else:
+        await _RATE_LIMITERS[source].acquire()
+    resp = await _get_async_client().get(url)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def _tx_daily_url(code: str, end_date: str, count: int, unit: str) -> str:
+    return f"http://web.ifzq.gtimg.cn/appstock/app/fqkline/get" f"?param={code},{unit},,{end_date},{count},qfq"
+
+
+def _parse_tx_daily(payload: dict, code: str, unit: str) -> list[list]:
+    data = payload["data"][code]
 
     # 优先取前复权，无则取不复权
     rows = data.get(f"qfq{unit}") or data.get(unit, [])
@@ -77,11 +186,14 @@ def _fetch_tx_daily(code: str, end_date: str, count: int, unit: str) -> list[lis
     return [row[:6] for row in rows]
 
 
-def _fetch_tx_minute(code: str, end_date: str, count: int, frequency: str) -> list[list]:
-    """拉取分钟线原始数据，返回 [[datetime, open, close, high, low, vol], ...]"""
+def _tx_minute_url(code: str, count: int, frequency: str) -> str:
+    ts = int(frequency.rstrip("m"))
+    return f"http://ifzq.gtimg.cn/appstock/app/kline/mkline" f"?param={code},m{ts},,{count}"
+
+
+def _parse_tx_minute(payload: dict, code: str, frequency: str) -> list[list]:
     ts = int(frequency.rstrip("m"))
-    url = f"http://ifzq.gtimg.cn/appstock/app/kline/mkline" f"?param={code},m{ts},,{count}"
-    data = _request_json(url)["data"][code]
+    data = payload["data"][code]
     rows = data[f"m{ts}"]
 
     # 只取前 6 列，修正最后一条的收盘价为即时价
@@ -92,6 +204,28 @@ def _fetch_tx_minute(code: str, end_date: str, count: int, frequency: str) -> li
     return rows
 
 
+def _fetch_tx_daily(code: str, end_date: str, count: int, unit: str) -> list[list]:
+    """拉取日/周/月线原始数据，返回 [[date, open, close, high, low, vol], ...]"""
+    return _parse_tx_daily(_request_json(_tx_daily_url(code, end_date, count, unit)), code, unit)
+
+
+def _fetch_tx_minute(code: str, end_date: str, count: int, frequency: str) -> list[list]:
+    """拉取分钟线原始数据，返回 [[datetime, open, close, high, low, vol], ...]"""
+    return _parse_tx_minute(_request_json(_tx_minute_url(code, count, frequency)), code, frequency)
+
+
+async def _afetch_tx_daily(code: str, end_date: str, count: int, unit: str) -> list[list]:
+    """_fetch_tx_daily 的异步版本"""
+    payload = await _arequest_json(_tx_daily_url(code, end_date, count, unit), "tencent")
+    return _parse_tx_daily(payload, code, unit)
+
+
+async def _afetch_tx_minute(code: str, end_date: str, count: int, frequency: str) -> list[list]:
+    """_fetch_tx_minute 的异步版本"""
+    payload = await _arequest_json(_tx_minute_url(code, count, frequency), "tencent")
+    return _parse_tx_minute(payload, code, frequency)
+
+
 def _to_date_bars(rows: list[list], code: str) -> List[DateBar]:
     """将原始行数据列表转换为 DateBar 列表。"""
     result = []
@@ -151,14 +285,25 @@ def _calc_fetch_count(count: int, end_date: str, frequency: str) -> int:
     return count + extra
 
 
-def _fetch_sina(code: str, scale: int, count: int) -> list[dict]:
-    """调用新浪 API，返回原始 JSON 列表。"""
-    url = (
+def _sina_url(code: str, scale: int, count: int) -> str:
+    return (
         f"http://money.finance.sina.com.cn/quotes_service/api/json_v2.php"
         f"/CN_MarketData.getKLineData"
         f"?symbol={code}&scale={scale}&ma=5&datalen={count}"
     )
-    data = _request_json(url)  # 复用之前定义的辅助函数
+
+
+def _fetch_sina(code: str, scale: int, count: int) -> list[dict]:
+    """调用新浪 API，返回原始 JSON 列表。"""
+    data = _request_json(_sina_url(code, scale, count))  # 复用之前定义的辅助函数
+    if not data:
+        raise ValueError(f"Sina API returned empty data for {code}")
+    return data
+
+
+async def _afetch_sina(code: str, scale: int, count: int) -> list[dict]:
+    """_fetch_sina 的异步版本"""
+    data = await _arequest_json(_sina_url(code, scale, count), "sina")
     if not data:
         raise ValueError(f"Sina API returned empty data for {code}")
     return data
@@ -246,115 +391,228 @@ def get_price(
 
     Returns:
         包含行情 Bar 数据的列表。如果所有数据源均获取失败，则返回空列表 []。
+
+    请求是阻塞的，协程中请使用 aget_price / aget_prices。
     """
     # 1. 格式化股票格式和时间
     formatted_code = format_code(code)
     end_date_str = _normalize_end_date(end_date)
 
-    # 2. 获取数据
-    # 周期频率为：1m 只有腾讯有
-    if frequency == "1m":
-        return get_price_tx(formatted_code, end_date_str, count, frequency)
+    # 2. 获取数据：经 source_router 路由（与 aget_price 共用健康统计与熔断），腾讯优先，失败时切换到新浪；
+    # 1m 只有腾讯有，失败时抛出异常
+    calls = {"tencent": lambda: get_price_tx(formatted_code, end_date_str, count=count, frequency=frequency)}
+    if frequency != "1m":
+        calls["sina"] = lambda: get_price_sina(formatted_code, end_date_str, count=count, frequency=frequency)
 
-    # 其它频率：腾讯优先，新浪作为备用
     try:
-        return get_price_tx(formatted_code, end_date_str, count=count, frequency=frequency)
+        return source_router.call_sync(calls, label=code, source_errors=_SOURCE_ERRORS)
+
+    except Exception as e:
+        if frequency == "1m":
+            raise
+        logger.error(f"All sources failed for code: {code}. Error: {e}")
+        return []
 
-    except (requests.RequestException, ValueError, KeyError) as e:
-        # 使用 warning 记录降级事件，方便后续排查新浪接口稳定性
-        logger.warning(f"Primary source (Sina) failed for {code}: {e}, switching to backup (Tencent)...")
-        try:
-            return get_price_sina(formatted_code, end_date_str, count=count, frequency=frequency)
 
-        except Exception as e_backup:
-            logger.error(f"All sources failed for code: {code}. Error: {e_backup}")
-            return []
+async def aget_price_tx(
+    code: str,
+    end_date: str | None = None,
+    count: int = 10,
+    frequency: str = "1d",
+) -> List[DateBar | MinuteBar | None]:
+    """get_price_tx 的异步版本"""
+    FREQ_MAP = {"1d": "day", "1w": "week", "1M": "month"}
 
+    if frequency in FREQ_MAP:
+        raw = await _afetch_tx_daily(code, end_date, count, unit=FREQ_MAP[frequency])
+        return _to_date_bars(raw, code)
 
-@cached(cache=_today_minutes_cache)
-def _get_today_minutes(code: str) -> tuple[float | None, List[MinuteBar]]:
+    raw = await _afetch_tx_minute(code, end_date, count, frequency)
+    return _to_minute_bars(raw)
+
+
+async def aget_price_sina(
+    code: str,
+    end_date: str = "",
+    count: int = 10,
+    frequency: str = "60m",
+) -> List[DateBar]:
+    """get_price_sina 的异步版本"""
+    FREQ_MAP = {"1d": "240m", "1w": "1200m", "1M": "7200m"}
+    sina_freq = FREQ_MAP.get(frequency, frequency)
+    scale = int(sina_freq.rstrip("m"))
+
+    fetch_count = _calc_fetch_count(count, end_date, frequency)
+    raw = await _afetch_sina(code, scale, fetch_count)
+
+    bars = _to_date_bars_sina(raw, code)
+
+    if end_date:
+        bars = [b for b in bars if b.trade_date <= datetime.strptime(end_date, "%Y-%m-%d").date()]
+
+    return bars[-count:]
+
+
+async def aget_price(
+    code: str,
+    end_date: str | date | datetime | None = None,
+    count: int = 1,
+    frequency: Literal["1m", "5m", "15m", "30m", "60m", "1d", "1w", "1M"] = "1d",
+    raise_errors: bool = False,
+) -> List[DateBar | MinuteBar | None]:
     """
-    获取单个股票最新交易日分钟数据（带60秒缓存）
+    get_price 的异步版本，基于连接池复用的 httpx.AsyncClient，按数据源限流。
 
-    Args:
-        code: 股票代码
+    数据源经 source_router 路由：腾讯优先，超过其 p95 耗时未返回时对冲请求新浪，失败时立即切换，
+    熔断中的数据源直接跳过。1m 只有腾讯，失败时总是抛出异常。
 
-    Returns:
-        pre_close: 昨收价
-        bars: 最新一天的分钟交易信息
+    参数与返回值同 get_price；raise_errors 为 True 时，所有数据源均失败则抛出异常而不是返回 []。
     """
     formatted_code = format_code(code)
-    bars: List[MinuteBar] = get_price(formatted_code, count=250, frequency="1m")  # type: ignore
+    end_date_str = _normalize_end_date(end_date)
+
+    calls = {"tencent": lambda: aget_price_tx(formatted_code, end_date_str, count=count, frequency=frequency)}
+    if frequency != "1m":
+        calls["sina"] = lambda: aget_price_sina(formatted_code, end_date_str, count=count, frequency=frequency)
+
+    try:
+        return await source_router.call(
+            calls,
+            label=code,
+            source_errors=_SOURCE_ERRORS,
+            acquire={source: functools.partial(_acquire_token, source) for source in calls},
+        )
+
+    except Exception as e:
+        if frequency == "1m":
+            raise
+        logger.error(f"All sources failed for code: {code}. Error: {e}")
+        if raise_errors:
+            raise
+        return []
+
+
+async def aget_prices(
+    codes: Iterable[str],
+    end_date: str | date | datetime | None = None,
+    count: int = 1,
+    frequency: Literal["1m", "5m", "15m", "30m", "60m", "1d", "1w", "1M"] = "1d",
+    concurrency: int | None = None,
+    return_exceptions: bool = False,
+) -> AsyncIterator[tuple[str, List[DateBar | MinuteBar] | Exception]]:
+    """
+    并发获取多只证券的行情，按完成顺序逐个产出 (code, bars)。
+
+    并发数由 concurrency（默认 Settings.PROVIDER_CONCURRENCY）限制，
+    请求速率由各数据源的令牌桶限制；调用方可边接收边写库，无需等待全部完成。
+
+    Args:
+        codes: 证券代码列表
+        end_date: 结束日期，同 get_price
+        count: 每只证券获取的 K 线条数
+        frequency: K 线周期频率，同 get_price
+        concurrency: 最大并发请求数
+        return_exceptions: 为 True 时，所有数据源均失败的证券产出 (code, 异常)，
+            用于区分“获取失败”和“区间内无数据（如停牌）”；否则产出 (code, [])
+    """
+    semaphore = asyncio.Semaphore(concurrency or Settings.PROVIDER_CONCURRENCY)
+
+    async def _fetch(code: str) -> tuple[str, List[DateBar | MinuteBar] | Exception]:
+        async with semaphore:
+            try:
+                return code, await aget_price(
+                    code, end_date=end_date, count=count, frequency=frequency, raise_errors=return_exceptions
+                )
+            except Exception as e:
+                logger.error(f"获取 {code} 数据失败: {e}")
+                return code, e if return_exceptions else []
+
+    tasks = [asyncio.create_task(_fetch(code)) for code in codes]
+    try:
+        for future in asyncio.as_completed(tasks):
+            yield await future
+    finally:
+        # 调用方提前退出时，取消尚未完成的请求
+        for task in tasks:
+            task.cancel()
+
 
-    if not bars:
-        return None, []
+@dataclass
+class RealtimeQuote:
+    """腾讯实时行情快照"""
 
-    # 获取数据中最新的交易日
-    latest_date = bars[-1].time.date()
+    code: str
+    name: str
+    price: float
+    pre_close: float
+    open: float
+    high: float
+    low: float
+    volume: int  # 成交量（手）
+    amount: float  # 成交额（元）
 
-    # 筛选最新交易日的数据
-    bars_latest = [bar for bar in bars if bar.time.date() == latest_date]
 
-    # 获取昨收价（最新交易日之前的最后一根K线收盘价）
-    bars_previous = [bar for bar in bars if bar.time.date() < latest_date]
+def _tx_quote_url(codes: list[str]) -> str:
+    return f"http://qt.gtimg.cn/q={','.join(codes)}"
 
-    pre_close = bars_previous[-1].close if bars_previous else None
 
-    return pre_close, bars_latest
+def _parse_tx_quotes(text: str) -> dict[str, RealtimeQuote]:
+    """
+    解析 qt.gtimg.cn 批量行情，每只股票一行：v_sh600519="1~贵州茅台~600519~现价~昨收~今开~成交量(手)~...";
+    字段 33/34 为最高/最低，37 为成交额（万元）；无效代码返回 v_pv_none_match，跳过
+    """
+    quotes = {}
+    for line in text.split(";"):
+        key, _, value = line.strip().partition("=")
+        fields = value.strip('"').split("~")
+        if not key.startswith("v_") or len(fields) < 38:
+            continue
+        try:
+            quotes[key[2:]] = RealtimeQuote(
+                code=key[2:],
+                name=fields[1],
+                price=float(fields[3]),
+                pre_close=float(fields[4]),
+                open=float(fields[5]),
+                high=float(fields[33]),
+                low=float(fields[34]),
+                volume=int(float(fields[6])),
+                amount=float(fields[37]) * 10000,
+            )
+        except ValueError:
+            continue
+    return quotes
 
 
-def get_price_quotes(holding_stocks: list[(str, str)], force_refresh: bool = False) -> list[StockQuote]:
+async def aget_realtime_quotes(codes: Iterable[str]) -> dict[str, RealtimeQuote]:
     """
-    获取多个股票今日分钟级别数据
+    批量获取实时行情快照（腾讯多代码接口），每 QUOTE_BATCH_SIZE 只一个请求，各批并发
 
     Args:
-        holding_stocks: 股票代码列表，如 [('600519.SH', 100), ('000001.SZ', 200)]
-        force_refresh: 是否强制刷新缓存
+        codes: 证券代码列表，格式同 get_price
+
+    Returns:
+        {传入的证券代码: 行情快照}，获取失败的批次记录日志后跳过
     """
-    # 强制刷新时清空缓存
-    if force_refresh:
-        _today_minutes_cache.clear()
-
-    res = []
-    for holding_stock in holding_stocks:
-        code, holding_num = holding_stock
-        pre_close, bars = _get_today_minutes(code)
-
-        # 最新价格
-        latest_price = bars[-1].close
-
-        # 计算涨跌
-        change = round(latest_price - pre_close, 4)
-        change_percent = round((change / pre_close) * 100, 2) if pre_close else 0
-
-        # 汇总统计
-        total_volume = sum(bar.volume for bar in bars)
-        high = max(bar.close for bar in bars)
-        low = min(bar.close for bar in bars)
-
-        # 持仓市值
-        market_value = holding_num * latest_price
-
-        # 昨日持仓市值
-        pre_market_value = holding_num * pre_close
-        res.append(
-            StockQuote(
-                code=code,
-                latest_price=latest_price,
-                pre_close=pre_close,
-                change=change,
-                change_percent=change_percent,
-                open=bars[0].open_,
-                high=high,
-                low=low,
-                volume=total_volume,
-                holding_num=holding_num,
-                market_value=market_value,
-                pre_market_value=pre_market_value,
-                bars=bars,
-            )
-        )
-    return res
+    codes = list(dict.fromkeys(codes))
+    formatted = {format_code(code): code for code in codes}
+    symbols = list(formatted)
+
+    async def _fetch(batch: list[str]) -> dict[str, RealtimeQuote]:
+        await _RATE_LIMITERS["tencent"].acquire()
+        resp = await _get_async_client().get(_tx_quote_url(batch))
+        resp.raise_for_status()
+        resp.encoding = "gbk"
+        return _parse_tx_quotes(resp.text)
+
+    batches = [symbols[i : i + QUOTE_BATCH_SIZE] for i in range(0, len(symbols), QUOTE_BATCH_SIZE)]
+    result = {}
+    for batch, quotes in zip(batches, await asyncio.gather(*(_fetch(b) for b in batches), return_exceptions=True)):
+        if isinstance(quotes, Exception):
+            logger.warning(f"批量获取实时行情失败（{len(batch)} 只）: {quotes}")
+            continue
+        result.update({formatted[symbol]: quote for symbol, quote in quotes.items() if symbol in formatted})
+    return result
 
 
 if __name__ == "__main__":
@@ -1,8 +1,14 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
-from backend.tasks import sync_holidays
+from backend.core.config import Settings
+from backend.tasks import archive_minute_lines, sync_holidays
 
 scheduler = AsyncIOScheduler(timezone="Asia/Shanghai")
 
 # 每年1月1日 00:00 执行
 scheduler.add_job(sync_holidays, "cron", month=1, day=1, hour=0, minute=0)
+
+# 工作日收盘后归档当日分钟线（节假日在任务内跳过）
+if Settings.MINUTE_ARCHIVE_ENABLED:
+    _hour, _minute = Settings.MINUTE_ARCHIVE_TIME.split(":")
+    scheduler.add_job(archive_minute_lines, "cron", day_of_week="mon-fri", hour=int(_hour), minute=int(_minute))
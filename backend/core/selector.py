@@ -1,12 +1,12 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 
 from tortoise import connections
 from tortoise.expressions import Q
 
+from backend.core.calendar import get_trading_calendar
 from backend.core.logger import logger
 from backend.db.session import with_db
 from backend.models import DailyLine, Stock
-from backend.utils import get_previous_trading_day
 
 
 @with_db
@@ -17,18 +17,20 @@ async def stock_select():
     - 排除 ST 股票----风险大
     - 最近单股股价<=50----钱少，买不起
     - 排除房地产、建筑业行业----行业不景气
-    - 最近 30 天内，有3次或3次以上涨停或跌停的情况----水深，把握不住
+    - 最近 30 个交易日内，有3次或3次以上涨停或跌停的情况----水深，把握不住
     """
-    yesterday_str = await get_previous_trading_day()
-    start_date_str = (datetime.today() - timedelta(days=30)).strftime("%Y-%m-%d")
+    calendar = await get_trading_calendar()
+    yesterday = calendar.prev_trading_day(datetime.today())
+    # 多取一个交易日作为第一天的前收盘价
+    start_date = calendar.offset(yesterday, -30)
 
-    # 最近 30 天内，有3次或3次以上涨停或跌停的情况
-    raw_sql = f"""
-    -- stock_daily_line: 最近30天内，按“相邻收盘价涨跌幅”判断涨停/跌停次数>=3的股票
+    # 最近 30 个交易日内，有3次或3次以上涨停或跌停的情况
+    raw_sql = """
+    -- stock_daily_line: 最近30个交易日内，按“相邻收盘价涨跌幅”判断涨停/跌停次数>=3的股票
     WITH last_30d AS (
     SELECT *
     FROM stock_daily_line
-    WHERE trade_date >= CURRENT_DATE - INTERVAL '30 days'
+    WHERE trade_date >= $1
     ),
     x AS (
     SELECT
@@ -60,11 +62,11 @@ async def stock_select():
     """
     # 从 Tortoise 获取连接并执行
     conn = connections.get("default")
-    result = await conn.execute_query_dict(raw_sql)
+    result = await conn.execute_query_dict(raw_sql, [start_date])
     limit_up_down_stocks = {row["stock_code"] for row in result}
 
     # 排除今天股价>50的
-    today_lines = await DailyLine.filter(Q(trade_date=yesterday_str) & Q(close__lt=50)).all()
+    today_lines = await DailyLine.filter(Q(trade_date=yesterday) & Q(close__lt=50)).all()
 
     # 股票列表
     stock_list = {
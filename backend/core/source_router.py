@@ -0,0 +1,303 @@
+"""行情数据源路由：健康统计、熔断与对冲请求
+
+每个数据源记录最近 WINDOW 次请求的耗时与成败：
+- 熔断：连续失败 Settings.PROVIDER_BREAKER_FAILURES 次，或窗口内失败率超过 BREAKER_ERROR_RATE 时打开，
+  Settings.PROVIDER_BREAKER_COOLDOWN 秒内不再请求该数据源；冷却后半开，放行一次探测请求，成功则关闭，
+  失败则重新冷却（熔断前已发出的请求之后失败不延长冷却）
+- 耗时从获得限流令牌后开始计算，不含排队等待
+- 顺序：按调用方给出的优先顺序，熔断中的数据源跳过（不按失败率调整顺序，否则降级的数据源没有流量，无从恢复）
+- 对冲：首选数据源超过其 p95 耗时仍未返回时，向下一个数据源发出同样的请求，先成功的结果生效，另一个取消；
+  首选数据源失败时立即切换，不等待超时
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, TypeVar
+
+import numpy as np
+
+from backend.core.config import Settings
+from backend.core.logger import logger
+
+T = TypeVar("T")
+
+# 每个数据源统计的最近请求数
+WINDOW = 200
+
+# 计算 p95 所需的最少样本数，不足时对冲延迟取 Settings.PROVIDER_HEDGE_DELAY
+MIN_SAMPLES = 20
+
+# 窗口内失败率超过该值时熔断（样本数不少于 MIN_SAMPLES）
+BREAKER_ERROR_RATE = 0.5
+
+# 对冲延迟下限（秒），避免 p95 很小时几乎每个请求都对冲
+MIN_HEDGE_DELAY = 0.05
+
+
+class SourceUnavailable(Exception):
+    """所有数据源均已熔断"""
+
+
+@dataclass
+class SourceHealth:
+    """数据源的健康状况"""
+
+    name: str
+    state: str  # closed / open / half_open
+    requests: int
+    error_rate: float
+    p50: float | None
+    p95: float | None
+    consecutive_failures: int
+
+
+class SourceStats:
+    """单个数据源的耗时、成败统计及熔断状态"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._latencies: deque[float] = deque(maxlen=WINDOW)
+        self._outcomes: deque[bool] = deque(maxlen=WINDOW)
+        self._consecutive_failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return 1 - sum(self._outcomes) / len(self._outcomes)
+
+    def percentile(self, q: float) -> float | None:
+        if len(self._latencies) < MIN_SAMPLES:
+            return None
+        return float(np.percentile(self._latencies, q))
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < Settings.PROVIDER_BREAKER_COOLDOWN:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool | None:
+        """
+        是否可以请求；半开状态只放行一次探测请求
+
+        Returns:
+            None 表示不可请求，False 为普通请求，True 为半开状态的探测请求
+        """
+        state = self.state
+        if state == "closed":
+            return False
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return None
+
+    def record(self, success: bool, latency: float | None = None, probe: bool = False) -> None:
+        """
+        记录请求结果
+
+        Args:
+            success: 是否成功
+            latency: 成功请求的耗时（秒）
+            probe: 是否为半开状态的探测请求（见 allow）
+        """
+        self._outcomes.append(success)
+        if success:
+            # 失败请求的耗时多为超时，不计入 p95，避免对冲延迟被拉长
+            self._latencies.append(latency)
+            self._consecutive_failures = 0
+            if self._opened_at is not None:
+                logger.info(f"数据源 {self.name} 恢复，熔断关闭")
+            self._opened_at = None
+        else:
+            self._consecutive_failures += 1
+            if self._opened_at is None:
+                if self._should_open():
+                    logger.warning(
+                        f"数据源 {self.name} 熔断 {Settings.PROVIDER_BREAKER_COOLDOWN} 秒: "
+                        f"连续失败 {self._consecutive_failures} 次, 失败率 {self.error_rate:.0%}"
+                    )
+                    self._opened_at = time.monotonic()
+            elif probe:
+                # 只有半开探测失败时重新计时；熔断前已发出、熔断后才失败的请求不延长冷却
+                self._opened_at = time.monotonic()
+        if probe:
+            self._probing = False
+
+    def release(self, probe: bool = False) -> None:
+        """请求被取消（对冲中落败）或失败不计入统计时调用，释放探测名额"""
+        if probe:
+            self._probing = False
+
+    def _should_open(self) -> bool:
+        if self._consecutive_failures >= Settings.PROVIDER_BREAKER_FAILURES:
+            return True
+        return len(self._outcomes) >= MIN_SAMPLES and self.error_rate > BREAKER_ERROR_RATE
+
+    def health(self) -> SourceHealth:
+        return SourceHealth(
+            name=self.name,
+            state=self.state,
+            requests=len(self._outcomes),
+            error_rate=round(self.error_rate, 4),
+            p50=self.percentile(50),
+            p95=self.percentile(95),
+            consecutive_failures=self._consecutive_failures,
+        )
+
+
+class SourceRouter:
+    """按健康状况在多个数据源之间路由请求"""
+
+    def __init__(self):
+        self._stats: dict[str, SourceStats] = {}
+
+    def stats(self, source: str) -> SourceStats:
+        if source not in self._stats:
+            self._stats[source] = SourceStats(source)
+        return self._stats[source]
+
+    def health(self) -> list[SourceHealth]:
+        return [stats.health() for stats in self._stats.values()]
+
+    def hedge_delay(self, source: str) -> float:
+        p95 = self.stats(source).percentile(95)
+        return max(p95 if p95 is not None else Settings.PROVIDER_HEDGE_DELAY, MIN_HEDGE_DELAY)
+
+    async def call(
+        self,
+        calls: dict[str, Callable[[], Awaitable[T]]],
+        label: str = "",
+        source_errors: tuple[type[Exception], ...] = (Exception,),
+        acquire: dict[str, Callable[[], Awaitable[None]]] | None = None,
+    ) -> T:
+        """
+        依次（必要时对冲）调用各数据源，返回第一个成功的结果
+
+        Args:
+            calls: {数据源: 请求函数}，按优先顺序
+            label: 日志中的请求描述
+            source_errors: 计入数据源失败率的异常类型；其他异常（如某只股票没有数据）同样切换到下一个数据源，
+                但不影响该数据源的健康统计
+            acquire: {数据源: 限流等待函数}，在请求函数之前调用；耗时与对冲计时从其返回后开始，不含排队等待
+
+        Raises:
+            SourceUnavailable: 所有数据源均已熔断
+            Exception: 所有可用数据源均失败时，抛出最后一个异常
+        """
+        candidates = list(calls)
+        acquire = acquire or {}
+        # {请求任务: (数据源, 是否为探测请求)}，{数据源: 获得令牌、开始请求的时间}
+        running: dict[asyncio.Task, tuple[str, bool]] = {}
+        started: dict[str, float] = {}
+        last_error: Exception | None = None
+
+        def _has_backup() -> bool:
+            return any(self.stats(source).state != "open" for source in candidates)
+
+        async def _request(source: str) -> T:
+            if source in acquire:
+                await acquire[source]()
+            started[source] = time.monotonic()
+            return await calls[source]()
+
+        def _launch() -> bool:
+            # 熔断中的数据源跳过；半开的数据源在此时才占用探测名额
+            while candidates:
+                source = candidates.pop(0)
+                probe = self.stats(source).allow()
+                if probe is not None:
+                    running[asyncio.ensure_future(_request(source))] = (source, probe)
+                    return True
+            return False
+
+        if not _launch():
+            raise SourceUnavailable(f"数据源均已熔断: {', '.join(calls)}")
+
+        try:
+            while running:
+                # 只有首选请求在进行且还有可用的备用数据源时，等待到对冲时间
+                timeout = None
+                if len(running) == 1 and Settings.PROVIDER_HEDGE and _has_backup():
+                    source = next(iter(running.values()))[0]
+                    # 仍在等待令牌时不计时，每隔一个对冲延迟检查一次
+                    elapsed = time.monotonic() - started[source] if source in started else 0
+                    timeout = max(self.hedge_delay(source) - elapsed, 0)
+
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    source = next(iter(running.values()))[0]
+                    if source in started and _launch():
+                        logger.debug(f"{label} 数据源 {source} 超过 p95 未返回，已对冲请求备用数据源")
+                    continue
+
+                for task in done:
+                    source, probe = running.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        self.stats(source).record(True, time.monotonic() - started[source], probe=probe)
+                        return task.result()
+
+                    if isinstance(error, source_errors):
+                        self.stats(source).record(False, probe=probe)
+                    else:
+                        self.stats(source).release(probe)
+                    last_error = error
+                    if _has_backup():
+                        logger.warning(f"{label} 数据源 {source} 失败: {error}，切换到备用数据源")
+                if not running:
+                    _launch()
+        finally:
+            for task, (source, probe) in running.items():
+                task.cancel()
+                self.stats(source).release(probe)
+
+        raise last_error  # type: ignore[misc]
+
+    def call_sync(
+        self,
+        calls: dict[str, Callable[[], T]],
+        label: str = "",
+        source_errors: tuple[type[Exception], ...] = (Exception,),
+    ) -> T:
+        """
+        call 的同步版本，供阻塞的请求函数使用：按顺序调用，失败时切换到下一个数据源
+
+        与 call 共用健康统计与熔断状态；阻塞调用无法取消，不对冲。参数、异常同 call。
+        """
+        last_error: Exception | None = None
+        attempted = False
+        for source, func in calls.items():
+            stats = self.stats(source)
+            probe = stats.allow()
+            if probe is None:
+                continue
+
+            attempted = True
+            started = time.monotonic()
+            try:
+                result = func()
+            except Exception as e:
+                if isinstance(e, source_errors):
+                    stats.record(False, probe=probe)
+                else:
+                    stats.release(probe)
+                last_error = e
+                logger.warning(f"{label} 数据源 {source} 失败: {e}")
+                continue
+
+            stats.record(True, time.monotonic() - started, probe=probe)
+            return result
+
+        if not attempted:
+            raise SourceUnavailable(f"数据源均已熔断: {', '.join(calls)}")
+        raise last_error  # type: ignore[misc]
+
+
+source_router = SourceRouter()
@@ -0,0 +1,366 @@
+"""本地列式行情库
+
+把 stock_daily_line 镜像为按字段存放的内存映射文件，回测、选股、行情接口及各工作进程直接只读映射，
+读取时不访问数据库、不构造 Decimal 对象，同一台机器上的所有进程共享操作系统的页缓存。
+
+目录结构（Settings.MARKET_STORE_DIR）：
+    meta.json               当前代、交易日数、股票数、列容量
+    gen-<代>/calendar.i8    交易日（int64，1970-01-01 起的天数），升序
+    gen-<代>/symbols.txt    股票代码字典，每行一个，行号即列号
+    gen-<代>/<字段>.bin     (交易日 × 列容量) 行主序矩阵，无数据为 NaN
+
+写入只在主进程进行（同步、补数完成后调用 sync）：
+- 新交易日追加到文件末尾，新股票占用预留的空列，日历、字典追加后再原子替换 meta.json，
+  读取方按 meta.json 中的行数、列数映射，看不到写了一半的数据
+- 早于已有数据的交易日（补录历史）、股票数超出列容量时，在新的一代目录中全量重建后切换
+- 重新同步已有的交易日时原地覆盖对应的行
+"""
+
+import asyncio
+import json
+import os
+import shutil
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+import numpy as np
+
+from backend.core.config import Settings
+from backend.core.logger import logger
+from backend.db.session import raw_connection
+
+# 字段及其存储类型
+FIELDS = {
+    "open": "<f8",
+    "high": "<f8",
+    "low": "<f8",
+    "close": "<f8",
+    "volume": "<f8",
+    "turnover": "<f8",
+}
+
+# 列容量按此步长取整并至少预留一个步长，新上市股票无需重排文件
+CAPACITY_STEP = 512
+
+# 从数据库加载时每次查询的交易日数
+LOAD_CHUNK_DAYS = 60
+
+_ROWS_SQL = (
+    f"SELECT stock_code, trade_date, {', '.join(f'{name}::float8' for name in FIELDS)} "
+    "FROM stock_daily_line WHERE trade_date BETWEEN $1 AND $2"
+)
+
+
+def _capacity(stocks: int) -> int:
+    return (stocks // CAPACITY_STEP + 2) * CAPACITY_STEP
+
+
+def _day_numbers(days) -> np.ndarray:
+    return np.array(days, dtype="datetime64[D]").astype(np.int64)
+
+
+@dataclass
+class MarketSnapshot:
+    """某一时刻的只读行情视图，矩阵为内存映射，取列、切片均不复制"""
+
+    dates: np.ndarray  # datetime64[D]，升序
+    codes: list[str]
+    columns: dict[str, np.ndarray]  # 字段 -> (交易日, 股票)
+    _index: dict[str, int] = field(default_factory=dict, repr=False)
+
+    def __post_init__(self):
+        self._index = {code: i for i, code in enumerate(self.codes)}
+
+    @property
+    def last_date(self) -> date | None:
+        return self.dates[-1].item() if len(self.dates) else None
+
+    def stock_index(self, code: str) -> int | None:
+        return self._index.get(code)
+
+    def day_slice(self, start_date: date | None, end_date: date | None) -> slice:
+        """[start_date, end_date] 对应的行区间"""
+        low = 0 if start_date is None else int(np.searchsorted(self.dates, np.datetime64(start_date, "D")))
+        high = len(self.dates) if end_date is None else int(np.searchsorted(self.dates, np.datetime64(end_date, "D"), "right"))
+        return slice(low, max(low, high))
+
+    def select(
+        self, codes: list[str], start_date: date, end_date: date, fields=("open", "high", "low", "close", "volume")
+    ) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+        """
+        取若干股票在 [start_date, end_date] 的矩阵，只保留至少一只股票有数据的交易日
+
+        Returns:
+            (交易日, {字段: (交易日, len(codes))})，不在库中的股票整列为 NaN
+        """
+        rows = self.day_slice(start_date, end_date)
+        positions = [self._index.get(code, -1) for code in codes]
+        known = [i for i, p in enumerate(positions) if p >= 0]
+        columns = [positions[i] for i in known]
+
+        close = self.columns["close"][rows][:, columns]
+        has_data = ~np.isnan(close).all(axis=1) if columns else np.zeros(close.shape[0], dtype=bool)
+        dates = self.dates[rows][has_data]
+
+        matrices = {}
+        for name in fields:
+            matrix = np.full((len(dates), len(codes)), np.nan)
+            matrix[:, known] = self.columns[name][rows][:, columns][has_data]
+            matrices[name] = matrix
+        return dates, matrices
+
+    def series(
+        self, code: str, start_date: date | None, end_date: date | None, fields=("open", "high", "low", "close", "volume")
+    ) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+        """单只股票在 [start_date, end_date] 内有数据的交易日及各字段"""
+        column = self._index.get(code)
+        if column is None:
+            return np.empty(0, dtype="datetime64[D]"), {name: np.empty(0) for name in fields}
+        rows = self.day_slice(start_date, end_date)
+        valid = ~np.isnan(self.columns["close"][rows, column])
+        return self.dates[rows][valid], {name: self.columns[name][rows, column][valid] for name in fields}
+
+
+class MarketStore:
+    """本地列式行情库（每个进程一个实例，读取方按需重新映射）"""
+
+    def __init__(self, root: str | None = None):
+        self._root = root
+        self._snapshot: MarketSnapshot | None = None
+        self._snapshot_key: tuple | None = None
+        self._lock = asyncio.Lock()
+        self._init_task: asyncio.Task | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return Settings.MARKET_STORE_ENABLED
+
+    @property
+    def root(self) -> str:
+        return self._root or Settings.MARKET_STORE_DIR
+
+    def _meta_path(self) -> str:
+        return os.path.join(self.root, "meta.json")
+
+    def _generation_dir(self, generation: int) -> str:
+        return os.path.join(self.root, f"gen-{generation}")
+
+    def _read_meta(self) -> dict | None:
+        try:
+            with open(self._meta_path(), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, meta: dict) -> None:
+        meta = {**meta, "updated_at": datetime.now().isoformat(timespec="seconds")}
+        tmp = self._meta_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._meta_path())
+
+    # ------------------------------------------------------------------
+    #                              读取
+    # ------------------------------------------------------------------
+
+    def snapshot(self) -> MarketSnapshot | None:
+        """当前数据的只读视图；未启用或尚未建立时为 None。meta.json 变化后自动重新映射"""
+        if not self.enabled:
+            return None
+        try:
+            stat = os.stat(self._meta_path())
+        except FileNotFoundError:
+            return None
+
+        key = (stat.st_mtime_ns, stat.st_size)
+        if key != self._snapshot_key:
+            meta = self._read_meta()
+            self._snapshot = self._open(meta) if meta else None
+            self._snapshot_key = key
+        return self._snapshot
+
+    def _open(self, meta: dict) -> MarketSnapshot:
+        folder = self._generation_dir(meta["generation"])
+        days, stocks, capacity = meta["days"], meta["stocks"], meta["capacity"]
+
+        calendar = np.fromfile(os.path.join(folder, "calendar.i8"), dtype=np.int64, count=days)
+        with open(os.path.join(folder, "symbols.txt"), encoding="utf-8") as f:
+            codes = f.read().split()[:stocks]
+
+        columns = {}
+        for name, dtype in meta["fields"].items():
+            if days:
+                matrix = np.memmap(os.path.join(folder, f"{name}.bin"), dtype=dtype, mode="r", shape=(days, capacity))
+            else:
+                matrix = np.empty((0, capacity), dtype=dtype)
+            columns[name] = matrix[:, :stocks]
+        return MarketSnapshot(dates=calendar.astype("datetime64[D]"), codes=codes, columns=columns)
+
+    # ------------------------------------------------------------------
+    #                              写入
+    # ------------------------------------------------------------------
+
+    def start_initialization(self) -> None:
+        """在后台追平数据库（未建立时全量构建），不阻塞服务启动"""
+        if self.enabled:
+            self._init_task = asyncio.create_task(self.sync())
+
+    async def sync(self, since: date | None = None) -> None:
+        """
+        把数据库中 since 及之后的日线写入行情库；失败只记录日志，不影响调用方
+
+        Args:
+            since: 该日期及之后的数据有变动（如同步区间的开始日期），为空时从库中最后一个交易日开始
+        """
+        if not self.enabled:
+            return
+
+        async with self._lock:
+            try:
+                meta = self._read_meta()
+                if meta is None or not meta["days"] or meta["fields"] != FIELDS:
+                    await self.rebuild()
+                    return
+
+                first = np.datetime64(0, "D") + self._calendar(meta)[0]
+                if since is not None and np.datetime64(since, "D") < first:
+                    await self.rebuild()
+                    return
+
+                last = (np.datetime64(0, "D") + self._calendar(meta)[-1]).item()
+                if not await self._append(meta, since or last):
+                    await self.rebuild()
+            except Exception as e:
+                logger.exception(f"行情库同步失败: {e}")
+
+    def _calendar(self, meta: dict) -> np.ndarray:
+        path = os.path.join(self._generation_dir(meta["generation"]), "calendar.i8")
+        return np.fromfile(path, dtype=np.int64, count=meta["days"])
+
+    def _symbols(self, meta: dict) -> list[str]:
+        with open(os.path.join(self._generation_dir(meta["generation"]), "symbols.txt"), encoding="utf-8") as f:
+            return f.read().split()[: meta["stocks"]]
+
+    async def _append(self, meta: dict, since: date) -> bool:
+        """增量写入，需要重排（补录更早的交易日、列容量不足）时返回 False"""
+        async with raw_connection() as conn:
+            latest = await conn.fetchval("SELECT MAX(trade_date) FROM stock_daily_line")
+            records = await conn.fetch(_ROWS_SQL, since, latest) if latest and latest >= since else []
+        if not records:
+            return True
+
+        calendar = self._calendar(meta)
+        codes = self._symbols(meta)
+        incoming_days = np.unique(_day_numbers([r[1] for r in records]))
+        new_days = incoming_days[~np.isin(incoming_days, calendar)]
+        if len(new_days) and new_days[0] < calendar[-1]:
+            return False
+
+        code_index = {code: i for i, code in enumerate(codes)}
+        new_codes = sorted({r[0] for r in records} - code_index.keys())
+        if len(codes) + len(new_codes) > meta["capacity"]:
+            return False
+        for code in new_codes:
+            code_index[code] = len(code_index)
+
+        folder = self._generation_dir(meta["generation"])
+        days = meta["days"] + len(new_days)
+        all_days = np.concatenate([calendar, new_days])
+        await asyncio.to_thread(self._write_rows, folder, meta["days"], days, meta["capacity"], all_days, records, code_index)
+
+        with open(os.path.join(folder, "calendar.i8"), "ab") as f:
+            new_days.astype(np.int64).tofile(f)
+        with open(os.path.join(folder, "symbols.txt"), "a", encoding="utf-8") as f:
+            f.writelines(f"{code}\n" for code in new_codes)
+        self._write_meta({**meta, "days": days, "stocks": len(code_index)})
+        logger.info(f"行情库已更新: 新增 {len(new_days)} 个交易日、{len(new_codes)} 只股票, 写入 {len(records)} 条")
+        return True
+
+    @staticmethod
+    def _write_rows(folder, old_days, days, capacity, calendar, records, code_index) -> None:
+        """
+        扩展文件到 days 行并写入记录
+
+        新增的交易日在 meta 更新前对读取方不可见，直接写入；被重新同步的已有交易日整行替换（未出现在记录中的
+        股票为 NaN），新行先在内存中组好再一次赋值写回，不经过先置 NaN 再回填的中间状态。
+        整行复制本身不是原子的，与之并发的读取仍可能读到新旧混合的一行。
+        """
+        t = np.searchsorted(calendar, _day_numbers([r[1] for r in records]))
+        s = np.fromiter((code_index[r[0]] for r in records), dtype=np.int64, count=len(records))
+        existing = t < old_days
+        touched = np.unique(t[existing])
+
+        for offset, (name, dtype) in enumerate(FIELDS.items(), start=2):
+            path = os.path.join(folder, f"{name}.bin")
+            itemsize = np.dtype(dtype).itemsize
+            with open(path, "r+b") as f:
+                f.truncate(days * capacity * itemsize)
+            matrix = np.memmap(path, dtype=dtype, mode="r+", shape=(days, capacity))
+            values = np.array([r[offset] for r in records], dtype=np.float64)
+
+            matrix[old_days:] = np.nan
+            matrix[t[~existing], s[~existing]] = values[~existing]
+            if len(touched):
+                rows = np.full((len(touched), capacity), np.nan, dtype=dtype)
+                rows[np.searchsorted(touched, t[existing]), s[existing]] = values[existing]
+                matrix[touched] = rows
+            matrix.flush()
+            del matrix
+
+    async def rebuild(self) -> None:
+        """从数据库全量构建新的一代，完成后切换并删除旧的一代"""
+        async with raw_connection() as conn:
+            days = [r[0] for r in await conn.fetch("SELECT DISTINCT trade_date FROM stock_daily_line ORDER BY 1")]
+            codes = [r[0] for r in await conn.fetch("SELECT DISTINCT stock_code FROM stock_daily_line ORDER BY 1")]
+        if not days:
+            return
+
+        previous = self._read_meta()
+        generation = (previous["generation"] + 1) if previous else 1
+        folder = self._generation_dir(generation)
+        shutil.rmtree(folder, ignore_errors=True)
+        os.makedirs(folder)
+
+        capacity = _capacity(len(codes))
+        calendar = _day_numbers(days)
+        code_index = {code: i for i, code in enumerate(codes)}
+        matrices = {
+            name: np.memmap(os.path.join(folder, f"{name}.bin"), dtype=dtype, mode="w+", shape=(len(days), capacity))
+            for name, dtype in FIELDS.items()
+        }
+        for matrix in matrices.values():
+            matrix[:] = np.nan
+
+        total = 0
+        for chunk_start in range(0, len(days), LOAD_CHUNK_DAYS):
+            chunk = days[chunk_start : chunk_start + LOAD_CHUNK_DAYS]
+            async with raw_connection() as conn:
+                records = await conn.fetch(_ROWS_SQL, chunk[0], chunk[-1])
+            if not records:
+                continue
+            t = np.searchsorted(calendar, _day_numbers([r[1] for r in records]))
+            s = np.fromiter((code_index[r[0]] for r in records), dtype=np.int64, count=len(records))
+            for offset, name in enumerate(FIELDS, start=2):
+                matrices[name][t, s] = np.array([r[offset] for r in records], dtype=np.float64)
+            total += len(records)
+
+        for matrix in matrices.values():
+            matrix.flush()
+        del matrices
+        calendar.tofile(os.path.join(folder, "calendar.i8"))
+        with open(os.path.join(folder, "symbols.txt"), "w", encoding="utf-8") as f:
+            f.writelines(f"{code}\n" for code in codes)
+
+        self._write_meta(
+            {"generation": generation, "days": len(days), "stocks": len(codes), "capacity": capacity, "fields": FIELDS}
+        )
+        if previous:
+            # 仍在使用旧映射的进程不受影响（Windows 下删除失败则留待下次重建时清理）
+            shutil.rmtree(self._generation_dir(previous["generation"]), ignore_errors=True)
+        for name in os.listdir(self.root):
+            if name.startswith("gen-") and name != f"gen-{generation}":
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+        logger.info(f"行情库已重建: {len(days)} 个交易日 × {len(codes)} 只股票, {total} 条")
+
+
+market_store = MarketStore()
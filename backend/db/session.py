@@ -1,7 +1,7 @@
 import functools
 from contextlib import asynccontextmanager
 
-from tortoise import Tortoise
+from tortoise import Tortoise, connections
 
 from backend.core.config import Settings
 
@@ -24,3 +24,15 @@ def with_db(func):
             return await func(*args, **kwargs)
 
     return wrapper
+
+
+@asynccontextmanager
+async def raw_connection(name: str = "default"):
+    """
+    从 Tortoise 连接池中借出底层 asyncpg 连接
+
+    用于 COPY、服务端游标等 ORM 不支持的批量操作。
+    """
+    client = connections.get(name)
+    async with client.acquire_connection() as conn:
+        yield conn
@@ -0,0 +1,184 @@
+"""TimescaleDB：日线超表、压缩与周线/月线连续聚合
+
+服务启动时（aerich 迁移之后）执行 migrate，各步骤均可重复执行：
+- stock_daily_line、stock_minute_line 分别转为按 trade_date、trade_time 分块的超表；
+  超表的唯一约束须包含分区列，主键改为 (id, 时间列)
+- 超过各自压缩时间（Settings.TIMESCALE_COMPRESS_AFTER_DAYS / TIMESCALE_MINUTE_COMPRESS_AFTER_DAYS）的分块
+  按股票分段压缩，按股票读取历史时只解压对应分段
+- 周线 stock_weekly_line、月线 stock_monthly_line 为连续聚合，日线同步后刷新受影响的区间；
+  开启实时聚合（materialized_only = false），未刷新的部分查询时从日线补算
+
+数据库未安装 TimescaleDB 扩展时只记录日志，周线/月线退回到由日线在 Python 中聚合。
+"""
+
+import asyncio
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from backend.core.config import Settings
+from backend.core.logger import logger
+from backend.db.session import raw_connection
+
+TABLE = "stock_daily_line"
+
+
+@dataclass(frozen=True)
+class Hypertable:
+    """超表描述：分区时间列、分块跨度、超过多少天后压缩"""
+
+    table: str
+    time_column: str
+    chunk_interval: str
+    compress_after_days: int
+
+
+HYPERTABLES = (
+    # 全市场日线每块约百万行
+    Hypertable(TABLE, "trade_date", "1 year", Settings.TIMESCALE_COMPRESS_AFTER_DAYS),
+    # 分钟线只归档自选股与选股结果，每块为一周
+    Hypertable("stock_minute_line", "trade_time", "7 days", Settings.TIMESCALE_MINUTE_COMPRESS_AFTER_DAYS),
+)
+
+# 连续聚合视图 {周期: (视图名, 时间桶)}
+AGGREGATES = {
+    "weekly": ("stock_weekly_line", "1 week"),
+    "monthly": ("stock_monthly_line", "1 month"),
+}
+
+_HYPERTABLE_SQL = "SELECT 1 FROM timescaledb_information.hypertables WHERE hypertable_name = $1"
+
+_PRIMARY_KEY_SQL = """
+SELECT c.conname, array_agg(a.attname::text ORDER BY a.attname)
+FROM pg_constraint c
+JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = ANY(c.conkey)
+WHERE c.conrelid = $1::regclass AND c.contype = 'p'
+GROUP BY c.conname
+"""
+
+_COMPRESSION_SQL = "SELECT compression_enabled FROM timescaledb_information.hypertables WHERE hypertable_name = $1"
+
+_AGGREGATE_EXISTS_SQL = "SELECT 1 FROM timescaledb_information.continuous_aggregates WHERE view_name = $1"
+
+
+def _aggregate_sql(view: str, bucket: str) -> str:
+    # 周线时间桶从周一开始（与 ISO 周一致），trade_date 为桶内最后一个交易日
+    return f"""
+CREATE MATERIALIZED VIEW {view}
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT stock_code,
+       time_bucket(INTERVAL '{bucket}', trade_date) AS bucket,
+       max(trade_date) AS trade_date,
+       first(open, trade_date) AS open,
+       max(high) AS high,
+       min(low) AS low,
+       last(close, trade_date) AS close,
+       sum(volume) AS volume,
+       sum(turnover) AS turnover
+FROM {TABLE}
+GROUP BY stock_code, bucket
+WITH NO DATA
+"""
+
+
+class Timescale:
+    """TimescaleDB 结构迁移与连续聚合刷新"""
+
+    def __init__(self):
+        self.ready = False
+        self._pending: list[str] = []
+        self._init_task: asyncio.Task | None = None
+
+    async def migrate(self) -> bool:
+        """
+        把日线、分钟线表迁移为超表并创建压缩策略、日线的连续聚合，已完成的步骤跳过
+
+        Returns:
+            连续聚合是否可用
+        """
+        if not Settings.TIMESCALE_ENABLED:
+            return False
+
+        try:
+            async with raw_connection() as conn:
+                await conn.execute("CREATE EXTENSION IF NOT EXISTS timescaledb")
+                for hypertable in HYPERTABLES:
+                    await self._create_hypertable(conn, hypertable)
+                    await self._enable_compression(conn, hypertable)
+                for view, bucket in AGGREGATES.values():
+                    if not await conn.fetchval(_AGGREGATE_EXISTS_SQL, view):
+                        await conn.execute(_aggregate_sql(view, bucket))
+                        self._pending.append(view)
+                        logger.info(f"已创建连续聚合 {view}")
+        except Exception as e:
+            logger.warning(f"TimescaleDB 不可用，周线/月线由日线聚合: {e}")
+            return False
+
+        self.ready = True
+        return True
+
+    def start_initialization(self) -> None:
+        """在后台物化新建的连续聚合（首次需扫描全部日线），不阻塞服务启动"""
+        if self.ready and self._pending:
+            self._init_task = asyncio.create_task(self._materialize_pending())
+
+    async def refresh(self, start_date: date) -> None:
+        """
+        日线写库后刷新 start_date 起受影响的周线/月线；失败只记录日志，不影响调用方
+        """
+        if not self.ready:
+            return
+
+        # 从 start_date 所在的月初开始，覆盖被部分改动的时间桶
+        window_start = min(start_date.replace(day=1), start_date - timedelta(days=start_date.weekday()))
+        try:
+            async with raw_connection() as conn:
+                for view, _ in AGGREGATES.values():
+                    await conn.execute(f"CALL refresh_continuous_aggregate('{view}', '{window_start}'::date, NULL)")
+        except Exception as e:
+            logger.exception(f"刷新连续聚合失败: {e}")
+
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    async def _create_hypertable(conn, hypertable: Hypertable) -> None:
+        table, column = hypertable.table, hypertable.time_column
+        if await conn.fetchval(_HYPERTABLE_SQL, table):
+            return
+
+        logger.info(f"{table} 转为超表，已有数据将迁移到分块中")
+        async with conn.transaction():
+            row = await conn.fetchrow(_PRIMARY_KEY_SQL, table)
+            if row and column not in row[1]:
+                await conn.execute(f'ALTER TABLE {table} DROP CONSTRAINT "{row[0]}"')
+                await conn.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id, {column})")
+            await conn.execute(
+                f"SELECT create_hypertable('{table}', '{column}', "
+                f"chunk_time_interval => INTERVAL '{hypertable.chunk_interval}', migrate_data => true)"
+            )
+
+    @staticmethod
+    async def _enable_compression(conn, hypertable: Hypertable) -> None:
+        table = hypertable.table
+        if not await conn.fetchval(_COMPRESSION_SQL, table):
+            await conn.execute(
+                f"ALTER TABLE {table} SET (timescaledb.compress, timescaledb.compress_segmentby = 'stock_code', "
+                f"timescaledb.compress_orderby = '{hypertable.time_column} DESC')"
+            )
+        await conn.execute(
+            f"SELECT add_compression_policy('{table}', "
+            f"INTERVAL '{hypertable.compress_after_days} days', if_not_exists => true)"
+        )
+
+    async def _materialize_pending(self) -> None:
+        while self._pending:
+            view = self._pending[0]
+            try:
+                async with raw_connection() as conn:
+                    await conn.execute(f"CALL refresh_continuous_aggregate('{view}', NULL, NULL)")
+                logger.info(f"连续聚合 {view} 已物化")
+            except Exception as e:
+                logger.exception(f"物化连续聚合 {view} 失败: {e}")
+            self._pending.pop(0)
+
+
+timescale = Timescale()
@@ -7,17 +7,37 @@ from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.staticfiles import StaticFiles
 
 from backend.api.router import router
+from backend.core.provider import close_async_client
 from backend.core.scheduler import scheduler
 from backend.db.db_init import init_default_data, modify_db
+from backend.db.market_store import market_store
+from backend.db.timescale import timescale
+from backend.services.backfill import backfill_service
+from backend.services.backtest import batch_backtest_service
+from backend.services.backtest_queue import backtest_queue
+from backend.services.indicator import indicator_service
+from backend.services.quote_stream import quote_stream_hub
+from backend.services.selector_panel import selector_panel
 from backend.services.sync import sync_service
+from backend.services.tuning import tuning_service
+from backend.services.walk_forward import walk_forward_service
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     try:
         await modify_db()
+        await timescale.migrate()  # 日线超表、压缩与周线/月线连续聚合（未安装 TimescaleDB 时跳过）
         await init_default_data()
         await sync_service.sync_holidays()  #  启动时，同步节假日信息
+        await backfill_service.recover_interrupted()  # 标记上次中断的补数任务
+        await tuning_service.recover_interrupted()  # 标记上次中断的参数调优
+        await walk_forward_service.recover_interrupted()  # 标记上次中断的滚动窗口优化
+        await selector_panel.refresh()  # 加载选股内存面板（未启用时跳过）
+        indicator_service.start_initialization(on_rebuilt=selector_panel.reload)  # 首次部署时在后台计算历史指标
+        market_store.start_initialization()  # 在后台构建/追平本地行情库（未启用时跳过）
+        timescale.start_initialization()  # 在后台物化新建的连续聚合
+        backtest_queue.start()  # 回测任务工作进程（中断的任务由心跳超时重新领取）
         scheduler.start()
         yield
     except asyncio.CancelledError:
@@ -25,7 +45,12 @@ async def lifespan(app: FastAPI):
         pass
     finally:
         # 这里放你的清理/关闭代码（如果有的话）
-        pass
+        await quote_stream_hub.shutdown()
+        await close_async_client()
+        batch_backtest_service.shutdown()
+        backtest_queue.stop()
+        await tuning_service.shutdown()
+        await walk_forward_service.shutdown()
 
 
 app = FastAPI(title="Quant API", docs_url=None, redoc_url=None, lifespan=lifespan)
@@ -1,6 +1,7 @@
-from .daily import DailyLine
+from .daily import DailyIndicator, DailyLine
 from .holiday import Holiday
 from .market import WatchlistStock
+from .minute import MinuteLine
 from .notification import NotificationChannel
 from .selector import Selector, SelectorField, SelectorNode, SelectorResult
 from .stock import Stock
@@ -10,16 +11,21 @@ from .strategy import (
     StrategyPerformance,
     StrategyTag,
     StrategyTagRelation,
+    StrategyTuning,
     StrategyVersion,
 )
-from .sync import SyncConfig, SyncLog
+from .sync import DataVersion, StockSyncState, SyncConfig, SyncLog
 from .user import Permission, Role, RolePermission, User, UserRole
 
 __all__ = [
     "DailyLine",
+    "DailyIndicator",
+    "MinuteLine",
     "Stock",
     "SyncLog",
     "SyncConfig",
+    "StockSyncState",
+    "DataVersion",
     "Selector",
     "SelectorNode",
     "SelectorResult",
@@ -31,6 +37,7 @@ __all__ = [
     "StrategyBacktest",
     "StrategyVersion",
     "StrategyPerformance",
+    "StrategyTuning",
     "Holiday",
     "NotificationChannel",
     "User",
@@ -24,3 +24,31 @@ class DailyLine(BaseModel):
 
     def __str__(self):
         return f"股票={self.stock_code}, 日期={self.trade_date}, 开盘价={self.open}, 最高价={self.high}, 最低价={self.low}, 收盘价={self.close}"
+
+
+class DailyIndicator(BaseModel):
+    """日线衍生指标，由 stock_daily_line 增量计算（见 services/indicator.py）"""
+
+    id = fields.IntField(pk=True)  # 主键
+    stock_code = fields.CharField(max_length=20, description="股票代码")
+    trade_date = fields.DateField(description="交易日期")
+    prev_close = fields.DecimalField(max_digits=10, decimal_places=4, null=True, description="前收盘价")
+    change_pct = fields.DecimalField(max_digits=10, decimal_places=4, null=True, description="涨跌幅（%）")
+    ma5 = fields.DecimalField(max_digits=10, decimal_places=4, null=True, description="5日均线")
+    ma10 = fields.DecimalField(max_digits=10, decimal_places=4, null=True, description="10日均线")
+    ma20 = fields.DecimalField(max_digits=10, decimal_places=4, null=True, description="20日均线")
+    ma60 = fields.DecimalField(max_digits=10, decimal_places=4, null=True, description="60日均线")
+    is_limit_up = fields.BooleanField(default=False, description="是否涨停")
+    is_limit_down = fields.BooleanField(default=False, description="是否跌停")
+    limit_up_count = fields.IntField(default=0, description="近30日涨停次数")
+    limit_down_count = fields.IntField(default=0, description="近30日跌停次数")
+    limit_count = fields.IntField(default=0, description="近30日涨跌停次数")
+    volume_ratio = fields.DecimalField(max_digits=16, decimal_places=4, null=True, description="量比（成交量 / 前5日均量）")
+
+    class Meta:
+        table = "daily_indicator"
+        unique_together = ("stock_code", "trade_date")
+        indexes = (("trade_date",),)
+
+    def __str__(self):
+        return f"股票={self.stock_code}, 日期={self.trade_date}"
@@ -0,0 +1,41 @@
+from tortoise import fields
+
+from .base import BaseModel
+
+
+class NaiveDatetimeField(fields.DatetimeField):
+    """
+    不带时区的时间（北京时间），PostgreSQL 中为 timestamp 而非 timestamptz
+
+    分钟线的时间在 COPY 入库、二进制读取（trading/feeds/pg_feed.py）和 Parquet 导出时都按本地时间处理，
+    列不带时区才不会随会话时区换算
+    """
+
+    class _db_postgres:
+        SQL_TYPE = "TIMESTAMP"
+
+    def to_python_value(self, value):
+        value = super().to_python_value(value)
+        return value.replace(tzinfo=None) if value is not None else None
+
+
+class MinuteLine(BaseModel):
+    """历史 1 分钟线，收盘后由当日分钟线归档（见 services/minute.py）"""
+
+    id = fields.BigIntField(pk=True)  # 主键
+    stock_code = fields.CharField(max_length=20, description="股票代码")
+    trade_time = NaiveDatetimeField(description="K 线时间（北京时间）")
+    open = fields.DecimalField(max_digits=10, decimal_places=4, description="开盘价")
+    high = fields.DecimalField(max_digits=10, decimal_places=4, description="最高价")
+    low = fields.DecimalField(max_digits=10, decimal_places=4, description="最低价")
+    close = fields.DecimalField(max_digits=10, decimal_places=4, description="收盘价")
+    volume = fields.BigIntField(description="成交量")
+
+    class Meta:
+        table = "stock_minute_line"
+        unique_together = ("stock_code", "trade_time")
+        ordering = ["trade_time"]
+        indexes = (("trade_time",),)
+
+    def __str__(self):
+        return f"股票={self.stock_code}, 时间={self.trade_time}, 收盘价={self.close}"
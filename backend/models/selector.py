@@ -78,6 +78,8 @@ class SelectorFieldEnum(Enum):
     MA5 = ("ma5", "ma5", DataType.NUMBER, FieldType.INDICATOR)
     MA10 = ("ma10", "ma10", DataType.NUMBER, FieldType.INDICATOR)
     MA20 = ("ma20", "ma20", DataType.NUMBER, FieldType.INDICATOR)
+    MA60 = ("ma60", "ma60", DataType.NUMBER, FieldType.INDICATOR)
+    VOLUME_RATIO = ("volume_ratio", "volume_ratio", DataType.NUMBER, FieldType.INDICATOR)
 
     def __init__(self, field_name: str, db_field: str, data_type: DataType, field_type: FieldType):
         self._field_name = field_name
@@ -198,18 +198,65 @@ class StrategyBacktest(BaseModel):
     result_data = fields.JSONField(default=dict, description="详细回测结果数据")
     error_message = fields.TextField(null=True, description="错误信息")
 
+    # 任务队列
+    progress = fields.FloatField(default=0, description="执行进度(%)")
+    attempts = fields.IntField(default=0, description="领取次数")
+    heartbeat_at = fields.DatetimeField(null=True, description="执行进程最近一次心跳时间")
+
     # 时间字段
     created_at = fields.DatetimeField(auto_now_add=True, description="创建时间")
+    started_at = fields.DatetimeField(null=True, description="开始执行时间")
     completed_at = fields.DatetimeField(null=True, description="完成时间")
 
     class Meta:
         table = "strategy_backtests"
         table_description = "策略回测记录表"
+        indexes = [("status", "created_at")]
 
     def __str__(self):
         return f"StrategyBacktest({self.name})"
 
 
+class StrategyTuning(BaseModel):
+    """策略参数调优记录模型"""
+
+    id = fields.UUIDField(pk=True)
+    strategy = fields.ForeignKeyField("quant.Strategy", related_name="tunings", description="关联策略", null=True)
+
+    # 调优配置
+    name = fields.CharField(max_length=200, description="调优名称")
+    template_id = fields.CharField(max_length=100, description="策略模板ID")
+    study_name = fields.CharField(max_length=100, unique=True, description="Optuna study 名称")
+    stock_codes = fields.JSONField(default=list, description="股票代码列表")
+    start_date = fields.DateField(description="回测开始日期")
+    end_date = fields.DateField(description="回测结束日期")
+    initial_capital = fields.DecimalField(max_digits=15, decimal_places=2, description="初始资金")
+    objective = fields.CharField(max_length=50, description="优化目标")
+    n_trials = fields.IntField(description="试验总数")
+    n_jobs = fields.IntField(description="并行进程数")
+
+    # 调优结果
+    status = fields.CharEnumField(ExecutionStatus, default=ExecutionStatus.PENDING, description="调优状态")
+    best_params = fields.JSONField(null=True, description="最优参数")
+    best_value = fields.FloatField(null=True, description="最优目标值")
+    best_trials = fields.JSONField(default=list, description="最优的若干次试验")
+    completed_trials = fields.IntField(default=0, description="完成的试验数")
+    pruned_trials = fields.IntField(default=0, description="剪枝的试验数")
+    failed_trials = fields.IntField(default=0, description="失败的试验数")
+    error_message = fields.TextField(null=True, description="错误信息")
+
+    # 时间字段
+    created_at = fields.DatetimeField(auto_now_add=True, description="创建时间")
+    completed_at = fields.DatetimeField(null=True, description="完成时间")
+
+    class Meta:
+        table = "strategy_tunings"
+        table_description = "策略参数调优记录表"
+
+    def __str__(self):
+        return f"StrategyTuning({self.name})"
+
+
 class StrategyBacktestLog(BaseModel):
     """策略回测记录日志"""
     id = fields.UUIDField(pk=True)
@@ -39,3 +39,37 @@ class SyncConfig(models.Model):
 
     class Meta:
         table = "sync_config"
+
+
+class StockSyncState(models.Model):
+    """
+    单只股票日线同步游标
+
+    [first_trade_date, last_trade_date] 为已连续同步成功的区间，
+    补数时只需拉取该区间之外的缺失部分。
+    """
+
+    id = fields.IntField(pk=True)
+    stock_code = fields.CharField(max_length=20, unique=True, description="股票代码")
+    first_trade_date = fields.DateField(null=True, description="已同步区间起始交易日")
+    last_trade_date = fields.DateField(null=True, description="已同步区间最后交易日")
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "stock_sync_state"
+
+
+class DataVersion(models.Model):
+    """
+    按交易日的数据版本号
+
+    日线或衍生指标写入时递增，用作选股结果等派生缓存的失效依据。
+    """
+
+    id = fields.IntField(pk=True)
+    trade_date = fields.DateField(unique=True, description="交易日期")
+    version = fields.IntField(default=1, description="数据版本号")
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "data_version"
@@ -0,0 +1,77 @@
+from datetime import date, datetime
+from typing import Any, Dict, List, Literal, Optional
+
+from pydantic import Field
+
+from backend.models.strategy import ExecutionStatus
+from backend.schemas.base import BaseSchema, PaginationParams, UUIDMixin
+
+
+class BacktestJobSchema(BaseSchema, UUIDMixin):
+    """回测任务响应模型"""
+
+    strategy_id: str = Field(..., description="策略ID")
+    name: str = Field(..., description="回测名称")
+    start_date: date = Field(..., description="回测开始日期")
+    end_date: date = Field(..., description="回测结束日期")
+    initial_capital: float = Field(..., description="初始资金")
+
+    # 任务状态
+    status: ExecutionStatus = Field(..., description="回测状态")
+    progress: float = Field(default=0, description="执行进度(%)")
+    queue_position: int = Field(default=0, description="排在前面的待执行任务数")
+    error_message: Optional[str] = Field(None, description="错误信息")
+
+    # 绩效指标
+    final_capital: Optional[float] = Field(None, description="最终资金")
+    total_return: Optional[float] = Field(None, description="总收益率(%)")
+    annual_return: Optional[float] = Field(None, description="年化收益率(%)")
+    max_drawdown: Optional[float] = Field(None, description="最大回撤(%)")
+    sharpe_ratio: Optional[float] = Field(None, description="夏普比率")
+    win_rate: Optional[float] = Field(None, description="胜率(%)")
+    trade_count: int = Field(default=0, description="总交易次数")
+    win_count: int = Field(default=0, description="盈利交易次数")
+    loss_count: int = Field(default=0, description="亏损交易次数")
+    result_data: Dict[str, Any] = Field(default_factory=dict, description="股票、参数及每只股票的回测结果")
+
+    created_at: datetime = Field(..., description="创建时间")
+    started_at: Optional[datetime] = Field(None, description="开始执行时间")
+    completed_at: Optional[datetime] = Field(None, description="完成时间")
+
+    @classmethod
+    def from_record(cls, record, queue_position: int = 0) -> "BacktestJobSchema":
+        """由 StrategyBacktest 记录构建，主键转为字符串、Decimal 转为 float"""
+        data = {name: getattr(record, name) for name in cls.model_fields if hasattr(record, name)}
+        data.update(id=str(record.id), strategy_id=str(record.strategy_id), queue_position=queue_position)
+        data["result_data"] = record.result_data or {}
+        return cls(**data)
+
+
+class WalkForwardCreateSchema(BaseSchema):
+    """滚动窗口优化请求模型"""
+
+    strategy_id: str = Field(..., description="关联的策略ID")
+    template_id: str = Field(..., description="策略模板ID，需支持向量化回测")
+    name: Optional[str] = Field(None, description="回测名称", max_length=200)
+    codes: List[str] = Field(..., description="股票代码列表", min_length=1)
+    start_date: date = Field(..., description="回测开始日期")
+    end_date: Optional[date] = Field(None, description="回测结束日期，为空时为今天")
+    in_sample_days: int = Field(default=250, description="样本内交易日数", ge=20)
+    out_sample_days: int = Field(default=60, description="样本外交易日数（滚动步长）", ge=5)
+    anchored: bool = Field(default=False, description="样本内区间是否固定从开始日期起算")
+    objective: Literal["annual_return", "sharpe", "final_value", "max_drawdown"] = Field(
+        default="annual_return", description="优化目标"
+    )
+    param_grid: Dict[str, List[Any]] = Field(
+        default_factory=dict, description="参数网格 {参数名: 候选值列表}，未指定的参数由模板参数范围生成"
+    )
+    grid_points: int = Field(default=5, description="自动生成网格时每个数值参数的取值个数", ge=2, le=20)
+    n_jobs: Optional[int] = Field(None, description="并行进程数，默认 BACKTEST_WORKERS", ge=1)
+    initial_capital: Optional[float] = Field(None, description="初始资金", gt=0)
+
+
+class BacktestListParams(PaginationParams):
+    """回测记录查询参数"""
+
+    strategy_id: Optional[str] = Field(None, description="策略ID筛选")
+    status: Optional[ExecutionStatus] = Field(None, description="状态筛选")
@@ -101,3 +101,19 @@ class StockQuote(BaseSchema):
 
     class Config:
         from_attributes = True
+
+
+class QuoteTick(BaseSchema):
+    """推送的行情变动（不含持仓，市值由前端按持仓数计算）"""
+
+    code: str
+    name: str | None = None
+    latest_price: float  # 最新价
+    pre_close: float  # 昨收价
+    change: float  # 涨跌额
+    change_percent: float  # 涨跌幅 (%)
+    open: float  # 今开
+    high: float  # 最高
+    low: float  # 最低
+    volume: int  # 总成交量
+    amount: float | None = None  # 成交额
@@ -3,6 +3,8 @@
 from datetime import date
 from typing import Any
 
+from pydantic import Field
+
 from backend.schemas.base import BaseSchema, IDMixin, PaginationParams, TimestampMixin
 
 
@@ -101,6 +103,66 @@ class SelectorExecuteResultSchema(BaseSchema):
     stocks: list[dict] | None = None
 
 
+class SelectorPreviewSchema(BaseSchema):
+    """试算选股条件"""
+
+    rule: ConditionNodeSchema
+    trade_date: date | None = None
+
+
+class SelectorPreviewResultSchema(BaseSchema):
+    """试算选股结果"""
+
+    trade_date: date
+    stock_codes: list[str]
+    count: int
+    execution_time: float
+    source: str
+
+
+class SelectorReplaySchema(BaseSchema):
+    """选股历史回放参数"""
+
+    start_date: date
+    end_date: date
+    horizons: list[int] = Field(default_factory=lambda: [1, 5, 10], description="未来收益的持有交易日数")
+
+
+class ForwardReturnStatsSchema(BaseSchema):
+    """入选股票池的未来收益统计"""
+
+    horizon: int = Field(description="持有交易日数")
+    days: int = Field(description="有入选股票且可统计的交易日数")
+    mean_return: float | None = Field(None, description="股票池日均收益")
+    median_return: float | None = Field(None, description="股票池收益中位数")
+    win_rate: float | None = Field(None, description="股票池收益为正的交易日占比")
+    mean_excess: float | None = Field(None, description="相对全市场等权收益的平均超额")
+    excess_win_rate: float | None = Field(None, description="跑赢全市场的交易日占比")
+    hit_rate: float | None = Field(None, description="入选个股收益为正的占比")
+
+
+class SelectorReplayResultSchema(BaseSchema):
+    """选股历史回放结果"""
+
+    selector_id: int
+    trade_days: list[date]
+    stock_codes: list[str]
+    bitmap: str = Field(description="入选矩阵：按交易日逐行 packbits（高位在前）后整体 base64 编码")
+    counts: list[int]
+    stats: list[ForwardReturnStatsSchema]
+    execution_time: int
+
+
+class SelectorExplainSchema(BaseSchema):
+    """选股执行计划"""
+
+    selector_id: int
+    trade_date: date
+    sql: str | None
+    params: list[Any]
+    plan: Any | None = None
+
+
 class StockBriefSchema(BaseSchema):
     """股票简要信息"""
 
@@ -1,5 +1,6 @@
+from datetime import date, datetime
 from decimal import Decimal
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import Field
 
@@ -167,13 +168,40 @@ class StrategyBacktestSchema(BaseSchema, UUIDMixin, TimestampMixin):
 class StrategyBacktestCreateSchema(BaseSchema):
     """创建回测请求模型"""
 
-    strategy_id: str = Field(..., description="策略ID")
     name: str = Field(..., description="回测名称", max_length=200)
-    start_date: str = Field(..., description="回测开始日期", pattern=r"^\d{4}-\d{2}-\d{2}$")
-    end_date: str = Field(..., description="回测结束日期", pattern=r"^\d{4}-\d{2}-\d{2}$")
+    codes: List[str] = Field(..., description="股票代码列表", min_length=1)
+    params: Dict[str, Any] = Field(default_factory=dict, description="策略参数")
+    start_date: date = Field(..., description="回测开始日期")
+    end_date: date = Field(..., description="回测结束日期")
     initial_capital: Decimal = Field(..., description="初始资金", gt=0)
 
 
+class BatchBacktestCreateSchema(BaseSchema):
+    """批量回测请求模型"""
+
+    strategy_id: str = Field(..., description="策略ID")
+    name: Optional[str] = Field(None, description="回测名称前缀", max_length=100)
+    codes: List[str] = Field(..., description="股票代码列表", min_length=1)
+    param_grid: Dict[str, List[Any]] = Field(default_factory=dict, description="参数网格 {参数名: 候选值列表}")
+    start_date: date = Field(..., description="回测开始日期")
+    end_date: Optional[date] = Field(None, description="回测结束日期，为空时为今天")
+    initial_capital: Optional[float] = Field(None, description="初始资金", gt=0)
+
+
+class BatchBacktestProgressSchema(BaseSchema):
+    """批量回测进度模型"""
+
+    batch_id: str = Field(..., description="批次ID")
+    strategy_id: str = Field(..., description="策略ID")
+    status: ExecutionStatus = Field(..., description="批次状态")
+    total: int = Field(..., description="任务总数")
+    completed: int = Field(..., description="已完成任务数")
+    failed: int = Field(..., description="失败任务数")
+    started_at: datetime = Field(..., description="开始时间")
+    finished_at: Optional[datetime] = Field(None, description="结束时间")
+    error_message: Optional[str] = Field(None, description="错误信息")
+
+
 # =====================================================================
 #                           查询参数Schema
 # =====================================================================
@@ -1,3 +1,5 @@
+from datetime import date, datetime
+
 from pydantic import Field
 
 from backend.enums.sync import SyncStatus, SyncType
@@ -56,3 +58,44 @@ class TriggerRequest(BaseSchema):
 class SchedulerUpdateRequest(BaseSchema):
     enabled: bool
     time: str
+
+
+# =====================================================================
+#                           Parquet 导出 / 导入
+# =====================================================================
+class ParquetExportRequest(BaseSchema):
+    dataset: str = Field(default="daily_line", description="数据集")
+    start_date: date = Field(..., description="开始日期（按所在月份整月导出）")
+    end_date: date | None = Field(None, description="截止日期，为空时为今天")
+    overwrite: bool = Field(default=False, description="重新导出全部月份，否则跳过导出后数据未更新的月份")
+
+
+class ParquetImportRequest(BaseSchema):
+    dataset: str = Field(default="daily_line", description="数据集")
+    start_date: date | None = Field(None, description="开始日期，为空时不限")
+    end_date: date | None = Field(None, description="截止日期，为空时不限")
+    codes: list[str] | None = Field(None, description="股票代码列表，为空时为全部")
+
+
+class MinuteArchiveRequest(BaseSchema):
+    trade_date: date | None = Field(None, description="归档日期，为空时为今天")
+    codes: list[str] | None = Field(None, description="股票代码列表，为空时为自选股及选股结果")
+
+
+class ProviderHealthItem(BaseSchema):
+    name: str = Field(..., description="数据源")
+    state: str = Field(..., description="熔断状态：closed / open / half_open")
+    requests: int = Field(..., description="统计窗口内的请求数")
+    error_rate: float = Field(..., description="失败率")
+    p50: float | None = Field(None, description="耗时中位数（秒），样本不足时为空")
+    p95: float | None = Field(None, description="耗时 p95（秒），即对冲延迟")
+    consecutive_failures: int = Field(..., description="连续失败次数")
+
+
+class ParquetPartitionItem(BaseSchema):
+    year: int
+    month: int
+    rows: int = Field(..., description="行数")
+    row_groups: int = Field(..., description="行组数")
+    size: int = Field(..., description="文件大小（字节）")
+    updated_at: datetime = Field(..., description="导出时间")
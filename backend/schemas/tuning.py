@@ -0,0 +1,67 @@
+from datetime import date, datetime
+from typing import Any, Dict, List, Literal, Optional
+
+from pydantic import Field
+
+from backend.models.strategy import ExecutionStatus
+from backend.schemas.base import BaseSchema, PaginationParams, UUIDMixin
+
+TuningObjective = Literal["annual_return", "sharpe", "final_value", "max_drawdown"]
+
+
+class TuningCreateSchema(BaseSchema):
+    """创建参数调优请求模型"""
+
+    template_id: str = Field(..., description="策略模板ID，搜索空间由模板参数的 min/max 生成")
+    name: Optional[str] = Field(None, description="调优名称", max_length=200)
+    strategy_id: Optional[str] = Field(None, description="关联的策略ID")
+    codes: List[str] = Field(..., description="股票代码列表", min_length=1)
+    start_date: date = Field(..., description="回测开始日期")
+    end_date: Optional[date] = Field(None, description="回测结束日期，为空时为今天")
+    n_trials: int = Field(default=100, description="试验总数", ge=1, le=5000)
+    n_jobs: Optional[int] = Field(None, description="并行进程数，默认 TUNING_WORKERS", ge=1)
+    objective: TuningObjective = Field(default="annual_return", description="优化目标")
+    initial_capital: Optional[float] = Field(None, description="初始资金", gt=0)
+
+
+class TuningTrialSchema(BaseSchema):
+    """调优试验"""
+
+    number: int = Field(..., description="试验序号")
+    value: float = Field(..., description="目标值")
+    params: Dict[str, Any] = Field(..., description="参数")
+
+
+class TuningSchema(BaseSchema, UUIDMixin):
+    """参数调优记录响应模型"""
+
+    strategy_id: Optional[str] = Field(None, description="关联的策略ID")
+    name: str = Field(..., description="调优名称")
+    template_id: str = Field(..., description="策略模板ID")
+    study_name: str = Field(..., description="Optuna study 名称")
+    stock_codes: List[str] = Field(default_factory=list, description="股票代码列表")
+    start_date: date = Field(..., description="回测开始日期")
+    end_date: date = Field(..., description="回测结束日期")
+    initial_capital: float = Field(..., description="初始资金")
+    objective: str = Field(..., description="优化目标")
+    n_trials: int = Field(..., description="试验总数")
+    n_jobs: int = Field(..., description="并行进程数")
+
+    status: ExecutionStatus = Field(..., description="调优状态")
+    best_params: Optional[Dict[str, Any]] = Field(None, description="最优参数")
+    best_value: Optional[float] = Field(None, description="最优目标值")
+    best_trials: List[TuningTrialSchema] = Field(default_factory=list, description="最优的若干次试验")
+    completed_trials: int = Field(default=0, description="完成的试验数")
+    pruned_trials: int = Field(default=0, description="剪枝的试验数")
+    failed_trials: int = Field(default=0, description="失败的试验数")
+    error_message: Optional[str] = Field(None, description="错误信息")
+
+    created_at: datetime = Field(..., description="创建时间")
+    completed_at: Optional[datetime] = Field(None, description="完成时间")
+
+
+class TuningListParams(PaginationParams):
+    """调优记录查询参数"""
+
+    template_id: Optional[str] = Field(None, description="策略模板ID筛选")
+    status: Optional[ExecutionStatus] = Field(None, description="状态筛选")
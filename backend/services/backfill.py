@@ -0,0 +1,292 @@
+"""历史日线补数：按股票游标规划分片，分片并行执行，支持断点续跑
+
+- 每只股票在 stock_sync_state 中记录已连续同步成功的区间 [first_trade_date, last_trade_date]
+- 补数时只拉取区间之外的缺失部分：之后的部分正序推进，之前的部分倒序推进，保证区间始终连续
+- 股票池按游标分桶后再按股票数切分，缺失交易日按天数切分，得到若干分片
+- 同一组股票的分片顺序执行，不同组之间并行；每个分片写库成功后立即推进游标
+"""
+
+import asyncio
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Iterable, List
+
+from backend.core.calendar import get_trading_calendar
+from backend.core.config import Settings
+from backend.core.logger import logger
+from backend.core.provider import aget_prices
+from backend.db.market_store import market_store
+from backend.db.timescale import timescale
+from backend.enums.sync import SyncStatus, SyncType
+from backend.models import Stock, StockSyncState, SyncLog
+from backend.services.indicator import indicator_service
+from backend.services.ingest import DailyLineIngestor
+from backend.services.selector_panel import selector_panel
+
+
+@dataclass
+class BackfillShard:
+    """补数分片：一组股票 × 一段连续交易日（升序）"""
+
+    stock_codes: List[str]
+    trade_days: List[date]
+
+    @property
+    def start_date(self) -> date:
+        return self.trade_days[0]
+
+    @property
+    def end_date(self) -> date:
+        return self.trade_days[-1]
+
+
+@dataclass
+class BackfillPlan:
+    """补数计划，同一 lane 内的分片需顺序执行，lane 之间可并行"""
+
+    lanes: List[List[BackfillShard]]
+
+    @property
+    def shard_count(self) -> int:
+        return sum(len(lane) for lane in self.lanes)
+
+
+class BackfillService:
+    """历史补数服务"""
+
+    async def plan(
+        self,
+        start_date: date,
+        end_date: date,
+        symbols: List[str] | None = None,
+        shard_stocks: int | None = None,
+        shard_days: int | None = None,
+    ) -> BackfillPlan:
+        """
+        根据股票游标生成补数计划
+
+        Args:
+            start_date: 补数开始日期
+            end_date: 补数截止日期
+            symbols: 股票代码列表，为空时为全部股票
+            shard_stocks: 每个分片的股票数
+            shard_days: 每个分片的交易日数
+        """
+        shard_stocks = shard_stocks or Settings.BACKFILL_SHARD_STOCKS
+        shard_days = shard_days or Settings.BACKFILL_SHARD_DAYS
+
+        query = Stock.filter(full_stock_code__in=symbols) if symbols else Stock.all()
+        codes = await query.values_list("full_stock_code", flat=True)
+        states = {
+            state.stock_code: state
+            for state in await StockSyncState.filter(stock_code__in=codes, first_trade_date__isnull=False)
+        }
+
+        # 按游标分桶，同一桶内的股票缺失区间相同
+        buckets: dict[tuple[date | None, date | None], list[str]] = defaultdict(list)
+        for code in codes:
+            state = states.get(code)
+            buckets[(state.first_trade_date, state.last_trade_date) if state else (None, None)].append(code)
+
+        # 缺失区间需与已同步区间相接，因此可能超出 [start_date, end_date]
+        calendar = await get_trading_calendar()
+        low = min([start_date] + [calendar.next_trading_day(last) for _, last in buckets if last])
+        high = max([end_date] + [calendar.prev_trading_day(first) for first, _ in buckets if first])
+        trade_days = calendar.trading_days(low, high)
+
+        lanes = []
+        for (first, last), bucket_codes in buckets.items():
+            if first is None:
+                before, after = [], [d for d in trade_days if start_date <= d <= end_date]
+            else:
+                before = [d for d in trade_days if start_date <= d < first]
+                after = [d for d in trade_days if last < d <= end_date]
+
+            chunks = [after[i : i + shard_days] for i in range(0, len(after), shard_days)]
+            chunks += [before[max(i - shard_days, 0) : i] for i in range(len(before), 0, -shard_days)]
+            if not chunks:
+                continue
+
+            for i in range(0, len(bucket_codes), shard_stocks):
+                group = bucket_codes[i : i + shard_stocks]
+                lanes.append([BackfillShard(stock_codes=group, trade_days=chunk) for chunk in chunks])
+
+        return BackfillPlan(lanes=lanes)
+
+    async def run(self, start_date: date, end_date: date, symbols: List[str] | None = None) -> SyncLog:
+        """
+        执行补数，中断后以相同参数重新执行即可从游标处继续
+        """
+        if isinstance(start_date, datetime):
+            start_date = start_date.date()
+        if isinstance(end_date, datetime):
+            end_date = end_date.date()
+        if start_date > end_date:
+            start_date, end_date = end_date, start_date
+
+        # 接口提交前已检查（见 is_running），此处防止并发提交的任务重复执行
+        running = await SyncLog.filter(type=SyncType.BACKFILL, status=SyncStatus.RUNNING).first()
+        if running is not None:
+            logger.warning(f"已有补数任务在运行中（{running.range_desc}），跳过 {start_date} ~ {end_date}")
+            return running
+
+        log = await SyncLog.create(
+            type=SyncType.BACKFILL,
+            range_desc=f"{start_date} ~ {end_date}",
+            status=SyncStatus.RUNNING,
+        )
+
+        try:
+            plan = await self.plan(start_date, end_date, symbols)
+            logger.info(f"补数计划: {len(plan.lanes)} 组股票, {plan.shard_count} 个分片")
+
+            semaphore = asyncio.Semaphore(Settings.BACKFILL_PARALLEL)
+            finished = 0
+            failed_codes: set[str] = set()
+            failed_shards = 0
+
+            async def _run_lane(lane: List[BackfillShard]):
+                nonlocal finished, failed_shards
+                async with semaphore:
+                    for shard in lane:
+                        _, failed = await self.run_shard(shard)
+                        if failed:
+                            failed_codes.update(failed)
+                            failed_shards += 1
+                        finished += 1
+                        log.cursor_date = shard.end_date
+                        await log.save(update_fields=["cursor_date"])
+                        logger.info(f"补数进度: {finished}/{plan.shard_count}")
+
+            await asyncio.gather(*(_run_lane(lane) for lane in plan.lanes))
+
+            # 补入的历史数据会影响之后交易日的滚动指标，从补数起点重新计算
+            if plan.shard_count:
+                await indicator_service.refresh(start_date)
+                await market_store.sync(since=start_date)
+                await timescale.refresh(start_date)
+                await selector_panel.refresh(since=start_date)
+
+            if failed_codes:
+                # 失败股票的游标停在失败分片之前，重新触发时从缺口处继续
+                log.status = SyncStatus.FAIL
+                log.error_msg = f"{len(failed_codes)} 只股票在 {failed_shards} 个分片中获取失败，可重新触发补齐"
+                logger.warning(f"补数部分完成: {log.range_desc}, {log.error_msg}")
+            else:
+                log.status = SyncStatus.SUCCESS
+                logger.info(f"补数完成: {log.range_desc}")
+
+        except Exception as e:
+            log.status = SyncStatus.FAIL
+            log.error_msg = str(e)
+            logger.exception(f"补数失败: {e}")
+
+        finally:
+            log.end_time = datetime.now()
+            await log.save()
+
+        return log
+
+    async def run_shard(self, shard: BackfillShard) -> tuple[int, set[str]]:
+        """
+        执行单个分片：拉取、COPY 写库、推进游标
+
+        Returns:
+            (写入条数, 获取失败的股票)
+        """
+        failed = set()
+        async with DailyLineIngestor() as ingestor:
+            async for code, bars in aget_prices(
+                shard.stock_codes,
+                end_date=shard.end_date,
+                count=len(shard.trade_days),
+                return_exceptions=True,
+            ):
+                if isinstance(bars, Exception):
+                    failed.add(code)
+                    continue
+                await ingestor.add_bars(bar for bar in bars if bar.trade_date >= shard.start_date)
+
+        if failed:
+            logger.warning(f"分片 {shard.start_date} ~ {shard.end_date} 有 {len(failed)} 只股票获取失败，游标不推进")
+
+        # 股票在同组之前的分片中失败时，本分片与其游标之间有缺口，不能合并
+        await self.advance_cursors(
+            [code for code in shard.stock_codes if code not in failed],
+            shard.start_date,
+            shard.end_date,
+            require_contiguous=True,
+        )
+        return ingestor.total, failed
+
+    async def advance_cursors(
+        self,
+        stock_codes: Iterable[str],
+        span_start: date,
+        span_end: date,
+        require_contiguous: bool = False,
+    ) -> int:
+        """
+        将 [span_start, span_end] 合并进股票游标
+
+        Args:
+            stock_codes: 已成功同步该区间的股票
+            span_start: 区间开始日期
+            span_end: 区间结束日期
+            require_contiguous: 为 True 时，仅当区间与已同步区间相接（中间无交易日）时才合并，
+                避免游标跨过未同步的交易日（每日增量同步、补数分片均需检查：补数中股票在某个分片失败后，
+                同组之后的分片与其游标不再相接）
+
+        Returns:
+            更新的游标数量
+        """
+        stock_codes = list(stock_codes)
+        if not stock_codes:
+            return 0
+
+        states = {state.stock_code: state for state in await StockSyncState.filter(stock_code__in=stock_codes)}
+
+        calendar = await get_trading_calendar()
+        records = []
+        for code in stock_codes:
+            state = states.get(code)
+            if not state or not state.first_trade_date:
+                first, last = span_start, span_end
+            else:
+                if require_contiguous and (
+                    calendar.has_trading_day_between(state.last_trade_date, span_start)
+                    or calendar.has_trading_day_between(span_end, state.first_trade_date)
+                ):
+                    continue
+                first = min(state.first_trade_date, span_start)
+                last = max(state.last_trade_date, span_end)
+            records.append(StockSyncState(stock_code=code, first_trade_date=first, last_trade_date=last))
+
+        if records:
+            await StockSyncState.bulk_create(
+                records,
+                on_conflict=["stock_code"],
+                update_fields=["first_trade_date", "last_trade_date"],
+            )
+        return len(records)
+
+    @staticmethod
+    async def is_running() -> bool:
+        """是否有补数任务在运行中"""
+        return await SyncLog.filter(type=SyncType.BACKFILL, status=SyncStatus.RUNNING).exists()
+
+    @staticmethod
+    async def recover_interrupted() -> int:
+        """服务重启时，将上次未正常结束的补数日志标记为失败，以便重新触发续跑"""
+        count = await SyncLog.filter(type=SyncType.BACKFILL, status=SyncStatus.RUNNING).update(
+            status=SyncStatus.FAIL,
+            error_msg="服务重启，任务中断",
+            end_time=datetime.now(),
+        )
+        if count:
+            logger.warning(f"{count} 个补数任务因服务重启中断，可重新触发以从游标处继续")
+        return count
+
+
+backfill_service = BackfillService()
@@ -0,0 +1,264 @@
+"""批量回测服务
+
+在多只股票 × 多组参数上并行执行 Backtrader 回测：
+- 行情一次性从数据库加载到共享内存，子进程直接读取（见 trading/batch.py）
+- 任务分发到进程池，主进程事件循环只负责等待结果与写库，接口保持可响应
+- 每个任务完成后写入一条 StrategyBacktest 记录，按批次合并插入
+"""
+
+import asyncio
+import math
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import product
+
+from tortoise.expressions import F
+
+from backend.core.config import Settings
+from backend.core.logger import logger
+from backend.enums.strategy import ExecutionStatus
+from backend.models.strategy import Strategy, StrategyBacktest
+from backend.trading.batch import SharedPanel, init_worker, run_job, spawn_context
+from backend.trading.vector_engine import load_market_panel
+
+# 每个子进程同时排队的任务数，限制已提交未完成的任务总量
+JOBS_PER_WORKER = 4
+
+# 回测记录合并插入的条数
+FLUSH_SIZE = 100
+
+# 内存中保留的已结束批次进度数，超出时淘汰最早结束的（运行中的批次不淘汰，结果已写入回测记录）
+PROGRESS_HISTORY = 50
+
+
+def expand_param_grid(param_grid: dict[str, list] | None) -> list[dict]:
+    """参数网格展开为参数组合列表，空网格为一组默认参数"""
+    if not param_grid:
+        return [{}]
+    names = list(param_grid)
+    return [dict(zip(names, values)) for values in product(*(param_grid[name] for name in names))]
+
+
+def to_decimal(value, digits: int = 4) -> Decimal | None:
+    """绩效指标转为 Decimal 入库，None、NaN、无穷大为 None"""
+    if value is None or not math.isfinite(value):
+        return None
+    return Decimal(str(round(value, digits)))
+
+
+class BatchBacktestService:
+    """批量回测服务"""
+
+    def __init__(self):
+        self._executor: ProcessPoolExecutor | None = None
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._progress: dict[str, dict] = {}
+
+    @property
+    def workers(self) -> int:
+        return Settings.BACKTEST_WORKERS or os.cpu_count() or 1
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=spawn_context(), initializer=init_worker
+            )
+        return self._executor
+
+    def shutdown(self) -> None:
+        """取消运行中的批次并关闭进程池"""
+        for task in self._tasks.values():
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def start(
+        self,
+        strategy_id: str,
+        codes: list[str],
+        param_grid: dict[str, list] | None,
+        start_date: date,
+        end_date: date | None = None,
+        init_cash: float | None = None,
+        name: str | None = None,
+    ) -> dict:
+        """
+        提交批量回测，在后台执行
+
+        Args:
+            strategy_id: 策略ID，使用其当前版本的代码
+            codes: 股票代码列表
+            param_grid: 参数网格 {参数名: 候选值列表}
+            start_date: 回测开始日期
+            end_date: 回测结束日期，为空时为今天
+            init_cash: 初始资金，默认 Settings.INIT_CACHE
+            name: 回测名称前缀
+
+        Returns:
+            批次进度
+        """
+        strategy = await Strategy.get_or_none(id=strategy_id)
+        if not strategy:
+            raise ValueError("策略不存在")
+        version = await strategy.get_current_version()
+        if not version:
+            raise ValueError("策略没有可用版本")
+
+        codes = list(dict.fromkeys(codes))
+        combos = expand_param_grid(param_grid)
+        batch_id = uuid.uuid4().hex
+        progress = {
+            "batch_id": batch_id,
+            "strategy_id": str(strategy.id),
+            "status": ExecutionStatus.RUNNING,
+            "total": len(codes) * len(combos),
+            "completed": 0,
+            "failed": 0,
+            "started_at": datetime.now(),
+            "finished_at": None,
+            "error_message": None,
+        }
+        self._progress[batch_id] = progress
+
+        job = {
+            "strategy": strategy,
+            "version": version,
+            "codes": codes,
+            "combos": combos,
+            "start_date": start_date,
+            "end_date": end_date or date.today(),
+            "init_cash": float(Settings.INIT_CACHE if init_cash is None else init_cash),
+            "name": name or strategy.name,
+        }
+        self._tasks[batch_id] = asyncio.create_task(self._run(progress, job))
+        logger.info(f"批量回测已提交: {batch_id}, 股票 {len(codes)} 只, 参数 {len(combos)} 组, 共 {progress['total']} 个任务")
+        return progress
+
+    def get_progress(self, batch_id: str) -> dict | None:
+        return self._progress.get(batch_id)
+
+    def list_progress(self) -> list[dict]:
+        return sorted(self._progress.values(), key=lambda p: p["started_at"], reverse=True)
+
+    def _prune_progress(self) -> None:
+        finished = sorted(
+            (p for p in self._progress.values() if p["finished_at"] is not None), key=lambda p: p["finished_at"]
+        )
+        for progress in finished[: max(len(finished) - PROGRESS_HISTORY, 0)]:
+            del self._progress[progress["batch_id"]]
+
+    def cancel(self, batch_id: str) -> bool:
+        task = self._tasks.get(batch_id)
+        if not task or task.done():
+            return False
+        task.cancel()
+        return True
+
+    async def _run(self, progress: dict, job: dict) -> None:
+        loop = asyncio.get_running_loop()
+        shared = None
+        pending: dict[asyncio.Future, tuple[str, dict]] = {}
+        buffer: list[StrategyBacktest] = []
+
+        async def _collect(done) -> None:
+            for future in done:
+                code, params = pending.pop(future)
+                try:
+                    metrics = future.result()
+                    error = None if metrics else "回测区间内没有行情数据"
+                except Exception as e:
+                    metrics, error = None, str(e)
+
+                buffer.append(self._build_record(job, code, params, metrics, error, progress["batch_id"]))
+                progress["completed" if metrics else "failed"] += 1
+
+            if len(buffer) >= FLUSH_SIZE:
+                await self._flush(buffer)
+
+        try:
+            panel = await load_market_panel(job["codes"], job["start_date"], job["end_date"])
+            shared = SharedPanel(panel)
+            code_text = job["version"].code
+            max_pending = self.workers * JOBS_PER_WORKER
+
+            for params in job["combos"]:
+                for index, code in enumerate(shared.codes):
+                    if len(pending) >= max_pending:
+                        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        await _collect(done)
+                    future = loop.run_in_executor(
+                        self.executor, run_job, shared.meta, index, code_text, params, job["init_cash"]
+                    )
+                    pending[future] = (code, params)
+
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                await _collect(done)
+
+            progress["status"] = ExecutionStatus.COMPLETED
+        except asyncio.CancelledError:
+            progress["status"] = ExecutionStatus.CANCELLED
+            for future in pending:
+                future.cancel()
+        except Exception as e:
+            logger.exception(f"批量回测失败: {progress['batch_id']}, {e}")
+            progress["status"] = ExecutionStatus.FAILED
+            progress["error_message"] = str(e)
+        finally:
+            try:
+                await self._flush(buffer)
+                if progress["completed"]:
+                    await Strategy.filter(id=job["strategy"].id).update(
+                        backtest_count=F("backtest_count") + progress["completed"]
+                    )
+            except Exception as e:
+                logger.exception(f"批量回测结果写入失败: {progress['batch_id']}, {e}")
+            if shared is not None:
+                shared.close()
+            progress["finished_at"] = datetime.now()
+            self._tasks.pop(progress["batch_id"], None)
+            self._prune_progress()
+            logger.info(
+                f"批量回测结束: {progress['batch_id']}, 状态 {progress['status'].value}, "
+                f"完成 {progress['completed']}, 失败 {progress['failed']}"
+            )
+
+    @staticmethod
+    def _build_record(job: dict, code: str, params: dict, metrics: dict | None, error: str | None, batch_id: str):
+        metrics = metrics or {}
+        label = ", ".join(f"{k}={v}" for k, v in params.items())
+        return StrategyBacktest(
+            strategy=job["strategy"],
+            version=job["version"],
+            name=f"{job['name']} {code} {label}".strip()[:200],
+            start_date=job["start_date"],
+            end_date=job["end_date"],
+            initial_capital=to_decimal(job["init_cash"], 2),
+            final_capital=to_decimal(metrics.get("final_capital"), 2),
+            total_return=to_decimal(metrics.get("total_return")),
+            annual_return=to_decimal(metrics.get("annual_return")),
+            max_drawdown=to_decimal(metrics.get("max_drawdown")),
+            sharpe_ratio=to_decimal(metrics.get("sharpe_ratio")),
+            win_rate=to_decimal(metrics.get("win_rate"), 2),
+            trade_count=metrics.get("trade_count", 0),
+            win_count=metrics.get("win_count", 0),
+            loss_count=metrics.get("loss_count", 0),
+            status=ExecutionStatus.COMPLETED if metrics else ExecutionStatus.FAILED,
+            result_data={"batch_id": batch_id, "stock_code": code, "params": params},
+            error_message=error,
+            completed_at=datetime.now(),
+        )
+
+    @staticmethod
+    async def _flush(buffer: list[StrategyBacktest]) -> None:
+        if buffer:
+            await StrategyBacktest.bulk_create(buffer)
+            buffer.clear()
+
+
+batch_backtest_service = BatchBacktestService()
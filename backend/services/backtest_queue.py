@@ -0,0 +1,314 @@
+"""回测任务队列
+
+以 StrategyBacktest 表作为持久化队列，状态流转 PENDING → RUNNING → COMPLETED / FAILED / CANCELLED：
+- 接口只负责写入 PENDING 记录并 NOTIFY，不在 uvicorn 进程内执行回测
+- 独立的工作进程用 FOR UPDATE SKIP LOCKED 领取任务，多个进程（包括多个 uvicorn 实例各自的进程）互不冲突；
+  优先领取运行中任务最少的策略，同一策略按提交顺序，避免单个策略的大量提交阻塞其他策略
+- 执行中定期写入心跳与进度；心跳超时的任务视为执行进程已退出，重新入队，超过最大次数则置为失败
+- 取消即把状态改为 CANCELLED，工作进程在下一次心跳时发现并中止回测
+
+多只股票时各自以全部初始资金独立回测，汇总指标取平均值（交易次数求和），每只股票的明细见 result_data.stocks。
+
+也可以单独启动工作进程：python -m backend.services.backtest_queue
+"""
+
+import asyncio
+import multiprocessing
+from datetime import date, datetime
+
+from tortoise.expressions import F
+
+from backend.core.config import Settings
+from backend.core.logger import logger
+from backend.db.session import db_context, raw_connection
+from backend.enums.strategy import ExecutionStatus
+from backend.models.strategy import Strategy, StrategyBacktest
+from backend.services.backtest import to_decimal
+from backend.trading.batch import load_strategy_class, spawn_context
+from backend.trading.engine import run_bars_backtest
+from backend.trading.feeds.pg_feed import fetch_daily_bars
+
+# NOTIFY 频道
+CHANNEL = "backtest_jobs"
+
+# 心跳间隔、判定执行进程退出的心跳超时（秒）
+HEARTBEAT_SECONDS = 5
+STALE_SECONDS = 60
+
+# 单个任务的最大领取次数
+MAX_ATTEMPTS = 3
+
+# 未收到通知时轮询队列的间隔（秒）
+POLL_SECONDS = 10
+
+_CLAIMABLE = f"""
+    (c.status = 'pending'
+     OR (c.status = 'running' AND c.heartbeat_at < NOW() - INTERVAL '{STALE_SECONDS} seconds'))
+"""
+
+CLAIM_SQL = f"""
+UPDATE strategy_backtests AS b
+SET status = 'running', attempts = b.attempts + 1, progress = 0, started_at = NOW(), heartbeat_at = NOW()
+WHERE b.id = (
+    SELECT c.id FROM strategy_backtests c
+    WHERE {_CLAIMABLE} AND c.attempts < {MAX_ATTEMPTS}
+    ORDER BY (SELECT COUNT(*) FROM strategy_backtests r
+              WHERE r.strategy_id = c.strategy_id AND r.status = 'running'),
+             c.created_at
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING b.id, b.attempts
+"""
+
+EXPIRE_SQL = f"""
+UPDATE strategy_backtests AS c
+SET status = 'failed', error_message = '执行进程多次异常退出', completed_at = NOW()
+WHERE c.status = 'running' AND c.heartbeat_at < NOW() - INTERVAL '{STALE_SECONDS} seconds'
+  AND c.attempts >= {MAX_ATTEMPTS}
+"""
+
+HEARTBEAT_SQL = """
+UPDATE strategy_backtests SET heartbeat_at = NOW(), progress = $3
+WHERE id = $1 AND attempts = $2 AND status = 'running'
+"""
+
+
+def summarize_stocks(stocks: dict[str, dict | None]) -> dict:
+    """汇总多只股票的绩效指标：比率类取平均值，交易次数求和"""
+    results = [m for m in stocks.values() if m]
+    if not results:
+        raise ValueError("回测区间内没有行情数据")
+
+    def _mean(key):
+        values = [m[key] for m in results if m[key] is not None]
+        return sum(values) / len(values) if values else None
+
+    trades = sum(m["trade_count"] for m in results)
+    wins = sum(m["win_count"] for m in results)
+    return {
+        "final_capital": _mean("final_capital"),
+        "total_return": _mean("total_return"),
+        "annual_return": _mean("annual_return"),
+        "max_drawdown": _mean("max_drawdown"),
+        "sharpe_ratio": _mean("sharpe_ratio"),
+        "win_rate": wins / trades * 100 if trades else None,
+        "trade_count": trades,
+        "win_count": wins,
+        "loss_count": sum(m["loss_count"] for m in results),
+    }
+
+
+class BacktestQueue:
+    """回测任务队列：提交、取消，以及工作进程的管理"""
+
+    def __init__(self):
+        self._stop_event = None
+        self._processes: list[multiprocessing.Process] = []
+
+    # ------------------------------------------------------------------
+    #                           提交与取消
+    # ------------------------------------------------------------------
+
+    async def enqueue(
+        self,
+        strategy: Strategy,
+        name: str,
+        codes: list[str],
+        start_date: date,
+        end_date: date,
+        init_cash: float,
+        params: dict | None = None,
+    ) -> StrategyBacktest:
+        """写入 PENDING 回测任务并通知工作进程"""
+        version = await strategy.get_current_version()
+        if not version:
+            raise ValueError("策略没有可用版本")
+
+        record = await StrategyBacktest.create(
+            strategy=strategy,
+            version=version,
+            name=name,
+            start_date=start_date,
+            end_date=end_date,
+            initial_capital=to_decimal(init_cash, 2),
+            status=ExecutionStatus.PENDING,
+            result_data={"codes": list(dict.fromkeys(codes)), "params": params or {}},
+        )
+        async with raw_connection() as conn:
+            await conn.execute(f"NOTIFY {CHANNEL}")
+        return record
+
+    @staticmethod
+    async def queue_position(record: StrategyBacktest) -> int:
+        """排在该任务之前的待执行任务数"""
+        if record.status != ExecutionStatus.PENDING:
+            return 0
+        return await StrategyBacktest.filter(
+            status=ExecutionStatus.PENDING, created_at__lt=record.created_at
+        ).count()
+
+    @staticmethod
+    async def cancel(backtest_id: str) -> bool:
+        """取消待执行或执行中的任务，执行中的任务在下一次心跳时中止"""
+        count = await StrategyBacktest.filter(
+            id=backtest_id, status__in=[ExecutionStatus.PENDING, ExecutionStatus.RUNNING]
+        ).update(status=ExecutionStatus.CANCELLED, completed_at=datetime.now())
+        return count > 0
+
+    # ------------------------------------------------------------------
+    #                           工作进程管理
+    # ------------------------------------------------------------------
+
+    def start(self, workers: int | None = None) -> None:
+        """启动工作进程，数量默认为 Settings.BACKTEST_QUEUE_WORKERS，为 0 时不启动"""
+        workers = Settings.BACKTEST_QUEUE_WORKERS if workers is None else workers
+        if workers <= 0 or self._processes:
+            return
+
+        context = spawn_context()
+        self._stop_event = context.Event()
+        for i in range(workers):
+            process = context.Process(
+                target=run_worker, args=(self._stop_event,), name=f"backtest-worker-{i}", daemon=True
+            )
+            process.start()
+            self._processes.append(process)
+        logger.info(f"回测工作进程已启动: {workers} 个")
+
+    def stop(self, timeout: float = 5) -> None:
+        """停止工作进程；执行中的任务会因心跳超时被重新领取"""
+        if not self._processes:
+            return
+        self._stop_event.set()
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes.clear()
+
+
+# ----------------------------------------------------------------------
+#                               工作进程
+# ----------------------------------------------------------------------
+
+
+async def _claim() -> tuple[str, int] | None:
+    async with raw_connection() as conn:
+        await conn.execute(EXPIRE_SQL)
+        row = await conn.fetchrow(CLAIM_SQL)
+    return (str(row["id"]), row["attempts"]) if row else None
+
+
+async def _execute(backtest_id: str, attempt: int) -> None:
+    """执行一个已领取的任务，写库时校验领取次数，避免覆盖被取消或被重新领取的任务"""
+    record = await StrategyBacktest.get(id=backtest_id).prefetch_related("strategy", "version")
+    claimed = StrategyBacktest.filter(id=backtest_id, attempts=attempt, status=ExecutionStatus.RUNNING)
+    codes = record.result_data.get("codes") or []
+    params = record.result_data.get("params") or {}
+    init_cash = float(record.initial_capital)
+    state = {"progress": 0.0, "stopped": False}
+
+    async def _heartbeat() -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            async with raw_connection() as conn:
+                status = await conn.execute(HEARTBEAT_SQL, record.id, attempt, round(state["progress"], 2))
+            if status.endswith(" 0"):
+                state["stopped"] = True  # 已取消或被其他进程重新领取
+                return
+
+    heartbeat = asyncio.create_task(_heartbeat())
+    logger.info(f"回测开始: {record.name}({backtest_id}), 股票 {len(codes)} 只, 参数 {params}")
+    try:
+        version = record.version or await record.strategy.get_current_version()
+        if not version:
+            raise ValueError("策略没有可用版本")
+        strategy = load_strategy_class(version.code)
+        bars = await fetch_daily_bars(codes, record.start_date, record.end_date)
+
+        stocks: dict[str, dict | None] = {}
+        for index, code in enumerate(codes):
+            if state["stopped"]:
+                break
+            stock_bars = bars.get(code)
+            if stock_bars is None or not len(stock_bars):
+                stocks[code] = None
+                continue
+
+            def _progress(done: int, index=index, total=len(stock_bars)) -> bool:
+                state["progress"] = (index + done / total) / len(codes) * 100
+                return state["stopped"]
+
+            stocks[code] = await asyncio.to_thread(
+                run_bars_backtest, strategy, stock_bars, init_cash, code, _progress, **params
+            )
+
+        if state["stopped"]:
+            logger.info(f"回测已中止: {record.name}({backtest_id})")
+            return
+
+        summary = summarize_stocks(stocks)
+        updated = await claimed.update(
+            status=ExecutionStatus.COMPLETED,
+            progress=100,
+            final_capital=to_decimal(summary["final_capital"], 2),
+            total_return=to_decimal(summary["total_return"]),
+            annual_return=to_decimal(summary["annual_return"]),
+            max_drawdown=to_decimal(summary["max_drawdown"]),
+            sharpe_ratio=to_decimal(summary["sharpe_ratio"]),
+            win_rate=to_decimal(summary["win_rate"], 2),
+            trade_count=summary["trade_count"],
+            win_count=summary["win_count"],
+            loss_count=summary["loss_count"],
+            result_data={**record.result_data, "stocks": stocks},
+            completed_at=datetime.now(),
+        )
+        if updated:
+            await Strategy.filter(id=record.strategy_id).update(
+                backtest_count=F("backtest_count") + 1,
+                latest_annual_return=to_decimal(summary["annual_return"]),
+                latest_sharpe_ratio=to_decimal(summary["sharpe_ratio"]),
+                latest_win_rate=to_decimal(summary["win_rate"], 2),
+            )
+        logger.info(f"回测完成: {record.name}({backtest_id}), 年化收益 {summary['annual_return']}")
+    except Exception as e:
+        logger.exception(f"回测失败: {record.name}({backtest_id}), {e}")
+        await claimed.update(status=ExecutionStatus.FAILED, error_message=str(e), completed_at=datetime.now())
+    finally:
+        heartbeat.cancel()
+
+
+async def _worker_loop(stop_event) -> None:
+    async with db_context():
+        wakeup = asyncio.Event()
+        async with raw_connection() as listener:
+            await listener.add_listener(CHANNEL, lambda *_: wakeup.set())
+            while not stop_event.is_set():
+                try:
+                    job = await _claim()
+                except Exception as e:
+                    logger.exception(f"领取回测任务失败: {e}")
+                    job = None
+
+                if job:
+                    await _execute(*job)
+                    continue
+
+                wakeup.clear()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+
+def run_worker(stop_event) -> None:
+    """工作进程入口"""
+    asyncio.run(_worker_loop(stop_event))
+
+
+backtest_queue = BacktestQueue()
+
+
+if __name__ == "__main__":
+    run_worker(multiprocessing.Event())
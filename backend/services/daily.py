@@ -1,8 +1,17 @@
 """日线数据 Service"""
 
+from collections import defaultdict
 from datetime import date
+from decimal import Decimal
+from typing import Literal
 
+import numpy as np
+
+from backend.db.market_store import FIELDS, market_store
+from backend.db.session import raw_connection
+from backend.db.timescale import AGGREGATES, timescale
 from backend.models.daily import DailyLine
+from backend.schemas.market import DateBar
 
 from .base import BaseService
 
@@ -28,6 +37,14 @@ class DailyLineService(BaseService[DailyLine, dict, dict]):
             end_date: 结束日期
             limit: 返回数量限制
         """
+        snapshot = market_store.snapshot()
+        if snapshot is not None:
+            dates, columns = snapshot.series(stock_code, start_date, end_date, tuple(FIELDS))
+            return [
+                self._from_store(stock_code, dates[i], {name: values[i] for name, values in columns.items()})
+                for i in range(max(len(dates) - limit, 0), len(dates))
+            ]
+
         query = self.model.filter(stock_code=stock_code)
         if start_date:
             query = query.filter(trade_date__gte=start_date)
@@ -38,6 +55,125 @@ class DailyLineService(BaseService[DailyLine, dict, dict]):
         result = await query.order_by("-trade_date").limit(limit).all()
         return result[::-1]
 
+    async def get_kline(
+        self,
+        stock_code: str,
+        period: Literal["daily", "weekly", "monthly"] = "daily",
+        start_date: date | None = None,
+        end_date: date | None = None,
+        limit: int = 250,
+    ) -> list[DateBar]:
+        """
+        获取日线 / 周线 / 月线（从旧到新）
+
+        周线、月线优先读取 TimescaleDB 连续聚合，按周期内最后一个交易日筛选 [start_date, end_date]；
+        聚合不可用时取日线在 Python 中聚合。
+        """
+        if period == "daily":
+            return [self._to_bar(d) for d in await self.get_history(stock_code, start_date, end_date, limit)]
+
+        if timescale.ready:
+            return await self._from_aggregate(stock_code, period, start_date, end_date, limit)
+
+        # 周/月线需要更多日线来聚合
+        daily_data = await self.get_history(stock_code, start_date, end_date, limit * 31)
+        return aggregate_kline(stock_code, daily_data, period, limit)
+
+    @staticmethod
+    async def _from_aggregate(
+        stock_code: str,
+        period: Literal["weekly", "monthly"],
+        start_date: date | None,
+        end_date: date | None,
+        limit: int,
+    ) -> list[DateBar]:
+        view, _ = AGGREGATES[period]
+        conditions, args = ["stock_code = $1"], [stock_code]
+        if start_date:
+            args.append(start_date)
+            conditions.append(f"trade_date >= ${len(args)}")
+        if end_date:
+            args.append(end_date)
+            conditions.append(f"trade_date <= ${len(args)}")
+        args.append(limit)
+
+        sql = (
+            f"SELECT stock_code, trade_date, open, high, low, close, volume, turnover FROM {view} "
+            f"WHERE {' AND '.join(conditions)} ORDER BY bucket DESC LIMIT ${len(args)}"
+        )
+        async with raw_connection() as conn:
+            rows = await conn.fetch(sql, *args)
+        return [DateBar(**dict(row)) for row in reversed(rows)]
+
+    @staticmethod
+    def _to_bar(item: DailyLine) -> DateBar:
+        return DateBar(
+            stock_code=item.stock_code,
+            trade_date=item.trade_date,
+            open=item.open,
+            high=item.high,
+            low=item.low,
+            close=item.close,
+            volume=item.volume,
+            turnover=item.turnover,
+        )
+
+    @staticmethod
+    def _from_store(stock_code: str, trade_date: np.datetime64, row: dict[str, float]) -> DailyLine:
+        """行情库中的一行转为（未入库的）DailyLine，数值精度与表字段一致"""
+
+        def _decimal(value: float, digits: int) -> Decimal | None:
+            return None if np.isnan(value) else Decimal(str(round(float(value), digits)))
+
+        return DailyLine(
+            stock_code=stock_code,
+            trade_date=trade_date.item(),
+            open=_decimal(row["open"], 4),
+            high=_decimal(row["high"], 4),
+            low=_decimal(row["low"], 4),
+            close=_decimal(row["close"], 4),
+            volume=int(row["volume"]) if not np.isnan(row["volume"]) else 0,
+            turnover=_decimal(row["turnover"], 2),
+        )
+
+
+def aggregate_kline(
+    stock_code: str,
+    daily_data: list[DailyLine],
+    period: Literal["weekly", "monthly"],
+    limit: int,
+) -> list[DateBar]:
+    """将日线聚合为周线/月线"""
+    groups = defaultdict(list)
+
+    for item in daily_data:
+        td = item.trade_date
+        if period == "weekly":
+            # 按周分组 (ISO 周)
+            key = td.isocalendar()[:2]  # (year, week)
+        else:
+            # 按月分组
+            key = (td.year, td.month)
+        groups[key].append(item)
+
+    result = []
+    for key in sorted(groups.keys(), reverse=True)[:limit]:
+        items = sorted(groups[key], key=lambda x: x.trade_date)
+        result.append(
+            DateBar(
+                stock_code=stock_code,
+                trade_date=items[-1].trade_date,
+                open=items[0].open,
+                close=items[-1].close,
+                high=max(i.high for i in items),
+                low=min(i.low for i in items),
+                volume=sum(i.volume for i in items),
+                turnover=sum(i.turnover or Decimal(0) for i in items),
+            )
+        )
+
+    return result[::-1]
+
 
 # 单例
 daily_line_service = DailyLineService()
@@ -0,0 +1,170 @@
+"""日线衍生指标（daily_indicator）的增量计算
+
+- 每次日线写库后，只对变动的交易日用窗口函数重新计算，结果 upsert 到 daily_indicator
+- 窗口函数需要向前回溯一段历史（最长为 60 日均线），回溯数据只参与计算，不写回
+- 选股中的均线、涨跌停次数、涨跌幅、量比等条件直接按 (stock_code, trade_date) 查表
+"""
+
+import asyncio
+from datetime import date, timedelta
+from typing import Awaitable, Callable
+
+from backend.core.calendar import get_trading_calendar
+from backend.core.logger import logger
+from backend.db.session import raw_connection
+from backend.models import DailyIndicator, DailyLine
+from backend.services.ingest import bump_data_version
+
+# 涨跌停判定阈值（相对前收盘价）
+LIMIT_UP_RATIO = 1.099
+LIMIT_DOWN_RATIO = 0.901
+
+# 涨跌停次数统计窗口（交易日）
+LIMIT_WINDOW_DAYS = 30
+
+# 均线周期
+MA_PERIODS = {"ma5": 5, "ma10": 10, "ma20": 20, "ma60": 60}
+
+# 量比：当日成交量 / 前 N 个交易日平均成交量
+VOLUME_RATIO_DAYS = 5
+
+# 计算时向前回溯的交易日数，需覆盖最长均线周期
+LOOKBACK_DAYS = 80
+
+# 单条 SQL 计算的最大自然日跨度，避免大区间重算时单个事务过大
+CHUNK_DAYS = 90
+
+# 可供选股直接查询的指标列
+INDICATOR_FIELDS = (
+    "change_pct",
+    "ma5",
+    "ma10",
+    "ma20",
+    "ma60",
+    "limit_up_count",
+    "limit_down_count",
+    "limit_count",
+    "volume_ratio",
+)
+
+
+def _refresh_sql() -> str:
+    mas = ",\n               ".join(
+        f"AVG(close) OVER (w ROWS BETWEEN {period - 1} PRECEDING AND CURRENT ROW) AS {name}"
+        for name, period in MA_PERIODS.items()
+    )
+    columns = (
+        "stock_code, trade_date, prev_close, change_pct, "
+        + ", ".join(MA_PERIODS)
+        + ", is_limit_up, is_limit_down, limit_up_count, limit_down_count, limit_count, volume_ratio"
+    )
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns.split(", ")[2:])
+
+    return f"""
+    WITH base AS (
+        SELECT stock_code, trade_date, close, volume,
+               LAG(close) OVER w AS prev_close,
+               {mas},
+               AVG(volume) OVER (w ROWS BETWEEN {VOLUME_RATIO_DAYS} PRECEDING AND 1 PRECEDING) AS avg_volume
+        FROM stock_daily_line
+        WHERE trade_date BETWEEN $3::date AND $2::date
+        WINDOW w AS (PARTITION BY stock_code ORDER BY trade_date)
+    ),
+    flags AS (
+        SELECT *,
+               COALESCE(prev_close > 0 AND close >= prev_close * {LIMIT_UP_RATIO}, FALSE) AS is_limit_up,
+               COALESCE(prev_close > 0 AND close <= prev_close * {LIMIT_DOWN_RATIO}, FALSE) AS is_limit_down
+        FROM base
+    ),
+    counts AS (
+        SELECT *,
+               COUNT(*) FILTER (WHERE is_limit_up) OVER r AS limit_up_count,
+               COUNT(*) FILTER (WHERE is_limit_down) OVER r AS limit_down_count,
+               COUNT(*) FILTER (WHERE is_limit_up OR is_limit_down) OVER r AS limit_count
+        FROM flags
+        WINDOW r AS (PARTITION BY stock_code ORDER BY trade_date
+                     ROWS BETWEEN {LIMIT_WINDOW_DAYS - 1} PRECEDING AND CURRENT ROW)
+    )
+    INSERT INTO daily_indicator ({columns})
+    SELECT stock_code, trade_date, prev_close,
+           (close / NULLIF(prev_close, 0) - 1) * 100,
+           {", ".join(MA_PERIODS)},
+           is_limit_up, is_limit_down, limit_up_count, limit_down_count, limit_count,
+           volume / NULLIF(avg_volume, 0)
+    FROM counts
+    WHERE trade_date BETWEEN $1 AND $2
+    ON CONFLICT (stock_code, trade_date) DO UPDATE SET {updates}
+    """
+
+
+class IndicatorService:
+    """日线衍生指标服务"""
+
+    def __init__(self):
+        self._sql = _refresh_sql()
+        self._init_task: asyncio.Task | None = None
+
+    async def refresh(self, start_date: date, end_date: date | None = None) -> int:
+        """
+        重新计算 [start_date, end_date] 内的指标
+
+        Args:
+            start_date: 开始日期，通常为本次同步的开始日期
+            end_date: 截止日期，为空时为最新交易日
+
+        Returns:
+            写入的记录数
+        """
+        if end_date is None:
+            latest = await DailyLine.all().order_by("-trade_date").first()
+            if not latest:
+                return 0
+            end_date = latest.trade_date
+
+        total = 0
+        chunk_start = start_date
+        calendar = await get_trading_calendar()
+        async with raw_connection() as conn:
+            while chunk_start <= end_date:
+                chunk_end = min(chunk_start + timedelta(days=CHUNK_DAYS - 1), end_date)
+                lookback = calendar.offset(chunk_start, -LOOKBACK_DAYS)
+                async with conn.transaction():
+                    status = await conn.execute(self._sql, chunk_start, chunk_end, lookback)
+                    await bump_data_version(conn, chunk_start, chunk_end)
+                total += int(status.split()[-1])
+                chunk_start = chunk_end + timedelta(days=1)
+
+        logger.info(f"指标计算完成: {start_date} ~ {end_date}, 写入 {total} 条")
+        return total
+
+    async def rebuild_if_empty(self) -> int:
+        """指标表为空而日线已有数据时（首次部署），全量计算历史指标"""
+        if await DailyIndicator.exists():
+            return 0
+
+        first = await DailyLine.all().order_by("trade_date").first()
+        if not first:
+            return 0
+
+        logger.info("指标表为空，开始全量计算历史指标")
+        return await self.refresh(first.trade_date)
+
+    def start_initialization(self, on_rebuilt: Callable[[], Awaitable] | None = None) -> None:
+        """
+        在后台执行 rebuild_if_empty，不阻塞服务启动
+
+        Args:
+            on_rebuilt: 实际计算了历史指标后的回调，用于刷新依赖指标的缓存
+        """
+
+        async def _run():
+            try:
+                if await self.rebuild_if_empty() and on_rebuilt:
+                    await on_rebuilt()
+            except Exception as e:
+                logger.exception(f"历史指标计算失败: {e}")
+
+        self._init_task = asyncio.create_task(_run())
+
+
+indicator_service = IndicatorService()
@@ -0,0 +1,210 @@
+"""基于 PostgreSQL COPY 的批量入库
+
+流程：记录先通过 asyncpg copy_records_to_table 写入事务内的临时表，
+再用一条 INSERT ... SELECT ... ON CONFLICT DO UPDATE 合并到目标表。
+全程不创建 ORM 对象，内存占用受 batch_size 限制。
+"""
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Iterable, Sequence
+
+from backend.core.logger import logger
+from backend.db.session import raw_connection
+from backend.schemas.market import DateBar, MinuteBar
+
+
+@dataclass(frozen=True)
+class IngestSpec:
+    """
+    入库目标表描述
+
+    Attributes:
+        table: 目标表名
+        columns: 临时表列定义 [(列名, 临时表类型)]，顺序即记录元组的字段顺序
+        conflict: 唯一约束列，用于 ON CONFLICT
+        casts: 合并时需要转换类型的列 {列名: 目标类型}
+        keep_on_null: 新值为 NULL 时保留旧值的列
+        version_column: 交易日列，设置后合并时递增对应交易日的数据版本号（data_version）
+    """
+
+    table: str
+    columns: tuple[tuple[str, str], ...]
+    conflict: tuple[str, ...]
+    casts: dict[str, str]
+    keep_on_null: tuple[str, ...] = ()
+    version_column: str | None = None
+
+    @property
+    def column_names(self) -> list[str]:
+        return [name for name, _ in self.columns]
+
+    @property
+    def staging_table(self) -> str:
+        return f"_stage_{self.table}"
+
+    def create_staging_sql(self) -> str:
+        cols = ", ".join(f"{name} {type_}" for name, type_ in self.columns)
+        return f"CREATE TEMP TABLE {self.staging_table} ({cols}) ON COMMIT DROP"
+
+    def merge_sql(self) -> str:
+        names = self.column_names
+        select_cols = ", ".join(f"{n}::{self.casts[n]}" if n in self.casts else n for n in names)
+        conflict = ", ".join(self.conflict)
+        updates = ", ".join(
+            (
+                f"{n} = COALESCE(EXCLUDED.{n}, {self.table}.{n})"
+                if n in self.keep_on_null
+                else f"{n} = EXCLUDED.{n}"
+            )
+            for n in names
+            if n not in self.conflict
+        )
+        # DISTINCT ON 去掉批次内的重复键，避免 ON CONFLICT 同一行被更新两次
+        return (
+            f"INSERT INTO {self.table} ({', '.join(names)}) "
+            f"SELECT DISTINCT ON ({conflict}) {select_cols} FROM {self.staging_table} "
+            f"ORDER BY {conflict} "
+            f"ON CONFLICT ({conflict}) DO UPDATE SET {updates}"
+        )
+
+    def bump_version_sql(self) -> str:
+        # 按日期顺序加锁，避免并行写入的批次之间死锁
+        return (
+            "INSERT INTO data_version (trade_date, version, updated_at) "
+            f"SELECT DISTINCT {self.version_column}, 1, now() FROM {self.staging_table} ORDER BY 1 "
+            "ON CONFLICT (trade_date) DO UPDATE SET version = data_version.version + 1, updated_at = now()"
+        )
+
+
+DAILY_LINE_SPEC = IngestSpec(
+    table="stock_daily_line",
+    columns=(
+        ("stock_code", "varchar(20)"),
+        ("trade_date", "date"),
+        ("open", "float8"),
+        ("high", "float8"),
+        ("low", "float8"),
+        ("close", "float8"),
+        ("volume", "int8"),
+        ("turnover", "float8"),
+    ),
+    conflict=("stock_code", "trade_date"),
+    casts={
+        "open": "numeric(10,4)",
+        "high": "numeric(10,4)",
+        "low": "numeric(10,4)",
+        "close": "numeric(10,4)",
+        "turnover": "numeric(20,2)",
+    },
+    keep_on_null=("turnover",),
+    version_column="trade_date",
+)
+
+MINUTE_LINE_SPEC = IngestSpec(
+    table="stock_minute_line",
+    columns=(
+        ("stock_code", "varchar(20)"),
+        ("trade_time", "timestamp"),
+        ("open", "float8"),
+        ("high", "float8"),
+        ("low", "float8"),
+        ("close", "float8"),
+        ("volume", "int8"),
+    ),
+    conflict=("stock_code", "trade_time"),
+    casts={
+        "open": "numeric(10,4)",
+        "high": "numeric(10,4)",
+        "low": "numeric(10,4)",
+        "close": "numeric(10,4)",
+    },
+)
+
+_BUMP_VERSION_SQL = (
+    "INSERT INTO data_version (trade_date, version, updated_at) "
+    "SELECT d::date, 1, now() FROM generate_series($1::date, $2::date, interval '1 day') d "
+    "ON CONFLICT (trade_date) DO UPDATE SET version = data_version.version + 1, updated_at = now()"
+)
+
+
+async def bump_data_version(conn, start_date: date, end_date: date) -> None:
+    """递增 [start_date, end_date] 内每个日期的数据版本号，使依赖这些日期的缓存失效"""
+    await conn.execute(_BUMP_VERSION_SQL, start_date, end_date)
+
+
+class CopyIngestor:
+    """
+    COPY 批量入库器，按 batch_size 自动分批提交
+
+    Examples:
+        async with DailyLineIngestor() as ingestor:
+            await ingestor.add_bars(bars)
+        print(ingestor.total)
+    """
+
+    def __init__(self, spec: IngestSpec, batch_size: int = 50000):
+        self.spec = spec
+        self.batch_size = batch_size
+        self.total = 0
+        self._buffer: list[Sequence] = []
+
+    async def __aenter__(self) -> "CopyIngestor":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            await self.flush()
+
+    async def add(self, records: Iterable[Sequence]) -> None:
+        """追加记录（元组顺序与 spec.columns 一致），缓冲满时自动写库"""
+        self._buffer.extend(records)
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> int:
+        """写入当前缓冲区，返回本批写入条数"""
+        if not self._buffer:
+            return 0
+
+        records, self._buffer = self._buffer, []
+        await self.copy_merge(self.spec, records)
+        self.total += len(records)
+        return len(records)
+
+    @staticmethod
+    async def copy_merge(spec: IngestSpec, records: Sequence[Sequence]) -> None:
+        """在单个事务内完成 COPY 到临时表 + 合并到目标表"""
+        async with raw_connection() as conn:
+            async with conn.transaction():
+                await conn.execute(spec.create_staging_sql())
+                await conn.copy_records_to_table(spec.staging_table, records=records, columns=spec.column_names)
+                status = await conn.execute(spec.merge_sql())
+                if spec.version_column:
+                    await conn.execute(spec.bump_version_sql())
+        logger.debug(f"{spec.table} 合并 {len(records)} 条记录: {status}")
+
+
+class DailyLineIngestor(CopyIngestor):
+    """日线 COPY 入库器"""
+
+    def __init__(self, batch_size: int = 50000):
+        super().__init__(DAILY_LINE_SPEC, batch_size=batch_size)
+
+    async def add_bars(self, bars: Iterable[DateBar]) -> None:
+        await self.add(
+            (bar.stock_code, bar.trade_date, bar.open_, bar.high, bar.low, bar.close, bar.volume, bar.turnover)
+            for bar in bars
+        )
+
+
+class MinuteLineIngestor(CopyIngestor):
+    """1 分钟线 COPY 入库器"""
+
+    def __init__(self, batch_size: int = 50000):
+        super().__init__(MINUTE_LINE_SPEC, batch_size=batch_size)
+
+    async def add_bars(self, stock_code: str, bars: Iterable[MinuteBar]) -> None:
+        await self.add(
+            (stock_code, bar.time, bar.open_, bar.high, bar.low, bar.close, bar.volume) for bar in bars
+        )
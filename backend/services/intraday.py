@@ -0,0 +1,180 @@
+"""当日分钟线增量缓存
+
+每只股票保留已获取的最新交易日分钟线，过期后只向上游请求上一根之后的尾部（多取 OVERLAP 根用于衔接），
+不再每次重取 MINUTE_COUNT 根：
+- 尾部与已有分钟线按时间衔接，最后几根可能仍在形成中，以新数据覆盖
+- 尾部跨入新交易日时，上一交易日最后一根的收盘价作为昨收，分钟线从新交易日重新开始
+- 距上一根过久（如隔夜）或尾部衔接不上时，退回全量获取
+- 最高、最低、成交量为累计值，已确定的分钟线只累计一次
+"""
+
+import bisect
+import math
+from datetime import date, datetime, time
+from time import monotonic
+from typing import List
+
+from cachetools import LRUCache
+
+from backend.core.logger import logger
+from backend.core.provider import aget_price
+from backend.schemas.market import MinuteBar
+
+# 全量获取的分钟线条数，需覆盖一个完整交易日（241 根）及上一交易日的最后一根
+MINUTE_COUNT = 250
+
+# 尾部请求多取的根数，覆盖仍在形成中的分钟线及时间误差
+OVERLAP = 3
+
+# 连续竞价时段
+SESSIONS = ((time(9, 30), time(11, 30)), (time(13, 0), time(15, 0)))
+
+
+def _session_minutes(start: datetime, end: datetime) -> int:
+    """
+    (start, end] 内交易时段的分钟数，只计算 start、end 所在的两个自然日
+
+    用于估算尾部请求的根数；中间还有其他交易日时尾部衔接不上，由调用方退回全量获取
+    """
+    minutes = 0.0
+    for day in {start.date(), end.date()}:
+        for open_, close in SESSIONS:
+            low = max(start, datetime.combine(day, open_))
+            high = min(end, datetime.combine(day, close))
+            if high > low:
+                minutes += (high - low).total_seconds() / 60
+    return math.ceil(minutes)
+
+
+class IntradayBars:
+    """单只股票最新交易日的分钟线及累计值"""
+
+    def __init__(self, pre_close: float | None, bars: List[MinuteBar]):
+        self.pre_close = pre_close
+        self.bars: List[MinuteBar] = []
+        self.fetched_at = monotonic()
+        # bars[:_settled] 已不会再被覆盖，其累计值只计算一次
+        self._settled = 0
+        self._high = -math.inf
+        self._low = math.inf
+        self._volume = 0
+        self._replace_from(0, bars)
+
+    @classmethod
+    def from_bars(cls, bars: List[MinuteBar]) -> "IntradayBars":
+        """由跨越多个交易日的分钟线构建，只保留最新交易日，昨收取其前一根的收盘价"""
+        if not bars:
+            return cls(None, [])
+        latest_date = bars[-1].time.date()
+        start = next(i for i, bar in enumerate(bars) if bar.time.date() == latest_date)
+        return cls(bars[start - 1].close if start else None, bars[start:])
+
+    @property
+    def day(self) -> date | None:
+        return self.bars[-1].time.date() if self.bars else None
+
+    @property
+    def last_time(self) -> datetime | None:
+        return self.bars[-1].time if self.bars else None
+
+    @property
+    def high(self) -> float | None:
+        high = max([self._high, *(bar.high for bar in self.bars[self._settled :])])
+        return None if high == -math.inf else high
+
+    @property
+    def low(self) -> float | None:
+        low = min([self._low, *(bar.low for bar in self.bars[self._settled :])])
+        return None if low == math.inf else low
+
+    @property
+    def volume(self) -> int:
+        return self._volume + sum(bar.volume for bar in self.bars[self._settled :])
+
+    def merge(self, tail: List[MinuteBar]) -> bool:
+        """
+        合并尾部分钟线
+
+        Returns:
+            是否衔接成功；尾部早于或晚于已有分钟线而无法衔接时返回 False，调用方应全量获取
+        """
+        self.fetched_at = monotonic()
+        if not tail:
+            return True
+        if not self.bars or tail[0].time > self.bars[-1].time:
+            return False
+
+        start = bisect.bisect_left([bar.time for bar in self.bars], tail[0].time)
+        latest_date = tail[-1].time.date()
+        if tail[0].time.date() == latest_date == self.day:
+            self._replace_from(start, tail)
+            return True
+
+        # 尾部跨日（跨入新交易日，或开盘不久尾部包含上一交易日）：新交易日之前的最后一根即昨收
+        merged = self.bars[:start] + tail
+        first = next(i for i, bar in enumerate(merged) if bar.time.date() == latest_date)
+        if first:
+            self.pre_close = merged[first - 1].close
+        self._reset()
+        self._replace_from(0, merged[first:])
+        return True
+
+    def _reset(self) -> None:
+        self.bars = []
+        self._settled = 0
+        self._high, self._low, self._volume = -math.inf, math.inf, 0
+
+    def _replace_from(self, start: int, bars: List[MinuteBar]) -> None:
+        if start < self._settled:
+            # 覆盖了已确定的分钟线（数据源修正），重新累计
+            kept = self.bars[:start]
+            self._reset()
+            self.bars = kept
+        self.bars = self.bars[:start] + bars
+
+        # 最后 OVERLAP 根仍可能被下一次尾部覆盖
+        settle_to = max(len(self.bars) - OVERLAP, self._settled)
+        for bar in self.bars[self._settled : settle_to]:
+            self._high = max(self._high, bar.high)
+            self._low = min(self._low, bar.low)
+            self._volume += bar.volume
+        self._settled = settle_to
+
+
+class IntradayBarStore:
+    """当日分钟线增量缓存（并发更新的合并由调用方负责）"""
+
+    def __init__(self, maxsize: int = 1024):
+        self._entries: LRUCache = LRUCache(maxsize=maxsize)
+
+    def get(self, code: str, ttl: float) -> IntradayBars | None:
+        """ttl 秒内更新过的分钟线，否则为 None"""
+        entry = self._entries.get(code)
+        if entry is not None and monotonic() - entry.fetched_at < ttl:
+            return entry
+        return None
+
+    def expire(self, code: str) -> None:
+        """标记为过期，下次获取时增量更新（保留已获取的分钟线）"""
+        entry = self._entries.get(code)
+        if entry is not None:
+            entry.fetched_at = -math.inf
+
+    async def update(self, code: str) -> IntradayBars:
+        """增量更新：只请求上一根之后的尾部，无法增量时全量获取"""
+        entry = self._entries.get(code)
+        if entry is not None and entry.bars:
+            count = _session_minutes(entry.last_time, datetime.now()) + OVERLAP
+            if count < MINUTE_COUNT:
+                tail: List[MinuteBar] = await aget_price(code, count=count, frequency="1m")  # type: ignore
+                if entry.merge(tail):
+                    return entry
+                logger.debug(f"{code} 分钟线尾部无法衔接，重新全量获取")
+
+        bars: List[MinuteBar] = await aget_price(code, count=MINUTE_COUNT, frequency="1m")  # type: ignore
+        entry = IntradayBars.from_bars(bars)
+        self._entries[code] = entry
+        return entry
+
+
+intraday_store = IntradayBarStore()
@@ -0,0 +1,107 @@
+"""分钟线归档与查询
+
+上游的 1 分钟线只保留最近一个交易日左右，且只能实时请求。收盘后把自选股及各选股器最近一次结果中的股票
+的当日分钟线归档到 stock_minute_line（TimescaleDB 超表，见 db/timescale.py），供分钟级回测和历史查询：
+- 并发请求上游（见 core/provider.aget_prices），经 COPY 合并入库，重复归档按 (股票代码, 时间) 覆盖
+- 每只股票只请求最近 MINUTE_COUNT 根，错过当天归档时只能在下一交易日开盘前补归档
+"""
+
+from datetime import date, datetime
+from typing import List
+from zoneinfo import ZoneInfo
+
+from backend.core.calendar import get_trading_calendar
+from backend.core.logger import logger
+from backend.core.provider import aget_prices
+from backend.models import MinuteLine, Selector, SelectorResult, WatchlistStock
+from backend.schemas.market import MinuteBar
+from backend.services.ingest import MinuteLineIngestor
+from backend.services.intraday import MINUTE_COUNT
+
+# 归档的分钟线时间为不带时区的北京时间
+LOCAL_TZ = ZoneInfo("Asia/Shanghai")
+
+
+def _local(value: datetime) -> datetime:
+    """带时区的查询时间换算为北京时间，不带时区的视为北京时间"""
+    return value.astimezone(LOCAL_TZ).replace(tzinfo=None) if value.tzinfo else value
+
+
+class MinuteLineService:
+    """分钟线归档与查询服务"""
+
+    async def archive(self, day: date | None = None, codes: list[str] | None = None) -> int:
+        """
+        归档 day 的 1 分钟线
+
+        Args:
+            day: 归档日期，为空时为今天；非交易日直接跳过
+            codes: 股票代码列表，为空时为自选股及选股结果
+
+        Returns:
+            写入的分钟线条数
+        """
+        day = day or date.today()
+        calendar = await get_trading_calendar()
+        if not calendar.is_trading_day(day):
+            logger.info(f"{day} 不是交易日，跳过分钟线归档")
+            return 0
+
+        codes = codes or await self.archive_codes()
+        if not codes:
+            return 0
+
+        failed = 0
+        async with MinuteLineIngestor() as ingestor:
+            async for code, bars in aget_prices(codes, count=MINUTE_COUNT, frequency="1m", return_exceptions=True):
+                if isinstance(bars, Exception):
+                    failed += 1
+                    continue
+                await ingestor.add_bars(code, (bar for bar in bars if bar.time.date() == day))
+
+        logger.info(f"{day} 分钟线归档完成: {len(codes)} 只股票, {ingestor.total} 条, 失败 {failed} 只")
+        return ingestor.total
+
+    @staticmethod
+    async def archive_codes() -> list[str]:
+        """需要归档的股票：自选股及各启用的选股器最近一次结果"""
+        codes = list(await WatchlistStock.all().values_list("stock__full_stock_code", flat=True))
+        for selector_id in await Selector.filter(is_active=True).values_list("id", flat=True):
+            result = await SelectorResult.filter(selector_id=selector_id).order_by("-trade_date").first()
+            if result:
+                codes.extend(result.stock_codes)
+        return list(dict.fromkeys(code for code in codes if code))
+
+    @staticmethod
+    async def get_range(
+        stock_code: str,
+        start: datetime,
+        end: datetime | None = None,
+        limit: int = 10000,
+    ) -> List[MinuteBar]:
+        """
+        查询已归档的分钟线
+
+        Args:
+            stock_code: 股票代码
+            start: 开始时间（含），不带时区时为北京时间
+            end: 结束时间（含），为空时不限
+            limit: 返回数量上限，超出时保留最早的部分
+
+        Returns:
+            按时间升序的分钟线
+        """
+        query = MinuteLine.filter(stock_code=stock_code, trade_time__gte=_local(start))
+        if end is not None:
+            query = query.filter(trade_time__lte=_local(end))
+
+        rows = await query.order_by("trade_time").limit(limit).values_list(
+            "trade_time", "open", "high", "low", "close", "volume"
+        )
+        return [
+            MinuteBar(time=time, open_=open_, high=high, low=low, close=close, volume=volume)
+            for time, open_, high, low, close, volume in rows
+        ]
+
+
+minute_line_service = MinuteLineService()
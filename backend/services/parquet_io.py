@@ -0,0 +1,432 @@
+"""行情数据的 Parquet 导出与导入
+
+导出：按自然月分区写入 <根目录>/<数据集>/year=YYYY/month=MM/part-0.parquet（Hive 分区）
+- 每个月一条 COPY ... TO STDOUT (FORMAT csv)，输出按 CHUNK_BYTES 切块后由 pyarrow 解析并写入行组，
+  内存占用只与块大小有关，不随表的大小增长
+- 月内按 (股票代码, 日期) 排序，行组带最小/最大值统计，按年月、股票代码、日期过滤时可跳过无关的目录和行组
+- 先写临时文件再原子替换；已导出且之后数据版本（data_version）未更新的月份默认跳过
+
+导入：用 pyarrow.dataset 按条件读取（过滤条件下推到分区与行组），分批经 COPY 合并入库（见 services/ingest.py），
+用于初始化新环境。
+
+研究时可直接读取导出目录，例如：
+    pyarrow.dataset.dataset("data/parquet/daily_line", partitioning="hive").to_table(filter=...)
+
+命令行：
+    python -m backend.services.parquet_io export --start 2010-01-01 --end 2024-12-31
+    python -m backend.services.parquet_io import --root /mnt/seed/parquet --start 2020-01-01
+"""
+
+import argparse
+import asyncio
+import io
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from backend.core.config import Settings
+from backend.core.logger import logger
+from backend.db.market_store import market_store
+from backend.db.session import db_context, raw_connection
+from backend.db.timescale import timescale
+from backend.models import DataVersion
+from backend.services.indicator import indicator_service
+from backend.services.ingest import DAILY_LINE_SPEC, MINUTE_LINE_SPEC, CopyIngestor, IngestSpec
+from backend.services.selector_panel import selector_panel
+
+# COPY 输出累积到该大小后解析并写入一次
+CHUNK_BYTES = 64 * 1024 * 1024
+
+# 每个行组的最大行数
+ROW_GROUP_ROWS = 128 * 1024
+
+# 导入时每批读取的行数
+IMPORT_BATCH_ROWS = 50000
+
+PART_FILE = "part-0.parquet"
+
+
+async def _refresh_daily(start_date: date) -> None:
+    # 导入的历史数据会影响之后交易日的滚动指标，与补数相同，从导入起点重新计算
+    await indicator_service.refresh(start_date)
+    await market_store.sync(since=start_date)
+    await timescale.refresh(start_date)
+    await selector_panel.refresh(since=start_date)
+
+
+@dataclass(frozen=True)
+class ParquetDataset:
+    """
+    可导出的数据集
+
+    Attributes:
+        name: 数据集名，即导出目录名
+        spec: 对应表的入库描述，导入时复用其 COPY 合并逻辑
+        schema: Parquet 列定义，列名与 spec.columns 一致
+        time_column: 按月分区的日期/时间列
+        sort_columns: 月内排序列
+        after_import: 导入完成后的回调，参数为导入数据的最早日期
+    """
+
+    name: str
+    spec: IngestSpec
+    schema: pa.Schema
+    time_column: str
+    sort_columns: tuple[str, ...]
+    after_import: Callable[[date], Awaitable[None]] | None = field(default=None, compare=False)
+
+    def copy_sql(self) -> str:
+        columns = ", ".join(self._select_column(name) for name in self.schema.names)
+        return (
+            f"SELECT {columns} FROM {self.spec.table} "
+            f"WHERE {self.time_column} >= $1::date AND {self.time_column} < $2::date "
+            f"ORDER BY {', '.join(self.sort_columns)}"
+        )
+
+    def _select_column(self, name: str) -> str:
+        # CSV 中的时间不能带时区偏移（如 +08），否则 Arrow 无法解析为不带时区的 timestamp
+        column_type = self.schema.field(name).type
+        if pa.types.is_floating(column_type):
+            return f"{name}::float8"
+        if pa.types.is_timestamp(column_type) and column_type.tz is None:
+            return f"{name}::timestamp"
+        return name
+
+
+DATASETS: dict[str, ParquetDataset] = {
+    "daily_line": ParquetDataset(
+        name="daily_line",
+        spec=DAILY_LINE_SPEC,
+        schema=pa.schema(
+            [
+                ("stock_code", pa.string()),
+                ("trade_date", pa.date32()),
+                ("open", pa.float64()),
+                ("high", pa.float64()),
+                ("low", pa.float64()),
+                ("close", pa.float64()),
+                ("volume", pa.int64()),
+                ("turnover", pa.float64()),
+            ]
+        ),
+        time_column="trade_date",
+        sort_columns=("stock_code", "trade_date"),
+        after_import=_refresh_daily,
+    ),
+    "minute_line": ParquetDataset(
+        name="minute_line",
+        spec=MINUTE_LINE_SPEC,
+        schema=pa.schema(
+            [
+                ("stock_code", pa.string()),
+                ("trade_time", pa.timestamp("s")),
+                ("open", pa.float64()),
+                ("high", pa.float64()),
+                ("low", pa.float64()),
+                ("close", pa.float64()),
+                ("volume", pa.int64()),
+            ]
+        ),
+        time_column="trade_time",
+        sort_columns=("stock_code", "trade_time"),
+    ),
+}
+
+
+def get_dataset(name: str) -> ParquetDataset:
+    dataset = DATASETS.get(name)
+    if dataset is None:
+        raise ValueError(f"不支持的数据集: {name}，可选 {', '.join(DATASETS)}")
+    return dataset
+
+
+def iter_months(start_date: date, end_date: date) -> list[tuple[date, date]]:
+    """[start_date, end_date] 覆盖的自然月，每项为 (月初, 下月初)"""
+    months = []
+    current = start_date.replace(day=1)
+    while current <= end_date:
+        following = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+        months.append((current, following))
+        current = following
+    return months
+
+
+def partition_path(root: str | Path, dataset: str, month: date) -> Path:
+    return Path(root) / dataset / f"year={month.year}" / f"month={month.month:02d}" / PART_FILE
+
+
+def _scalar(spec: ParquetDataset, day: date) -> pa.Scalar:
+    """日期转为与时间列相同类型的标量，用于过滤条件"""
+    return pa.scalar(day, pa.date32()).cast(spec.schema.field(spec.time_column).type)
+
+
+class _MonthWriter:
+    """把一个月的 CSV 输出流解析为 Arrow 表并写入 Parquet，首次有数据时才创建文件"""
+
+    def __init__(self, dataset: ParquetDataset, path: Path):
+        self.dataset = dataset
+        self.path = path
+        self.tmp_path = path.with_suffix(".tmp")
+        self.rows = 0
+        self._writer: pq.ParquetWriter | None = None
+        self._convert = pa_csv.ConvertOptions(
+            column_types=dataset.schema, null_values=[""], quoted_strings_can_be_null=False
+        )
+        self._read = pa_csv.ReadOptions(column_names=dataset.schema.names)
+
+    def write(self, payload: bytes) -> None:
+        table = pa_csv.read_csv(io.BytesIO(payload), read_options=self._read, convert_options=self._convert)
+        if self._writer is None:
+            self.tmp_path.parent.mkdir(parents=True, exist_ok=True)
+            self._writer = pq.ParquetWriter(self.tmp_path, self.dataset.schema, compression="zstd")
+        self._writer.write_table(table.cast(self.dataset.schema), row_group_size=ROW_GROUP_ROWS)
+        self.rows += table.num_rows
+
+    def close(self) -> None:
+        if self._writer is None:
+            # 该月没有数据，删除之前导出的文件
+            self.path.unlink(missing_ok=True)
+            return
+        self._writer.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+
+class ParquetService:
+    """Parquet 导出与导入服务"""
+
+    async def export(
+        self,
+        dataset: str,
+        start_date: date,
+        end_date: date | None = None,
+        root: str | None = None,
+        overwrite: bool = False,
+    ) -> dict:
+        """
+        按月导出 [start_date, end_date] 的数据
+
+        Args:
+            dataset: 数据集名，见 DATASETS
+            start_date: 开始日期（按所在月份整月导出）
+            end_date: 截止日期，为空时为今天
+            root: 导出根目录，默认 Settings.PARQUET_DIR
+            overwrite: 为 True 时重新导出全部月份，否则跳过导出后数据未更新的月份
+
+        Returns:
+            {"months": 导出的月份数, "skipped": 跳过的月份数, "rows": 导出行数}
+        """
+        spec = get_dataset(dataset)
+        root = root or Settings.PARQUET_DIR
+        months = iter_months(start_date, end_date or date.today())
+        updated = None if overwrite else await self._month_updates(spec, months[0][0], months[-1][1])
+
+        stats = {"months": 0, "skipped": 0, "rows": 0}
+        for month_start, month_end in months:
+            path = partition_path(root, dataset, month_start)
+            if updated is not None and self._is_fresh(path, updated.get(month_start)):
+                stats["skipped"] += 1
+                continue
+
+            rows = await self._export_month(spec, path, month_start, month_end)
+            stats["months"] += 1
+            stats["rows"] += rows
+            logger.debug(f"{dataset} {month_start:%Y-%m} 导出 {rows} 行")
+
+        logger.info(
+            f"{dataset} 导出完成: {stats['months']} 个月, {stats['rows']} 行, 跳过 {stats['skipped']} 个月 -> {root}"
+        )
+        return stats
+
+    async def import_(
+        self,
+        dataset: str,
+        root: str | None = None,
+        start_date: date | None = None,
+        end_date: date | None = None,
+        codes: list[str] | None = None,
+    ) -> int:
+        """
+        从导出目录导入数据，已存在的记录按唯一键覆盖
+
+        Args:
+            dataset: 数据集名，见 DATASETS
+            root: 导出根目录，默认 Settings.PARQUET_DIR
+            start_date: 开始日期，为空时不限
+            end_date: 截止日期，为空时不限
+            codes: 股票代码列表，为空时为全部
+
+        Returns:
+            导入的行数
+        """
+        spec = get_dataset(dataset)
+        path = Path(root or Settings.PARQUET_DIR) / dataset
+        if not path.is_dir():
+            raise ValueError(f"导出目录不存在: {path}")
+
+        source = ds.dataset(path, format="parquet", partitioning="hive", schema=self._partitioned_schema(spec))
+        batches = iter(
+            source.to_batches(
+                columns=spec.spec.column_names,
+                filter=self._filter(spec, start_date, end_date, codes),
+                batch_size=IMPORT_BATCH_ROWS,
+            )
+        )
+
+        earliest = None
+        async with CopyIngestor(spec.spec, batch_size=IMPORT_BATCH_ROWS) as ingestor:
+            while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+                if not batch.num_rows:
+                    continue
+                first = pc.min(batch.column(spec.time_column)).as_py()
+                earliest = first if earliest is None else min(earliest, first)
+                columns = [batch.column(name).to_pylist() for name in spec.spec.column_names]
+                await ingestor.add(zip(*columns))
+
+        if earliest is not None and spec.after_import:
+            if isinstance(earliest, datetime):
+                earliest = earliest.date()
+            await spec.after_import(earliest)
+
+        logger.info(f"{dataset} 导入完成: {ingestor.total} 行 <- {path}")
+        return ingestor.total
+
+    @staticmethod
+    def list_partitions(dataset: str, root: str | None = None) -> list[dict]:
+        """已导出的分区，行数取自 Parquet 元数据"""
+        get_dataset(dataset)
+        base = Path(root or Settings.PARQUET_DIR) / dataset
+        partitions = []
+        for path in sorted(base.glob(f"year=*/month=*/{PART_FILE}")):
+            metadata = pq.read_metadata(path)
+            stat = path.stat()
+            partitions.append(
+                {
+                    "year": int(path.parent.parent.name.split("=")[1]),
+                    "month": int(path.parent.name.split("=")[1]),
+                    "rows": metadata.num_rows,
+                    "row_groups": metadata.num_row_groups,
+                    "size": stat.st_size,
+                    "updated_at": datetime.fromtimestamp(stat.st_mtime),
+                }
+            )
+        return partitions
+
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    async def _export_month(spec: ParquetDataset, path: Path, month_start: date, month_end: date) -> int:
+        writer = _MonthWriter(spec, path)
+        buffer = bytearray()
+
+        async def _sink(chunk: bytes) -> None:
+            buffer.extend(chunk)
+            if len(buffer) >= CHUNK_BYTES:
+                # 只解析完整的行，剩余部分留到下一块
+                cut = buffer.rfind(b"\n") + 1
+                payload = bytes(buffer[:cut])
+                del buffer[:cut]
+                await asyncio.to_thread(writer.write, payload)
+
+        try:
+            async with raw_connection() as conn:
+                await conn.copy_from_query(
+                    spec.copy_sql(), month_start, month_end, output=_sink, format="csv"
+                )
+            if buffer:
+                await asyncio.to_thread(writer.write, bytes(buffer))
+            writer.close()
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.rows
+
+    @staticmethod
+    async def _month_updates(spec: ParquetDataset, start: date, end: date) -> dict[date, datetime] | None:
+        """各月份数据的最后更新时间，数据集没有版本号时为 None（总是重新导出）"""
+        if not spec.spec.version_column:
+            return None
+        updates: dict[date, datetime] = {}
+        rows = await DataVersion.filter(trade_date__gte=start, trade_date__lt=end).values_list(
+            "trade_date", "updated_at"
+        )
+        for trade_date, updated_at in rows:
+            month = trade_date.replace(day=1)
+            if month not in updates or updated_at > updates[month]:
+                updates[month] = updated_at
+        return updates
+
+    @staticmethod
+    def _is_fresh(path: Path, updated_at: datetime | None) -> bool:
+        """已导出且之后没有更新；没有版本记录的月份视为未变动"""
+        if not path.exists():
+            return False
+        return updated_at is None or path.stat().st_mtime > updated_at.timestamp()
+
+    @staticmethod
+    def _partitioned_schema(spec: ParquetDataset) -> pa.Schema:
+        return spec.schema.append(pa.field("year", pa.int32())).append(pa.field("month", pa.int32()))
+
+    @staticmethod
+    def _filter(spec: ParquetDataset, start_date: date | None, end_date: date | None, codes: list[str] | None):
+        conditions = []
+        if start_date:
+            conditions.append(
+                (pc.field("year") > start_date.year)
+                | ((pc.field("year") == start_date.year) & (pc.field("month") >= start_date.month))
+            )
+            conditions.append(pc.field(spec.time_column) >= _scalar(spec, start_date))
+        if end_date:
+            conditions.append(
+                (pc.field("year") < end_date.year)
+                | ((pc.field("year") == end_date.year) & (pc.field("month") <= end_date.month))
+            )
+            conditions.append(pc.field(spec.time_column) < _scalar(spec, end_date + timedelta(days=1)))
+        if codes:
+            conditions.append(pc.field("stock_code").isin(codes))
+
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+
+parquet_service = ParquetService()
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="行情数据 Parquet 导出/导入")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("--dataset", default="daily_line", choices=list(DATASETS))
+    parser.add_argument("--root", default=None, help="导出根目录，默认 PARQUET_DIR")
+    parser.add_argument("--start", type=date.fromisoformat, default=None, help="开始日期 YYYY-MM-DD")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="截止日期 YYYY-MM-DD")
+    parser.add_argument("--codes", nargs="*", default=None, help="导入的股票代码，默认全部")
+    parser.add_argument("--overwrite", action="store_true", help="重新导出全部月份")
+    return parser.parse_args()
+
+
+async def _main(args: argparse.Namespace) -> None:
+    async with db_context():
+        if args.action == "export":
+            if args.start is None:
+                raise SystemExit("导出需要指定 --start")
+            await parquet_service.export(args.dataset, args.start, args.end, args.root, args.overwrite)
+        else:
+            await parquet_service.import_(args.dataset, args.root, args.start, args.end, args.codes)
+
+
+if __name__ == "__main__":
+    asyncio.run(_main(_parse_args()))
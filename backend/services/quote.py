@@ -0,0 +1,214 @@
+"""实时行情服务
+
+自选股、总览等接口的实时行情，全部为异步请求，不阻塞事件循环：
+- 行情快照（现价、昨收、高低、成交量额）走腾讯多代码接口，每个请求 60 只
+- 当日分钟线每只股票一个请求，并发数受 Settings.PROVIDER_CONCURRENCY 限制；
+  已获取的分钟线保留在 intraday_store 中，过期后只请求尾部（见 services/intraday.py）
+- 结果按代码缓存 QUOTE_TTL 秒；同一代码的并发请求合并为一次上游请求（single-flight）
+- 强制刷新只失效请求的代码，不影响其他调用方的缓存；推送（见 services/quote_stream.py）的轮询结果同样写入缓存
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Hashable, Iterable, TypeVar
+
+from cachetools import TTLCache
+
+from backend.core.config import Settings
+from backend.core.logger import logger
+from backend.core.provider import RealtimeQuote, aget_realtime_quotes
+from backend.schemas.market import StockQuote
+from backend.services.intraday import IntradayBars, intraday_store
+
+T = TypeVar("T")
+
+# 缓存时间（秒）
+QUOTE_TTL = 60
+
+
+class SingleFlight:
+    """合并并发调用：同一 key 的调用进行中时，后来者等待同一个结果，不再发起新调用"""
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    def _track(self, keys: Iterable[Hashable], future: asyncio.Future) -> None:
+        keys = list(keys)
+        for key in keys:
+            self._calls[key] = future
+
+        def _done(_):
+            for key in keys:
+                if self._calls.get(key) is future:
+                    del self._calls[key]
+
+        future.add_done_callback(_done)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self._track([key], future)
+        # 单个调用方被取消时不影响其他等待者
+        return await asyncio.shield(future)
+
+    async def do_many(
+        self, keys: Iterable[Hashable], func: Callable[[list], Awaitable[dict]]
+    ) -> dict[Hashable, object]:
+        """
+        批量版本：func(未在进行中的 keys) 返回 {key: 结果}；已在进行中的 key 等待对应的调用
+
+        Returns:
+            {key: 结果}，调用失败或结果中没有的 key 不包含在内
+        """
+        keys = list(dict.fromkeys(keys))
+        pending = {key: self._calls[key] for key in keys if key in self._calls}
+        missing = [key for key in keys if key not in pending]
+        if missing:
+            future = asyncio.ensure_future(func(missing))
+            self._track(missing, future)
+            pending.update(dict.fromkeys(missing, future))
+
+        result = {}
+        for future in set(pending.values()):
+            try:
+                values = await asyncio.shield(future)
+            except Exception as e:
+                logger.warning(f"批量请求失败: {e}")
+                continue
+            result.update({key: values[key] for key, f in pending.items() if f is future and key in values})
+        return result
+
+
+class QuoteService:
+    """实时行情服务"""
+
+    def __init__(self):
+        self._snapshots: TTLCache = TTLCache(maxsize=4096, ttl=QUOTE_TTL)
+        self._minute_flight = SingleFlight()
+        self._snapshot_flight = SingleFlight()
+
+    async def get_quotes(self, holding_stocks: list[tuple[str, int]], force_refresh: bool = False) -> list[StockQuote]:
+        """
+        获取多只股票的实时行情及当日分钟明细
+
+        Args:
+            holding_stocks: [(股票代码, 持仓数)]，如 [('600519.SH', 100), ('000001.SZ', 200)]
+            force_refresh: 是否强制刷新这些股票的缓存
+
+        Returns:
+            按传入顺序的行情，快照和分钟线均获取失败的股票不包含在内
+        """
+        codes = list(dict.fromkeys(code for code, _ in holding_stocks))
+        if force_refresh:
+            self.invalidate(codes)
+
+        snapshots, minutes = await asyncio.gather(self.get_snapshots(codes), self._get_minutes_many(codes))
+
+        quotes = []
+        for code, holding_num in holding_stocks:
+            quote = self._build_quote(code, holding_num, snapshots.get(code), minutes[code])
+            if quote is None:
+                logger.warning(f"获取 {code} 实时行情失败")
+                continue
+            quotes.append(quote)
+        return quotes
+
+    def invalidate(self, codes: Iterable[str], minutes: bool = True) -> None:
+        """失效指定股票的缓存，下次读取时重新请求（分钟线只请求尾部）"""
+        for code in codes:
+            self._snapshots.pop(code, None)
+            if minutes:
+                intraday_store.expire(code)
+
+    async def refresh(
+        self, codes: list[str], minutes: bool = True
+    ) -> tuple[dict[str, RealtimeQuote], dict[str, IntradayBars | None]]:
+        """
+        重新请求指定股票的快照（及分钟线）并写入缓存
+
+        Returns:
+            (快照, 分钟线)，minutes 为 False 时分钟线为空字典
+        """
+        self.invalidate(codes, minutes)
+        if not minutes:
+            return await self.get_snapshots(codes), {}
+        return await asyncio.gather(self.get_snapshots(codes), self._get_minutes_many(codes))
+
+    async def get_snapshots(self, codes: list[str]) -> dict[str, RealtimeQuote]:
+        """批量获取行情快照（带缓存）"""
+        result = {code: self._snapshots[code] for code in codes if code in self._snapshots}
+        missing = [code for code in codes if code not in result]
+        if missing:
+            fetched = await self._snapshot_flight.do_many(missing, aget_realtime_quotes)
+            for code, snapshot in fetched.items():
+                self._snapshots[code] = result[code] = snapshot
+        return result
+
+    async def get_today_minutes(self, code: str) -> IntradayBars:
+        """获取单只股票最新交易日的分钟线及昨收、累计值（带缓存，过期后增量更新）"""
+        cached = intraday_store.get(code, QUOTE_TTL)
+        if cached is not None:
+            return cached
+        return await self._minute_flight.do(code, lambda: intraday_store.update(code))
+
+    # ------------------------------------------------------------------
+
+    async def _get_minutes_many(self, codes: list[str]) -> dict[str, IntradayBars | None]:
+        semaphore = asyncio.Semaphore(Settings.PROVIDER_CONCURRENCY)
+
+        async def _get(code: str):
+            async with semaphore:
+                try:
+                    return await self.get_today_minutes(code)
+                except Exception as e:
+                    logger.warning(f"获取 {code} 分钟线失败: {e}")
+                    return None
+
+        return dict(zip(codes, await asyncio.gather(*(_get(code) for code in codes))))
+
+    @staticmethod
+    def _build_quote(
+        code: str,
+        holding_num: int,
+        snapshot: RealtimeQuote | None,
+        intraday: IntradayBars | None,
+    ) -> StockQuote | None:
+        """快照优先，快照缺失时由分钟线的累计值推算"""
+        bars = intraday.bars if intraday is not None else []
+        pre_close = intraday.pre_close if intraday is not None else None
+        if snapshot is not None:
+            latest_price, pre_close = snapshot.price, snapshot.pre_close
+            open_, high, low = snapshot.open, snapshot.high, snapshot.low
+            volume, amount, name = snapshot.volume, snapshot.amount, snapshot.name
+        elif bars:
+            latest_price = bars[-1].close
+            open_ = bars[0].open_
+            high, low = intraday.high, intraday.low
+            volume, amount, name = intraday.volume, None, None
+        else:
+            return None
+
+        pre_close = pre_close or latest_price
+        change = round(latest_price - pre_close, 4)
+        change_percent = round((change / pre_close) * 100, 2) if pre_close else 0
+
+        return StockQuote(
+            code=code,
+            name=name,
+            latest_price=latest_price,
+            pre_close=pre_close,
+            change=change,
+            change_percent=change_percent,
+            open=open_,
+            high=high,
+            low=low,
+            volume=volume,
+            amount=amount,
+            holding_num=holding_num,
+            market_value=holding_num * latest_price,
+            pre_market_value=holding_num * pre_close,
+            bars=list(bars),
+        )
+
+
+quote_service = QuoteService()
@@ -0,0 +1,261 @@
+"""实时行情推送
+
+客户端订阅若干股票代码，全部客户端共用一个后台轮询任务：
+- 每轮只请求全部订阅代码的并集（快照批量请求），上游请求量取决于订阅的股票数，与客户端数、刷新次数无关
+- 与上一轮相比有变化的快照推送为 tick，新增或仍在形成中且有变化的分钟线推送为 bars
+- 分钟线每分钟刷新一次；非交易时段放慢轮询，且已有数据的股票不再请求
+- 轮询结果写入 quote_service 的缓存，/realtime 接口同样受益
+
+推送的消息：
+- {"type": "snapshot", "data": [StockQuote]}：订阅时及客户端积压过多时的全量行情
+- {"type": "tick", "data": [QuoteTick]}：有变化的快照
+- {"type": "bars", "code": 代码, "reset": 是否换日, "data": [MinuteBar]}：分钟线增量，客户端按 time 覆盖或追加；
+  reset 为 true 时 data 为新交易日的全部分钟线
+"""
+
+import asyncio
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncIterator, List
+
+from backend.core.calendar import get_trading_calendar
+from backend.core.config import Settings
+from backend.core.logger import logger
+from backend.core.provider import RealtimeQuote
+from backend.schemas.market import MinuteBar, QuoteTick
+from backend.services.quote import quote_service
+
+# 单个客户端积压的消息上限，超过后丢弃积压的增量，改为推送全量
+QUEUE_SIZE = 256
+
+# 没有消息时的心跳间隔（秒），避免代理断开空闲连接
+HEARTBEAT_INTERVAL = 15
+
+# 交易时段（含集合竞价及收盘后的少量缓冲）
+SESSION_START = (9, 15)
+SESSION_END = (15, 5)
+
+_RESYNC = {"type": "resync"}
+_CLOSE = {"type": "close"}
+
+
+@dataclass(eq=False)
+class Subscription:
+    """一个客户端的订阅：{股票代码: 持仓数}"""
+
+    holdings: dict[str, float]
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(QUEUE_SIZE))
+
+    @property
+    def codes(self) -> set[str]:
+        return set(self.holdings)
+
+
+def _dump(items) -> list[dict]:
+    return [item.model_dump(by_alias=True, mode="json") for item in items]
+
+
+class QuoteStreamHub:
+    """行情推送中心：管理订阅，后台轮询并向各订阅分发增量"""
+
+    def __init__(self):
+        self._subscriptions: set[Subscription] = set()
+        self._refcount: Counter[str] = Counter()
+        # 最近一次推送的快照、分钟线（最后一根）
+        self._ticks: dict[str, QuoteTick] = {}
+        self._bars: dict[str, MinuteBar] = {}
+        self._minute_at: datetime | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def symbols(self) -> list[str]:
+        """当前订阅的股票代码（并集）"""
+        return list(self._refcount)
+
+    async def subscribe(self, holdings: dict[str, float]) -> Subscription:
+        """订阅股票，订阅后首先收到一条全量 snapshot"""
+        subscription = Subscription(dict(holdings))
+        snapshot = await self._snapshot(subscription)
+
+        self._subscriptions.add(subscription)
+        self._refcount.update(subscription.codes)
+        subscription.queue.put_nowait(snapshot)
+        # 取全量期间轮询可能已推进，补发当前状态，客户端按代码覆盖即可
+        ticks = [self._ticks[code] for code in subscription.holdings if code in self._ticks]
+        if ticks:
+            subscription.queue.put_nowait({"type": "tick", "data": _dump(ticks)})
+
+        self._ensure_running()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription not in self._subscriptions:
+            return
+        self._subscriptions.discard(subscription)
+        self._refcount.subtract(subscription.codes)
+        for code in subscription.codes:
+            if self._refcount[code] <= 0:
+                del self._refcount[code]
+                self._ticks.pop(code, None)
+                self._bars.pop(code, None)
+
+    async def events(self, subscription: Subscription) -> AsyncIterator[dict]:
+        """
+        订阅的消息流；没有消息时每 HEARTBEAT_INTERVAL 秒产出 {"type": "ping"}，推送中心关闭时结束
+        """
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                yield {"type": "ping"}
+                continue
+
+            if message is _CLOSE:
+                return
+            if message is _RESYNC:
+                message = await self._snapshot(subscription)
+            yield message
+
+    async def shutdown(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for subscription in self._subscriptions:
+            self._reset_queue(subscription, _CLOSE)
+        self._subscriptions.clear()
+        self._refcount.clear()
+
+    # ------------------------------------------------------------------
+    #                               轮询
+    # ------------------------------------------------------------------
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        logger.info("行情推送轮询已启动")
+        while self._refcount:
+            started = time.monotonic()
+            in_session = await self._in_session()
+            try:
+                await self._poll(in_session)
+            except Exception as e:
+                logger.exception(f"行情推送轮询失败: {e}")
+
+            interval = Settings.QUOTE_STREAM_INTERVAL if in_session else Settings.QUOTE_STREAM_IDLE_INTERVAL
+            await asyncio.sleep(max(interval - (time.monotonic() - started), 0))
+        logger.info("行情推送已无订阅，轮询停止")
+
+    @staticmethod
+    async def _in_session() -> bool:
+        now = datetime.now()
+        calendar = await get_trading_calendar()
+        return calendar.is_trading_day(now) and SESSION_START <= (now.hour, now.minute) < SESSION_END
+
+    async def _poll(self, in_session: bool) -> None:
+        codes = self.symbols
+        if not in_session:
+            # 非交易时段行情不再变化，只补齐还没有数据的股票
+            codes = [code for code in codes if code not in self._ticks]
+        if not codes:
+            return
+
+        minute = datetime.now().replace(second=0, microsecond=0)
+        refresh_minutes = not in_session or self._minute_at != minute
+        snapshots, minutes = await quote_service.refresh(codes, minutes=refresh_minutes)
+        if refresh_minutes:
+            self._minute_at = minute
+
+        ticks: dict[str, QuoteTick] = {}
+        for code in codes:
+            tick = self._to_tick(code, snapshots.get(code))
+            if tick is not None and tick != self._ticks.get(code):
+                # 轮询期间可能已取消订阅
+                if code in self._refcount:
+                    self._ticks[code] = ticks[code] = tick
+
+        bars: dict[str, tuple[bool, List[MinuteBar]]] = {}
+        for code, intraday in minutes.items():
+            delta = self._bar_delta(code, intraday.bars if intraday is not None else [])
+            if delta is not None and code in self._refcount:
+                bars[code] = delta
+
+        for subscription in list(self._subscriptions):
+            changed = [ticks[code] for code in subscription.holdings if code in ticks]
+            if changed:
+                self._publish(subscription, {"type": "tick", "data": _dump(changed)})
+            for code in subscription.codes & bars.keys():
+                reset, data = bars[code]
+                self._publish(subscription, {"type": "bars", "code": code, "reset": reset, "data": _dump(data)})
+
+    def _bar_delta(self, code: str, bars: List[MinuteBar]) -> tuple[bool, List[MinuteBar]] | None:
+        """
+        相对最近推送的分钟线的增量
+
+        Returns:
+            (是否换日, 分钟线)，没有变化时为 None
+        """
+        if not bars:
+            return None
+
+        last = self._bars.get(code)
+        self._bars[code] = bars[-1]
+        if last is None or last.time.date() != bars[-1].time.date():
+            return True, bars
+
+        # 最近推送的一根可能仍在形成中，时间相同也要比较内容
+        delta = [bar for bar in bars if bar.time >= last.time]
+        if not delta or delta == [last]:
+            return None
+        return False, delta
+
+    # ------------------------------------------------------------------
+
+    async def _snapshot(self, subscription: Subscription) -> dict:
+        quotes = await quote_service.get_quotes(list(subscription.holdings.items()))
+        for quote in quotes:
+            if quote.bars:
+                self._bars.setdefault(quote.code, quote.bars[-1])
+        return {"type": "snapshot", "data": _dump(quotes)}
+
+    def _publish(self, subscription: Subscription, message: dict) -> None:
+        try:
+            subscription.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning(f"行情推送客户端积压过多，丢弃 {subscription.queue.qsize()} 条增量并重新推送全量")
+            self._reset_queue(subscription, _RESYNC)
+
+    @staticmethod
+    def _reset_queue(subscription: Subscription, message: dict) -> None:
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(message)
+
+    @staticmethod
+    def _to_tick(code: str, snapshot: RealtimeQuote | None) -> QuoteTick | None:
+        if snapshot is None:
+            return None
+        pre_close = snapshot.pre_close or snapshot.price
+        change = round(snapshot.price - pre_close, 4)
+        return QuoteTick(
+            code=code,
+            name=snapshot.name,
+            latest_price=snapshot.price,
+            pre_close=pre_close,
+            change=change,
+            change_percent=round((change / pre_close) * 100, 2) if pre_close else 0,
+            open=snapshot.open,
+            high=snapshot.high,
+            low=snapshot.low,
+            volume=snapshot.volume,
+            amount=snapshot.amount,
+        )
+
+
+quote_stream_hub = QuoteStreamHub()
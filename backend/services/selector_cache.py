@@ -0,0 +1,128 @@
+"""选股结果缓存
+
+缓存键由四部分组成：规则树的规范化哈希、交易日、该交易日的数据版本号（data_version）、股票列表摘要。
+- 规则树规范化时去掉节点 id、按数据类型解析条件值，内容相同的选股器共享同一条缓存
+- 日线/指标写入会递增对应交易日的版本号，旧的缓存键自然失效，其余交易日的缓存不受影响
+- 股票列表（stocks 表）由外部同步写入，不经过 data_version；其内容（板块、行业、上市日期及股票范围）
+  变化时摘要随之变化，全部缓存键失效。摘要缓存在内存中，日线同步后失效（见 stock_list_version），
+  否则最多 STOCK_LIST_VERSION_TTL 秒后重新计算
+- 容量有限，按 LRU 淘汰
+"""
+
+import hashlib
+import json
+import math
+from datetime import date
+from time import monotonic
+
+from cachetools import LRUCache
+
+from backend.core.config import Settings
+from backend.db.session import raw_connection
+from backend.models import DataVersion
+from backend.models.selector import NodeType, Operator, SelectorFieldEnum
+from backend.services.selector_compiler import parse_condition_value
+
+
+def canonical_rule(tree: dict) -> dict:
+    """规则树的规范形式，与 SelectorService.to_json 导出的 rule 结构一致（不含节点 id）"""
+    if tree.get("node_type") == NodeType.GROUP:
+        return {
+            "node_type": NodeType.GROUP.value,
+            "logic": str(getattr(tree.get("logic"), "value", tree.get("logic"))),
+            "children": [canonical_rule(child) for child in tree.get("children") or []],
+        }
+
+    field_enum = SelectorFieldEnum.get_by_name(tree.get("field") or "")
+    operator = Operator(tree["operator"]) if tree.get("operator") else None
+    value = tree.get("value")
+    if field_enum:
+        value = parse_condition_value(value, operator, field_enum.data_type)
+
+    return {
+        "node_type": NodeType.CONDITION.value,
+        "field": tree.get("field"),
+        "operator": operator.value if operator else None,
+        "value": value,
+    }
+
+
+def rule_hash(tree: dict) -> str:
+    """规则树内容哈希"""
+    payload = json.dumps(canonical_rule(tree), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def get_data_version(trade_date: date) -> int:
+    """交易日当前的数据版本号，从未写入过数据时为 0"""
+    row = await DataVersion.filter(trade_date=trade_date).values_list("version", flat=True)
+    return row[0] if row else 0
+
+
+# 股票列表摘要的缓存时间（秒）；股票列表由外部写入，应用内不一定能感知，最多滞后该时间
+STOCK_LIST_VERSION_TTL = 600
+
+
+class StockListVersion:
+    """股票列表内容的摘要（股票增减或属性变化时改变），缓存在内存中"""
+
+    def __init__(self):
+        self._digest: str | None = None
+        self._computed_at = -math.inf
+
+    async def get(self) -> str:
+        if self._digest is None or monotonic() - self._computed_at >= STOCK_LIST_VERSION_TTL:
+            async with raw_connection() as conn:
+                digest = await conn.fetchval("SELECT md5(string_agg(s::text, ',' ORDER BY s.id)) FROM stocks s")
+            self._digest, self._computed_at = digest or "", monotonic()
+        return self._digest
+
+    def invalidate(self) -> None:
+        """股票列表可能已更新（如同步之后），下次获取时重新计算"""
+        self._digest = None
+
+
+stock_list_version = StockListVersion()
+
+
+class SelectorResultCache:
+    """进程内选股结果 LRU 缓存"""
+
+    def __init__(self, maxsize: int):
+        self._cache: LRUCache = LRUCache(maxsize=maxsize)
+        # {(选股器, 交易日): 已写入的结果对应的缓存键}，命中缓存且结果已写入时跳过写库
+        self._saved: LRUCache = LRUCache(maxsize=maxsize)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(tree: dict, trade_date: date, version: int, stock_version: str) -> tuple[str, date, int, str]:
+        return rule_hash(tree), trade_date, version, stock_version
+
+    def get(self, key: tuple) -> dict | None:
+        value = self._cache.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key: tuple, value: dict) -> None:
+        self._cache[key] = value
+
+    def is_saved(self, selector_id: int, trade_date: date, key: tuple) -> bool:
+        return self._saved.get((selector_id, trade_date)) == key
+
+    def mark_saved(self, selector_id: int, trade_date: date, key: tuple | None) -> None:
+        """记录 (选股器, 交易日) 已写入的结果对应的缓存键，key 为 None 时清除（如批量选股写入了结果）"""
+        if key is None:
+            self._saved.pop((selector_id, trade_date), None)
+        else:
+            self._saved[(selector_id, trade_date)] = key
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._saved.clear()
+
+
+selector_result_cache = SelectorResultCache(Settings.SELECTOR_CACHE_SIZE)
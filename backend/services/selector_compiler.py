@@ -0,0 +1,297 @@
+"""选股规则编译器
+
+将整棵 SelectorNode 规则树编译为一条参数化 SQL：
+- 行情（stock_daily_line）与衍生指标（daily_indicator）按需与 stocks 表 LEFT JOIN，均为按交易日的索引查找
+- 条件节点编译为 WHERE 中的谓词，分组节点编译为 AND/OR 组合
+- 所有条件值均作为参数传入，字段名只来自 SelectorFieldEnum 白名单
+"""
+
+import ast
+import json
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any
+
+from tortoise import connections
+
+from backend.core.logger import logger
+from backend.models.selector import (
+    DataType,
+    FieldType,
+    LogicType,
+    NodeType,
+    Operator,
+    Selector,
+    SelectorFieldEnum,
+    SelectorNode,
+)
+from backend.services.indicator import INDICATOR_FIELDS
+
+
+def parse_list_value(value: str) -> list:
+    """将字符串形式的列表转换为真正的列表"""
+    # 尝试 JSON 解析（如 '["a", "b"]'）
+    try:
+        return json.loads(value)
+    except (json.JSONDecodeError, TypeError):
+        pass
+
+    # 尝试 ast.literal_eval 解析（如 "['a', 'b']"）
+    try:
+        result = ast.literal_eval(value)
+        if isinstance(result, (list, tuple)):
+            return list(result)
+    except (ValueError, SyntaxError):
+        pass
+
+    # 按逗号分割（如 "a, b, c"）
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def parse_condition_value(raw_value: Any, operator: Operator, data_type: DataType) -> Any:
+    """解析条件值，根据操作符和数据类型返回正确类型（已解析的值原样返回）"""
+    if raw_value is None or not isinstance(raw_value, str):
+        return raw_value
+
+    if operator in (Operator.IN, Operator.NOT_IN, Operator.BETWEEN):
+        try:
+            parsed = json.loads(raw_value)
+            if isinstance(parsed, list):
+                return parsed
+        except (json.JSONDecodeError, TypeError):
+            pass
+        return parse_list_value(raw_value)
+
+    if data_type == DataType.NUMBER:
+        try:
+            if "." in raw_value:
+                return float(raw_value)
+            return int(raw_value)
+        except (TypeError, ValueError):
+            pass
+
+    return raw_value
+
+
+def convert_value(value: Any, data_type: DataType) -> Any:
+    """将单个条件值转换为字段数据类型对应的 Python 类型"""
+    try:
+        if data_type == DataType.NUMBER:
+            return float(value)
+        if data_type == DataType.DATE:
+            if isinstance(value, datetime):
+                return value.date()
+            if isinstance(value, date):
+                return value
+            return date.fromisoformat(str(value)[:10])
+        return str(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"条件值无效: {value!r}")
+
+
+async def load_rule_tree(selector: Selector) -> dict | None:
+    """
+    一次查询加载整棵规则树
+
+    返回结构与 SelectorNode.get_tree 一致的字典，条件值保持数据库中的原始字符串。
+    """
+    return (await load_rule_trees([selector.id])).get(selector.id)
+
+
+async def load_rule_trees(selector_ids: list[int]) -> dict[int, dict]:
+    """一次查询加载多个选股器的规则树，返回 {selector_id: 规则树}，没有节点的选股器不在结果中"""
+    nodes = await SelectorNode.filter(selector_id__in=selector_ids).order_by("sort_order", "id")
+
+    children: dict[int | None, list[SelectorNode]] = defaultdict(list)
+    for node in nodes:
+        children[node.parent_id].append(node)
+
+    def _build(node: SelectorNode) -> dict:
+        return {
+            "id": node.id,
+            "node_type": node.node_type,
+            "logic": node.logic,
+            "field": node.field,
+            "operator": node.operator,
+            "value": node.value,
+            "children": [_build(child) for child in children.get(node.id, [])],
+        }
+
+    trees = {}
+    for root in children.get(None, []):
+        trees.setdefault(root.selector_id, _build(root))
+    return trees
+
+
+@dataclass
+class CompiledQuery:
+    """编译结果"""
+
+    sql: str
+    params: list = field(default_factory=list)
+
+
+class SelectorCompiler:
+    """
+    规则树 -> SQL 编译器（单次使用）
+
+    Examples:
+        query = SelectorCompiler(trade_date).compile(tree)
+        rows = await conn.execute_query_dict(query.sql, query.params)
+    """
+
+    def __init__(self, trade_date: date):
+        self.trade_date = trade_date
+        self.params: list = []
+        # 交易日参数在第一个需要按交易日关联的字段出现时才加入，只用基础字段时不传（未引用的参数无法推断类型）
+        self._trade_date_ref: str | None = None
+        self._need_quote = False
+        self._need_indicator = False
+
+    def _param(self, value: Any) -> str:
+        self.params.append(value)
+        return f"${len(self.params)}"
+
+    def _trade_date_param(self) -> str:
+        if self._trade_date_ref is None:
+            self._trade_date_ref = self._param(self.trade_date)
+        return self._trade_date_ref
+
+    def compile(self, tree: dict) -> CompiledQuery:
+        where = self._compile_node(tree)
+
+        joins = []
+        if self._need_quote:
+            joins.append(
+                "LEFT JOIN stock_daily_line q "
+                f"ON q.stock_code = s.full_stock_code AND q.trade_date = {self._trade_date_ref}"
+            )
+        if self._need_indicator:
+            joins.append(
+                "LEFT JOIN daily_indicator i "
+                f"ON i.stock_code = s.full_stock_code AND i.trade_date = {self._trade_date_ref}"
+            )
+
+        sql = "SELECT s.full_stock_code AS stock_code FROM stocks s\n"
+        sql += "".join(f"{join}\n" for join in joins)
+        sql += f"WHERE {where}\nORDER BY s.full_stock_code"
+
+        return CompiledQuery(sql=sql, params=self.params)
+
+    # ------------------------------------------------------------------
+    #                              谓词
+    # ------------------------------------------------------------------
+
+    def _compile_node(self, node: dict) -> str:
+        if node.get("node_type") != NodeType.GROUP:
+            return self._compile_condition(node)
+
+        parts = [self._compile_node(child) for child in node.get("children") or []]
+        if not parts:
+            return "FALSE"
+
+        joiner = " AND " if node.get("logic") == LogicType.AND else " OR "
+        return "(" + joiner.join(parts) + ")"
+
+    def _column(self, field_enum: SelectorFieldEnum) -> str | None:
+        if field_enum.field_type == FieldType.BASIC:
+            return f"s.{field_enum.db_field}"
+
+        # 指标及涨跌幅均已预计算到 daily_indicator
+        if field_enum.db_field in INDICATOR_FIELDS:
+            self._need_indicator = True
+            self._trade_date_param()
+            return f"i.{field_enum.db_field}"
+
+        if field_enum.field_type == FieldType.QUOTE:
+            self._need_quote = True
+            self._trade_date_param()
+            return f"q.{field_enum.db_field}"
+
+        return None
+
+    def _compile_condition(self, node: dict) -> str:
+        field_name = node.get("field")
+        field_enum = SelectorFieldEnum.get_by_name(field_name) if field_name else None
+        if not field_enum:
+            logger.warning(f"Unknown field: {field_name}")
+            return "FALSE"
+
+        column = self._column(field_enum)
+        if column is None:
+            logger.warning(f"Unsupported field: {field_name}")
+            return "FALSE"
+
+        operator = Operator(node["operator"]) if node.get("operator") else None
+        value = parse_condition_value(node.get("value"), operator, field_enum.data_type)
+        return self._predicate(column, operator, value, field_enum.data_type)
+
+    @staticmethod
+    def _like_pattern(value: Any) -> str:
+        escaped = str(value).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return f"%{escaped}%"
+
+    def _predicate(self, column: str, operator: Operator | None, value: Any, data_type: DataType) -> str:
+        if data_type == DataType.NUMBER:
+            column = f"{column}::float8"
+
+        if operator in (Operator.IN, Operator.NOT_IN):
+            values = value if isinstance(value, list) else parse_list_value(str(value))
+            expr = f"{column} = ANY({self._param([convert_value(v, data_type) for v in values])})"
+            return expr if operator == Operator.IN else f"NOT ({expr})"
+
+        if operator == Operator.BETWEEN:
+            values = value if isinstance(value, list) else parse_list_value(str(value))
+            if len(values) != 2:
+                raise ValueError(f"between 条件需要两个值: {value!r}")
+            low, high = (self._param(convert_value(v, data_type)) for v in values)
+            return f"{column} BETWEEN {low} AND {high}"
+
+        if operator in (Operator.CONTAINS, Operator.NOT_CONTAINS):
+            expr = f"{column} ILIKE {self._param(self._like_pattern(value))}"
+            return expr if operator == Operator.CONTAINS else f"NOT ({expr})"
+
+        if operator == Operator.LIKE:
+            return f"{column} LIKE {self._param(self._like_pattern(value))}"
+
+        comparisons = {
+            Operator.EQ: "=",
+            Operator.NE: "<>",
+            Operator.GT: ">",
+            Operator.GTE: ">=",
+            Operator.LT: "<",
+            Operator.LTE: "<=",
+        }
+        if operator in comparisons:
+            return f"{column} {comparisons[operator]} {self._param(convert_value(value, data_type))}"
+
+        logger.warning(f"Unsupported operator: {operator}")
+        return "FALSE"
+
+    # ------------------------------------------------------------------
+    #                              执行
+    # ------------------------------------------------------------------
+
+    @classmethod
+    async def run(cls, tree: dict, trade_date: date) -> list[str]:
+        """编译并执行，单次往返返回命中的股票代码"""
+        query = cls(trade_date).compile(tree)
+        conn = connections.get("default")
+        rows = await conn.execute_query_dict(query.sql, query.params)
+        return [row["stock_code"] for row in rows]
+
+    @classmethod
+    async def explain(cls, tree: dict, trade_date: date, analyze: bool = False) -> dict:
+        """返回编译后的 SQL、参数及执行计划"""
+        query = cls(trade_date).compile(tree)
+        options = "ANALYZE, FORMAT JSON" if analyze else "FORMAT JSON"
+
+        conn = connections.get("default")
+        rows = await conn.execute_query_dict(f"EXPLAIN ({options}) {query.sql}", query.params)
+
+        plan = rows[0]["QUERY PLAN"] if rows else None
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        return {"sql": query.sql, "params": query.params, "plan": plan}
@@ -1,29 +1,24 @@
 """选股执行引擎"""
 
-import ast
-import json
 import time
-from datetime import date, datetime, timedelta
-from typing import Any
+from datetime import date
 
-from tortoise import connections
-from tortoise.expressions import Q
+import numpy as np
+from tortoise.transactions import in_transaction
 
+from backend.core.calendar import get_trading_calendar
 from backend.core.logger import logger
 from backend.models.daily import DailyLine
 from backend.models.selector import (
-    DataType,
-    FieldType,
-    LogicType,
-    NodeType,
-    Operator,
     Selector,
     SelectorField,
-    SelectorFieldEnum,
-    SelectorNode,
     SelectorResult,
 )
 from backend.models.stock import Stock
+from backend.services.selector_cache import get_data_version, selector_result_cache, stock_list_version
+from backend.services.selector_compiler import SelectorCompiler, load_rule_tree, load_rule_trees
+from backend.services.selector_panel import MaskEvaluator, SelectorPanel, referenced_fields, selector_panel
+from backend.services.selector_replay import forward_return_stats, pack_membership
 
 
 class SelectorEngine:
@@ -35,8 +30,8 @@ class SelectorEngine:
         if trade_date is None:
             trade_date = await cls._get_latest_trade_date()
 
-        root_node = await selector.get_root_node()
-        if not root_node:
+        tree = await load_rule_tree(selector)
+        if not tree:
             return {
                 "selector_id": selector.id,
                 "trade_date": trade_date,
@@ -45,18 +40,57 @@ class SelectorEngine:
                 "execution_time": 0,
             }
 
-        stock_codes = await cls._evaluate_node(root_node, trade_date)
+        # 规则、该交易日数据及股票列表均未变化时直接返回缓存；同一选股器同一交易日只保留一条结果记录
+        version = await get_data_version(trade_date)
+        stock_version = await stock_list_version.get()
+        cache_key = selector_result_cache.make_key(tree, trade_date, version, stock_version)
+        cached = selector_result_cache.get(cache_key)
+        if cached is not None:
+            execution_time = int((time.time() - start_time) * 1000)
+            # 该选股器的记录已是同一缓存键下的结果时不再写库；否则（如其他选股器的规则相同、或为旧数据版本的结果）覆盖
+            if not selector_result_cache.is_saved(selector.id, trade_date, cache_key):
+                await cls._save_results(
+                    trade_date,
+                    [
+                        SelectorResult(
+                            selector_id=selector.id,
+                            trade_date=trade_date,
+                            stock_codes=cached["stock_codes"],
+                            count=len(cached["stock_codes"]),
+                            execution_time=execution_time,
+                        )
+                    ],
+                )
+                selector_result_cache.mark_saved(selector.id, trade_date, cache_key)
+            return {
+                "selector_id": selector.id,
+                "trade_date": trade_date,
+                "stock_codes": cached["stock_codes"],
+                "count": len(cached["stock_codes"]),
+                "execution_time": execution_time,
+                "stocks": cached["stocks"],
+                "cached": True,
+            }
+
+        stock_codes = await cls.select(tree, trade_date)
         execution_time = int((time.time() - start_time) * 1000)
 
-        result = await SelectorResult.create(
-            selector_id=selector.id,
-            trade_date=trade_date,
-            stock_codes=stock_codes,
-            count=len(stock_codes),
-            execution_time=execution_time,
+        await cls._save_results(
+            trade_date,
+            [
+                SelectorResult(
+                    selector_id=selector.id,
+                    trade_date=trade_date,
+                    stock_codes=stock_codes,
+                    count=len(stock_codes),
+                    execution_time=execution_time,
+                )
+            ],
         )
+        selector_result_cache.mark_saved(selector.id, trade_date, cache_key)
 
         stocks = await cls._get_stock_details(stock_codes)
+        selector_result_cache.put(cache_key, {"stock_codes": stock_codes, "stocks": stocks})
 
         return {
             "selector_id": selector.id,
@@ -65,273 +99,182 @@ class SelectorEngine:
             "count": len(stock_codes),
             "execution_time": execution_time,
             "stocks": stocks,
+            "cached": False,
         }
 
     @classmethod
-    async def _get_latest_trade_date(cls) -> date:
-        latest = await DailyLine.all().order_by("-trade_date").first()
-        return latest.trade_date if latest else date.today()
-
-    @classmethod
-    async def _evaluate_node(cls, node: SelectorNode, trade_date: date) -> list[str]:
-        if node.node_type == NodeType.CONDITION:
-            return await cls._evaluate_condition(node, trade_date)
-
-        children = await node.children.order_by("sort_order").all()
-        if not children:
-            return []
-
-        result_sets = []
-        for child in children:
-            child_codes = await cls._evaluate_node(child, trade_date)
-            result_sets.append(set(child_codes))
+    async def execute_all(cls, trade_date: date | None = None) -> list[dict]:
+        """
+        批量执行全部启用的选股器
 
-        if node.logic == LogicType.AND:
-            final_codes = set.intersection(*result_sets) if result_sets else set()
-        else:
-            final_codes = set.union(*result_sets) if result_sets else set()
+        所有选股器共用同一份截面数据（常驻面板，或按交易日加载的单日快照），
+        相同条件的掩码只计算一次，结果一次批量写入。
+        """
+        start_time = time.time()
 
-        return list(final_codes)
+        if trade_date is None:
+            trade_date = await cls._get_latest_trade_date()
 
-    @classmethod
-    async def _evaluate_condition(cls, node: SelectorNode, trade_date: date) -> list[str]:
-        field = node.field
-        operator = node.operator
-        raw_value = node.value
-
-        field_enum = SelectorFieldEnum.get_by_name(field) if field else None
-        if not field_enum:
-            logger.warning(f"Unknown field: {field}")
+        selectors = await Selector.filter(is_active=True).order_by("id")
+        trees = await load_rule_trees([s.id for s in selectors])
+        if not trees:
             return []
 
-        value = cls._parse_value(raw_value, operator, field_enum.data_type)
+        snapshot = selector_panel.snapshot
+        if snapshot is None or not selector_panel.covers(trade_date):
+            snapshot = await SelectorPanel.load_snapshot([trade_date])
+        evaluator = MaskEvaluator(snapshot, snapshot.day_index(trade_date))
 
-        if field_enum.field_type == FieldType.BASIC:
-            return await cls._filter_basic_field(field_enum.db_field, operator, value)
-        elif field_enum.field_type == FieldType.QUOTE:
-            return await cls._filter_quote_field(field_enum.db_field, operator, value, trade_date)
-        elif field_enum.field_type == FieldType.INDICATOR:
-            return await cls._filter_indicator_field(field, operator, value, trade_date)
-        else:
-            logger.warning(f"Unknown field type: {field_enum.field_type}")
-            return []
+        results = []
+        for selector in selectors:
+            tree = trees.get(selector.id)
+            if not tree:
+                continue
 
-    @classmethod
-    async def _filter_basic_field(cls, db_field: str, operator: Operator, value: Any) -> list[str]:
-        q = cls._build_q(db_field, operator, value)
-        stocks = await Stock.filter(q).values_list("full_stock_code", flat=True)
-        return list(stocks)
+            selector_start = time.perf_counter()
+            try:
+                mask = evaluator.evaluate(tree)
+            except ValueError as e:
+                logger.warning(f"选股器 {selector.id} 条件无效，跳过: {e}")
+                continue
+
+            stock_codes = [snapshot.stock_codes[i] for i in np.flatnonzero(mask)]
+            results.append(
+                SelectorResult(
+                    selector_id=selector.id,
+                    trade_date=trade_date,
+                    stock_codes=stock_codes,
+                    count=len(stock_codes),
+                    execution_time=int((time.perf_counter() - selector_start) * 1000),
+                )
+            )
 
-    @classmethod
-    async def _filter_quote_field(cls, db_field: str, operator: Operator, value: Any, trade_date: date) -> list[str]:
-        q = Q(trade_date=trade_date)
-        q &= cls._build_q(db_field, operator, value)
+        await cls._save_results(trade_date, results)
 
-        lines = await DailyLine.filter(q).values_list("stock_code", flat=True)
-        return list(lines)
+        logger.info(
+            f"批量选股完成: {trade_date}, {len(results)} 个选股器, 耗时 {int((time.time() - start_time) * 1000)}ms"
+        )
+        return [
+            {
+                "selector_id": r.selector_id,
+                "trade_date": r.trade_date,
+                "count": r.count,
+                "execution_time": r.execution_time,
+            }
+            for r in results
+        ]
 
-    @classmethod
-    async def _filter_indicator_field(cls, field: str, operator: Operator, value: Any, trade_date: date) -> list[str]:
-        if field == "limit_up_count":
-            return await cls._filter_limit_count(trade_date, value, operator, is_up=True)
-        elif field == "limit_down_count":
-            return await cls._filter_limit_count(trade_date, value, operator, is_up=False)
-        elif field == "limit_count":
-            return await cls._filter_limit_count_total(trade_date, value, operator)
-        elif field in ("ma5", "ma10", "ma20"):
-            return await cls._filter_ma(field, operator, value, trade_date)
-        return []
+    @staticmethod
+    async def _save_results(trade_date: date, results: list[SelectorResult]) -> None:
+        """写入选股结果，覆盖这些选股器在该交易日已有的记录（每个选股器每个交易日只保留一条）"""
+        if not results:
+            return
+        async with in_transaction():
+            await SelectorResult.filter(
+                selector_id__in=[r.selector_id for r in results], trade_date=trade_date
+            ).delete()
+            await SelectorResult.bulk_create(results)
+        # 记录已被覆盖，由调用方重新标记对应的缓存键
+        for result in results:
+            selector_result_cache.mark_saved(result.selector_id, trade_date, None)
 
     @classmethod
-    async def _filter_limit_count(cls, trade_date: date, count: int, operator: Operator, is_up: bool) -> list[str]:
-        days = 30
-        start_date = trade_date - timedelta(days=days)
-
-        threshold = 1.099 if is_up else 0.901
-        cmp_op = ">=" if is_up else "<="
-
-        sql = f"""
-        WITH daily_data AS (
-            SELECT stock_code, trade_date, close,
-                   LAG(close) OVER (PARTITION BY stock_code ORDER BY trade_date) AS prev_close
-            FROM stock_daily_line
-            WHERE trade_date BETWEEN '{start_date}' AND '{trade_date}'
-        ),
-        limit_hits AS (
-            SELECT stock_code,
-                   COUNT(*) FILTER (
-                       WHERE prev_close > 0
-                       AND close {cmp_op} prev_close * {threshold}
-                   ) AS hit_count
-            FROM daily_data
-            GROUP BY stock_code
-        )
-        SELECT stock_code FROM limit_hits
+    async def replay(
+        cls,
+        selector: Selector,
+        start_date: date,
+        end_date: date,
+        horizons: list[int] | None = None,
+    ) -> dict:
         """
+        在 [start_date, end_date] 的每个交易日上回放选股器
 
-        if operator == Operator.GTE:
-            sql += f" WHERE hit_count >= {count}"
-        elif operator == Operator.GT:
-            sql += f" WHERE hit_count > {count}"
-        elif operator == Operator.LTE:
-            sql += f" WHERE hit_count <= {count}"
-        elif operator == Operator.LT:
-            sql += f" WHERE hit_count < {count}"
-        elif operator == Operator.EQ:
-            sql += f" WHERE hit_count = {count}"
-
-        conn = connections.get("default")
-        result = await conn.execute_query_dict(sql)
-        return [row["stock_code"] for row in result]
+        一次加载区间内的行情与指标，对全部交易日向量化求值，不写入选股结果。
 
-    @classmethod
-    async def _filter_limit_count_total(cls, trade_date: date, count: int, operator: Operator) -> list[str]:
-        days = 30
-        start_date = trade_date - timedelta(days=days)
-
-        sql = f"""
-        WITH daily_data AS (
-            SELECT stock_code, trade_date, close,
-                   LAG(close) OVER (PARTITION BY stock_code ORDER BY trade_date) AS prev_close
-            FROM stock_daily_line
-            WHERE trade_date BETWEEN '{start_date}' AND '{trade_date}'
-        ),
-        limit_hits AS (
-            SELECT stock_code,
-                   COUNT(*) FILTER (
-                       WHERE prev_close > 0
-                       AND (close >= prev_close * 1.099 OR close <= prev_close * 0.901)
-                   ) AS hit_count
-            FROM daily_data
-            GROUP BY stock_code
-        )
-        SELECT stock_code FROM limit_hits
+        Args:
+            selector: 选股器
+            start_date: 开始日期
+            end_date: 截止日期
+            horizons: 未来收益的持有交易日数，默认 [1, 5, 10]
+
+        Returns:
+            入选位图（见 selector_replay.pack_membership）、每日入选数量及各持有期的收益统计
         """
+        start_time = time.time()
+        horizons = sorted({int(h) for h in (horizons or [1, 5, 10]) if int(h) > 0})
+        max_horizon = max(horizons, default=0)
 
-        if operator == Operator.GTE:
-            sql += f" WHERE hit_count >= {count}"
-        elif operator == Operator.GT:
-            sql += f" WHERE hit_count > {count}"
-        elif operator == Operator.LTE:
-            sql += f" WHERE hit_count <= {count}"
-        elif operator == Operator.LT:
-            sql += f" WHERE hit_count < {count}"
-        elif operator == Operator.EQ:
-            sql += f" WHERE hit_count = {count}"
-
-        conn = connections.get("default")
-        result = await conn.execute_query_dict(sql)
-        return [row["stock_code"] for row in result]
+        calendar = await get_trading_calendar()
+        trade_days = calendar.trading_days(start_date, end_date)
+        tree = await load_rule_tree(selector)
 
-    @classmethod
-    async def _filter_ma(cls, ma_field: str, operator: Operator, value: Any, trade_date: date) -> list[str]:
-        days_map = {"ma5": 5, "ma10": 10, "ma20": 20}
-        days = days_map.get(ma_field, 5)
-        start_date = trade_date - timedelta(days=days + 10)
-
-        sql = f"""
-        WITH ma_data AS (
-            SELECT stock_code, trade_date, close,
-                   AVG(close) OVER (
-                       PARTITION BY stock_code
-                       ORDER BY trade_date
-                       ROWS BETWEEN {days - 1} PRECEDING AND CURRENT ROW
-                   ) AS ma
-            FROM stock_daily_line
-            WHERE trade_date BETWEEN '{start_date}' AND '{trade_date}'
-        )
-        SELECT stock_code FROM ma_data
-        WHERE trade_date = '{trade_date}'
-        """
+        # 计算未来收益需要区间之后的若干交易日
+        after = calendar.trading_days(calendar.next_trading_day(end_date), calendar.offset(end_date, max_horizon))
+        fields = (referenced_fields(tree) if tree else set()) | {"close"}
+        snapshot = await SelectorPanel.load_snapshot(trade_days + after, fields=fields)
 
-        if operator == Operator.GTE:
-            sql += f" AND ma >= {value}"
-        elif operator == Operator.GT:
-            sql += f" AND ma > {value}"
-        elif operator == Operator.LTE:
-            sql += f" AND ma <= {value}"
-        elif operator == Operator.LT:
-            sql += f" AND ma < {value}"
-        elif operator == Operator.EQ:
-            sql += f" AND ma = {value}"
-
-        conn = connections.get("default")
-        result = await conn.execute_query_dict(sql)
-        return [row["stock_code"] for row in result]
+        if tree and trade_days:
+            mask = MaskEvaluator(snapshot, np.arange(len(trade_days))).evaluate(tree)
+        else:
+            mask = np.zeros((len(trade_days), len(snapshot.stock_codes)), dtype=bool)
+
+        close = snapshot.quotes["close"]
+        return {
+            "selector_id": selector.id,
+            "trade_days": trade_days,
+            "stock_codes": snapshot.stock_codes,
+            "bitmap": pack_membership(mask),
+            "counts": mask.sum(axis=1).tolist(),
+            "stats": [forward_return_stats(mask, close, h) for h in horizons],
+            "execution_time": int((time.time() - start_time) * 1000),
+        }
 
     @classmethod
-    def _parse_value(cls, raw_value: str | None, operator: Operator, data_type: DataType) -> Any:
-        """解析存储的值，根据操作符和数据类型返回正确类型"""
-        if raw_value is None:
-            return raw_value
+    async def select(cls, tree: dict, trade_date: date) -> list[str]:
+        """执行规则树，面板覆盖该交易日时在内存中求值，否则编译为 SQL 查询"""
+        if selector_panel.covers(trade_date):
+            return selector_panel.select(tree, trade_date)
+        return await SelectorCompiler.run(tree, trade_date)
 
-        if operator in (Operator.IN, Operator.NOT_IN):
-            try:
-                parsed = json.loads(raw_value)
-                if isinstance(parsed, list):
-                    return parsed
-            except (json.JSONDecodeError, TypeError):
-                pass
+    @classmethod
+    async def preview(cls, tree: dict, trade_date: date | None = None) -> dict:
+        """试算规则树，不保存选股结果，用于界面上调整条件"""
+        start_time = time.perf_counter()
 
-        if data_type == DataType.NUMBER:
-            try:
-                if "." in str(raw_value):
-                    return float(raw_value)
-                return int(raw_value)
-            except (TypeError, ValueError):
-                pass
+        if trade_date is None:
+            trade_date = await cls._get_latest_trade_date()
 
-        return raw_value
+        source = "panel" if selector_panel.covers(trade_date) else "sql"
+        stock_codes = await cls.select(tree, trade_date)
+        return {
+            "trade_date": trade_date,
+            "stock_codes": stock_codes,
+            "count": len(stock_codes),
+            "execution_time": round((time.perf_counter() - start_time) * 1000, 3),
+            "source": source,
+        }
 
     @classmethod
-    def _build_q(cls, field: str, operator: Operator, value: Any) -> Q:
-        # 处理 IN 和 NOT_IN 时，确保 value 是列表
-        if operator in (Operator.IN, Operator.NOT_IN) and isinstance(value, str):
-            value = cls._parse_list_value(value)
-
-        if operator == Operator.EQ:
-            return Q(**{field: value})
-        elif operator == Operator.NE:
-            return ~Q(**{field: value})
-        elif operator == Operator.GT:
-            return Q(**{f"{field}__gt": value})
-        elif operator == Operator.GTE:
-            return Q(**{f"{field}__gte": value})
-        elif operator == Operator.LT:
-            return Q(**{f"{field}__lt": value})
-        elif operator == Operator.LTE:
-            return Q(**{f"{field}__lte": value})
-        elif operator == Operator.IN:
-            return Q(**{f"{field}__in": value})
-        elif operator == Operator.NOT_IN:
-            return ~Q(**{f"{field}__in": value})
-        elif operator == Operator.CONTAINS:
-            return Q(**{f"{field}__icontains": value})
-        elif operator == Operator.NOT_CONTAINS:
-            return ~Q(**{f"{field}__icontains": value})
-        elif operator == Operator.LIKE:
-            return Q(**{f"{field}__contains": value})
-        return Q()
+    async def explain(cls, selector: Selector, trade_date: date | None = None, analyze: bool = False) -> dict:
+        """返回选股器编译后的 SQL 与执行计划"""
+        if trade_date is None:
+            trade_date = await cls._get_latest_trade_date()
+
+        tree = await load_rule_tree(selector)
+        if not tree:
+            return {"selector_id": selector.id, "trade_date": trade_date, "sql": None, "params": [], "plan": None}
+
+        explained = await SelectorCompiler.explain(tree, trade_date, analyze=analyze)
+        return {"selector_id": selector.id, "trade_date": trade_date, **explained}
 
     @classmethod
-    def _parse_list_value(cls, value: str) -> list:
-        """将字符串形式的列表转换为真正的列表"""
-        # 尝试 JSON 解析（如 '["a", "b"]'）
-        try:
-            return json.loads(value)
-        except (json.JSONDecodeError, TypeError):
-            pass
-
-        # 尝试 ast.literal_eval 解析（如 "['a', 'b']"）
-        try:
-            result = ast.literal_eval(value)
-            if isinstance(result, (list, tuple)):
-                return list(result)
-        except (ValueError, SyntaxError):
-            pass
-
-        # 按逗号分割（如 "a, b, c"）
-        return [v.strip() for v in value.split(",") if v.strip()]
+    async def _get_latest_trade_date(cls) -> date:
+        latest = selector_panel.latest_trade_date
+        if latest:
+            return latest
+
+        latest = await DailyLine.all().order_by("-trade_date").first()
+        return latest.trade_date if latest else date.today()
 
     @classmethod
     async def _get_stock_details(cls, stock_codes: list[str]) -> list[dict]:
@@ -344,24 +287,13 @@ class SelectorEngine:
     @classmethod
     async def get_field_definitions(cls) -> list[dict]:
         cached = await SelectorField.all().order_by("sort_order")
-        if cached:
-            return [
-                {
-                    "id": f.id,
-                    "name": f.name,
-                    "label": f.label,
-                    "field_type": f.field_type,
-                    "data_type": f.data_type,
-                    "operators": f.operators,
-                    "options": f.options,
-                    "unit": f.unit,
-                    "description": f.description,
-                }
-                for f in cached
-            ]
-
-        default_fields = cls._get_default_field_definitions()
-        for i, f in enumerate(default_fields):
+
+        # 补充新增的默认字段
+        existing = {f.name for f in cached}
+        missing = [
+            (i, f) for i, f in enumerate(cls._get_default_field_definitions()) if f["name"] not in existing
+        ]
+        for i, f in missing:
             await SelectorField.create(
                 name=f["name"],
                 label=f["label"],
@@ -373,7 +305,23 @@ class SelectorEngine:
                 description=f.get("description"),
                 sort_order=i,
             )
-        return default_fields
+        if missing:
+            cached = await SelectorField.all().order_by("sort_order")
+
+        return [
+            {
+                "id": f.id,
+                "name": f.name,
+                "label": f.label,
+                "field_type": f.field_type,
+                "data_type": f.data_type,
+                "operators": f.operators,
+                "options": f.options,
+                "unit": f.unit,
+                "description": f.description,
+            }
+            for f in cached
+        ]
 
     @classmethod
     def _get_default_field_definitions(cls) -> list[dict]:
@@ -456,6 +404,14 @@ class SelectorEngine:
                 "operators": ["eq", "ne", "gt", "gte", "lt", "lte", "between"],
                 "unit": "元",
             },
+            {
+                "name": "change_pct",
+                "label": "涨跌幅",
+                "field_type": "quote",
+                "data_type": "number",
+                "operators": ["gt", "gte", "lt", "lte", "between"],
+                "unit": "%",
+            },
             {
                 "name": "limit_up_count",
                 "label": "涨停次数(近30日)",
@@ -504,6 +460,22 @@ class SelectorEngine:
                 "operators": ["eq", "ne", "gt", "gte", "lt", "lte"],
                 "unit": "元",
             },
+            {
+                "name": "ma60",
+                "label": "60日均线",
+                "field_type": "indicator",
+                "data_type": "number",
+                "operators": ["eq", "ne", "gt", "gte", "lt", "lte"],
+                "unit": "元",
+            },
+            {
+                "name": "volume_ratio",
+                "label": "量比",
+                "field_type": "indicator",
+                "data_type": "number",
+                "operators": ["gt", "gte", "lt", "lte", "between"],
+                "description": "当日成交量与前5个交易日平均成交量之比",
+            },
         ]
 
 
@@ -0,0 +1,433 @@
+"""选股内存面板
+
+进程内常驻最近 N 个交易日的全市场日线及股票属性，选股条件在面板上以向量化布尔掩码求值，
+AND/OR 为按位运算，执行全程不访问数据库，用于界面上交互式调整选股条件。
+
+- 行情：open/high/low/close/volume/turnover 及 daily_indicator 中的指标列各为 (交易日 × 股票) 的 float64 矩阵，
+  无数据（停牌）为 NaN
+- 属性：字符串列字典编码为 int32 代码 + 类别表（-1 表示空），日期列为 datetime64[D]
+- 刷新：同步完成后只重新加载变动的交易日并滚动丢弃最旧的数据；每次加载生成新的快照整体替换，
+  求值过程中不会读到半更新的数据
+- 求值语义与 SelectorCompiler 生成的 SQL 保持一致（指标同样取自 daily_indicator，空值比较均为假）
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Iterable
+
+import numpy as np
+
+from backend.core.calendar import get_trading_calendar
+from backend.core.config import Settings
+from backend.core.logger import logger
+from backend.db.session import raw_connection
+from backend.models import Stock
+from backend.models.selector import (
+    DataType,
+    FieldType,
+    LogicType,
+    NodeType,
+    Operator,
+    SelectorFieldEnum,
+)
+from backend.services.indicator import INDICATOR_FIELDS
+from backend.services.selector_compiler import (
+    convert_value,
+    parse_condition_value,
+    parse_list_value,
+)
+
+QUOTE_FIELDS = ("open", "high", "low", "close", "volume", "turnover")
+
+PANEL_FIELDS = QUOTE_FIELDS + INDICATOR_FIELDS
+
+# 加载行情时每次查询的交易日数
+LOAD_CHUNK_DAYS = 60
+
+
+@dataclass
+class CategoricalColumn:
+    """字典编码的字符串列"""
+
+    codes: np.ndarray  # int32，-1 表示空值
+    categories: list[str]
+
+    @classmethod
+    def encode(cls, values: list[str | None]) -> "CategoricalColumn":
+        categories = sorted({v for v in values if v is not None})
+        index = {v: i for i, v in enumerate(categories)}
+        codes = np.fromiter((index.get(v, -1) for v in values), dtype=np.int32, count=len(values))
+        return cls(codes=codes, categories=categories)
+
+    def codes_of(self, values) -> list[int]:
+        """取值对应的编码，不存在的取值忽略"""
+        index = {v: i for i, v in enumerate(self.categories)}
+        return [index[str(v)] for v in values if str(v) in index]
+
+    def codes_matching(self, predicate) -> list[int]:
+        """满足条件的类别编码，类别数远小于股票数，逐个判断即可"""
+        return [i for i, v in enumerate(self.categories) if predicate(v)]
+
+
+@dataclass
+class PanelSnapshot:
+    """面板快照，加载完成后只读"""
+
+    trade_days: np.ndarray  # datetime64[D]，升序
+    stock_codes: list[str]  # 升序，与 SQL 结果的排序一致
+    quotes: dict[str, np.ndarray]  # 字段 -> (交易日, 股票)
+    attributes: dict[str, Any]  # 字段 -> CategoricalColumn | datetime64[D] 数组
+    loaded_at: datetime = field(default_factory=datetime.now)
+
+    def day_index(self, trade_date: date) -> int | None:
+        pos = int(np.searchsorted(self.trade_days, np.datetime64(trade_date, "D")))
+        if pos < len(self.trade_days) and self.trade_days[pos] == np.datetime64(trade_date, "D"):
+            return pos
+        return None
+
+    def covers(self, trade_date: date) -> bool:
+        return self.day_index(trade_date) is not None
+
+
+class MaskEvaluator:
+    """
+    在面板快照上对规则树求值
+
+    day 为单个交易日下标时返回 (股票数,) 的掩码；为下标数组时返回 (交易日数, 股票数) 的掩码，
+    同一个求值器内相同条件只计算一次。
+    """
+
+    def __init__(self, snapshot: PanelSnapshot, day: int | np.ndarray):
+        self.snapshot = snapshot
+        self.day = day
+        self.shape = (len(day), len(snapshot.stock_codes)) if np.ndim(day) else (len(snapshot.stock_codes),)
+        self._columns: dict[str, np.ndarray] = {}
+        self._masks: dict[tuple, np.ndarray] = {}
+
+    def evaluate(self, node: dict) -> np.ndarray:
+        mask = self._evaluate_node(node)
+        return np.broadcast_to(mask, self.shape)
+
+    def _evaluate_node(self, node: dict) -> np.ndarray | bool:
+        if node.get("node_type") != NodeType.GROUP:
+            return self._evaluate_condition(node)
+
+        children = node.get("children") or []
+        if not children:
+            return np.zeros(self.shape, dtype=bool)
+
+        masks = [self._evaluate_node(child) for child in children]
+        if node.get("logic") == LogicType.AND:
+            return np.logical_and.reduce(np.broadcast_arrays(*masks))
+        return np.logical_or.reduce(np.broadcast_arrays(*masks))
+
+    def _evaluate_condition(self, node: dict) -> np.ndarray:
+        field_name = node.get("field")
+        field_enum = SelectorFieldEnum.get_by_name(field_name) if field_name else None
+        if not field_enum:
+            logger.warning(f"Unknown field: {field_name}")
+            return np.zeros(self.shape, dtype=bool)
+
+        operator = Operator(node["operator"]) if node.get("operator") else None
+        key = (field_enum.field_name, operator, repr(node.get("value")))
+        if key not in self._masks:
+            value = parse_condition_value(node.get("value"), operator, field_enum.data_type)
+            self._masks[key] = self._condition_mask(field_enum, operator, value)
+        return self._masks[key]
+
+    # ------------------------------------------------------------------
+    #                              取列
+    # ------------------------------------------------------------------
+
+    def _column(self, field_enum: SelectorFieldEnum) -> Any:
+        name = field_enum.field_name
+        if name not in self._columns:
+            if field_enum.field_type == FieldType.BASIC:
+                self._columns[name] = self.snapshot.attributes[field_enum.db_field]
+            elif field_enum.db_field in self.snapshot.quotes:
+                self._columns[name] = self.snapshot.quotes[field_enum.db_field][self.day]
+            else:
+                self._columns[name] = None
+        return self._columns[name]
+
+    # ------------------------------------------------------------------
+    #                              掩码
+    # ------------------------------------------------------------------
+
+    def _condition_mask(self, field_enum: SelectorFieldEnum, operator: Operator | None, value: Any) -> np.ndarray:
+        column = self._column(field_enum)
+        if column is None:
+            logger.warning(f"Unsupported field: {field_enum.field_name}")
+            return np.zeros(self.shape, dtype=bool)
+
+        if isinstance(column, CategoricalColumn):
+            return self._categorical_mask(column, operator, value)
+
+        if field_enum.data_type == DataType.DATE:
+            valid = ~np.isnat(column)
+            convert = lambda v: np.datetime64(convert_value(v, DataType.DATE), "D")  # noqa: E731
+        else:
+            valid = ~np.isnan(column)
+            convert = lambda v: convert_value(v, DataType.NUMBER)  # noqa: E731
+
+        with np.errstate(invalid="ignore"):
+            if operator in (Operator.IN, Operator.NOT_IN):
+                values = value if isinstance(value, list) else parse_list_value(str(value))
+                mask = np.isin(column, [convert(v) for v in values])
+                return valid & (mask if operator == Operator.IN else ~mask)
+
+            if operator == Operator.BETWEEN:
+                values = value if isinstance(value, list) else parse_list_value(str(value))
+                if len(values) != 2:
+                    raise ValueError(f"between 条件需要两个值: {value!r}")
+                low, high = (convert(v) for v in values)
+                return valid & (column >= low) & (column <= high)
+
+            comparisons = {
+                Operator.EQ: np.equal,
+                Operator.NE: np.not_equal,
+                Operator.GT: np.greater,
+                Operator.GTE: np.greater_equal,
+                Operator.LT: np.less,
+                Operator.LTE: np.less_equal,
+            }
+            if operator in comparisons:
+                return valid & comparisons[operator](column, convert(value))
+
+        logger.warning(f"Unsupported operator: {operator}")
+        return np.zeros(self.shape, dtype=bool)
+
+    @staticmethod
+    def _categorical_mask(column: CategoricalColumn, operator: Operator | None, value: Any) -> np.ndarray:
+        valid = column.codes >= 0
+
+        if operator in (Operator.IN, Operator.NOT_IN):
+            values = value if isinstance(value, list) else parse_list_value(str(value))
+            mask = np.isin(column.codes, column.codes_of(values))
+            return valid & (mask if operator == Operator.IN else ~mask)
+
+        if operator in (Operator.EQ, Operator.NE):
+            mask = np.isin(column.codes, column.codes_of([value]))
+            return valid & (mask if operator == Operator.EQ else ~mask)
+
+        if operator in (Operator.CONTAINS, Operator.NOT_CONTAINS):
+            needle = str(value).lower()
+            mask = np.isin(column.codes, column.codes_matching(lambda v: needle in v.lower()))
+            return valid & (mask if operator == Operator.CONTAINS else ~mask)
+
+        if operator == Operator.LIKE:
+            needle = str(value)
+            return np.isin(column.codes, column.codes_matching(lambda v: needle in v))
+
+        comparisons = {
+            Operator.GT: lambda v: v > str(value),
+            Operator.GTE: lambda v: v >= str(value),
+            Operator.LT: lambda v: v < str(value),
+            Operator.LTE: lambda v: v <= str(value),
+        }
+        if operator in comparisons:
+            return np.isin(column.codes, column.codes_matching(comparisons[operator]))
+
+        if operator == Operator.BETWEEN:
+            values = value if isinstance(value, list) else parse_list_value(str(value))
+            if len(values) != 2:
+                raise ValueError(f"between 条件需要两个值: {value!r}")
+            low, high = str(values[0]), str(values[1])
+            return np.isin(column.codes, column.codes_matching(lambda v: low <= v <= high))
+
+        logger.warning(f"Unsupported operator: {operator}")
+        return np.zeros(column.codes.shape, dtype=bool)
+
+
+def referenced_fields(tree: dict) -> set[str]:
+    """规则树中引用的行情/指标字段（面板列名）"""
+    fields = set()
+    if tree.get("node_type") == NodeType.GROUP:
+        for child in tree.get("children") or []:
+            fields |= referenced_fields(child)
+    else:
+        field_enum = SelectorFieldEnum.get_by_name(tree.get("field") or "")
+        if field_enum and field_enum.field_type != FieldType.BASIC:
+            fields.add(field_enum.db_field)
+    return fields
+
+
+class SelectorPanel:
+    """选股内存面板（进程内单例）"""
+
+    def __init__(self):
+        self.snapshot: PanelSnapshot | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return Settings.SELECTOR_PANEL_ENABLED
+
+    @property
+    def latest_trade_date(self) -> date | None:
+        snapshot = self.snapshot
+        if not self.enabled or snapshot is None or not len(snapshot.trade_days):
+            return None
+        return snapshot.trade_days[-1].item()
+
+    def covers(self, trade_date: date) -> bool:
+        snapshot = self.snapshot
+        return self.enabled and snapshot is not None and snapshot.covers(trade_date)
+
+    def select(self, tree: dict, trade_date: date) -> list[str]:
+        """在面板上执行选股，返回命中的股票代码（已排序）"""
+        snapshot = self.snapshot
+        day = snapshot.day_index(trade_date) if snapshot else None
+        if day is None:
+            raise ValueError(f"交易日 {trade_date} 不在选股面板内")
+
+        mask = MaskEvaluator(snapshot, day).evaluate(tree)
+        return [snapshot.stock_codes[i] for i in np.flatnonzero(mask)]
+
+    # ------------------------------------------------------------------
+    #                              加载
+    # ------------------------------------------------------------------
+
+    async def refresh(self, since: date | None = None) -> None:
+        """
+        增量刷新面板，未加载时全量加载；失败只记录日志，不影响调用方
+
+        Args:
+            since: 该日期及之后的数据有变动（如同步区间的开始日期），为空时只重新加载面板最后一个交易日之后的数据
+        """
+        if not self.enabled:
+            return
+
+        async with self._lock:
+            try:
+                start_time = time.time()
+                self.snapshot = await self._build(self.snapshot, since)
+                if self.snapshot:
+                    logger.info(
+                        f"选股面板已刷新: {len(self.snapshot.trade_days)} 个交易日 × {len(self.snapshot.stock_codes)} 只股票, "
+                        f"耗时 {int((time.time() - start_time) * 1000)}ms"
+                    )
+            except Exception as e:
+                logger.exception(f"选股面板刷新失败: {e}")
+
+    async def reload(self) -> None:
+        """丢弃已加载的数据，全量重新加载"""
+        await self.refresh(since=date.min)
+
+    async def _build(self, previous: PanelSnapshot | None, since: date | None) -> PanelSnapshot | None:
+        async with raw_connection() as conn:
+            latest = await conn.fetchval("SELECT MAX(trade_date) FROM stock_daily_line")
+        if latest is None:
+            return None
+
+        # 最近 N 个交易日
+        days = Settings.SELECTOR_PANEL_DAYS
+        calendar = await get_trading_calendar()
+        trade_days = calendar.trading_days(calendar.offset(latest, 1 - days), latest)
+        stock_codes, attributes = await self.load_attributes()
+
+        reload_from = trade_days[0]
+        if previous is not None and previous.stock_codes == stock_codes and len(previous.trade_days):
+            reload_from = max(reload_from, previous.trade_days[-1].item())
+            if since is not None:
+                reload_from = max(trade_days[0], min(reload_from, since))
+
+        kept = [d for d in trade_days if d < reload_from]
+        old_index = {d: i for i, d in enumerate(previous.trade_days.tolist())} if kept else {}
+        if any(d not in old_index for d in kept):
+            # 交易日历有变动（如节假日补录），退回全量加载
+            kept, reload_from = [], trade_days[0]
+
+        fresh = [d for d in trade_days if d >= reload_from]
+        quotes = await self.load_quotes(fresh, stock_codes)
+
+        if kept:
+            rows = [old_index[d] for d in kept]
+            quotes = {name: np.vstack([previous.quotes[name][rows], quotes[name]]) for name in PANEL_FIELDS}
+
+        return PanelSnapshot(
+            trade_days=np.array(trade_days, dtype="datetime64[D]"),
+            stock_codes=stock_codes,
+            quotes=quotes,
+            attributes=attributes,
+        )
+
+    @classmethod
+    async def load_snapshot(cls, trade_days: list[date], fields: Iterable[str] | None = None) -> PanelSnapshot:
+        """按给定交易日（升序）加载一份独立的面板快照，用于批量执行、历史回放等一次性计算"""
+        stock_codes, attributes = await cls.load_attributes()
+        return PanelSnapshot(
+            trade_days=np.array(trade_days, dtype="datetime64[D]"),
+            stock_codes=stock_codes,
+            quotes=await cls.load_quotes(trade_days, stock_codes, fields),
+            attributes=attributes,
+        )
+
+    @staticmethod
+    async def load_attributes() -> tuple[list[str], dict[str, Any]]:
+        db_fields = [f.db_field for f in SelectorFieldEnum.get_by_field_type(FieldType.BASIC)]
+        rows = await Stock.all().order_by("full_stock_code").values("full_stock_code", *db_fields)
+
+        attributes = {}
+        for field_enum in SelectorFieldEnum.get_by_field_type(FieldType.BASIC):
+            values = [row[field_enum.db_field] for row in rows]
+            if field_enum.data_type == DataType.DATE:
+                attributes[field_enum.db_field] = np.array(
+                    [np.datetime64(v, "D") if v else np.datetime64("NaT") for v in values], dtype="datetime64[D]"
+                )
+            else:
+                attributes[field_enum.db_field] = CategoricalColumn.encode(values)
+
+        return [row["full_stock_code"] for row in rows], attributes
+
+    @staticmethod
+    async def load_quotes(
+        trade_days: list[date],
+        stock_codes: list[str],
+        fields: Iterable[str] | None = None,
+    ) -> dict[str, np.ndarray]:
+        """
+        加载行情及指标矩阵
+
+        Args:
+            trade_days: 交易日（升序）
+            stock_codes: 股票代码，决定矩阵的列顺序
+            fields: 需要加载的字段，为空时加载 PANEL_FIELDS 全部字段
+        """
+        fields = [name for name in PANEL_FIELDS if fields is None or name in set(fields)]
+        quotes = {name: np.full((len(trade_days), len(stock_codes)), np.nan) for name in fields}
+        if not trade_days or not fields:
+            return quotes
+
+        columns = [f"d.{name}::float8" if name in QUOTE_FIELDS else f"i.{name}::float8" for name in fields]
+        sql = (
+            f"SELECT d.stock_code, d.trade_date, {', '.join(columns)} FROM stock_daily_line d "
+            "LEFT JOIN daily_indicator i ON i.stock_code = d.stock_code AND i.trade_date = d.trade_date "
+            "WHERE d.trade_date BETWEEN $1 AND $2"
+        )
+        day_index = {d: i for i, d in enumerate(trade_days)}
+        code_index = {c: i for i, c in enumerate(stock_codes)}
+
+        # 按交易日分段查询，限制单次返回的记录数
+        async with raw_connection() as conn:
+            for chunk_start in range(0, len(trade_days), LOAD_CHUNK_DAYS):
+                chunk = trade_days[chunk_start : chunk_start + LOAD_CHUNK_DAYS]
+                records = await conn.fetch(sql, chunk[0], chunk[-1])
+
+                positions = [(day_index.get(r[1]), code_index.get(r[0])) for r in records]
+                keep = [i for i, (d, s) in enumerate(positions) if d is not None and s is not None]
+                if not keep:
+                    continue
+
+                days = np.fromiter((positions[i][0] for i in keep), dtype=np.int64, count=len(keep))
+                stocks = np.fromiter((positions[i][1] for i in keep), dtype=np.int64, count=len(keep))
+                for offset, name in enumerate(fields, start=2):
+                    values = [records[i][offset] for i in keep]
+                    quotes[name][days, stocks] = np.array(values, dtype=np.float64)  # None -> NaN
+
+        return quotes
+
+
+selector_panel = SelectorPanel()
@@ -0,0 +1,80 @@
+"""选股历史回放
+
+在一段交易日上一次性向量化求值选股器，得到 (交易日 × 股票) 的入选矩阵，
+并统计入选股票池的未来收益，用于快速评估选股条件的有效性。
+
+- 入选矩阵按行 packbits 压缩（高位在前），整体 base64 编码返回
+- 未来收益按收盘价计算：close[t + h] / close[t] - 1，停牌等缺失数据不参与统计
+- 对照组为同日全部有数据股票的等权平均收益
+"""
+
+import base64
+
+import numpy as np
+
+
+def pack_membership(mask: np.ndarray) -> str:
+    """将 (交易日, 股票) 布尔矩阵按行压缩为位图并 base64 编码"""
+    return base64.b64encode(np.packbits(mask, axis=1).tobytes()).decode("ascii")
+
+
+def unpack_membership(bitmap: str, days: int, stocks: int) -> np.ndarray:
+    """pack_membership 的逆操作"""
+    packed = np.frombuffer(base64.b64decode(bitmap), dtype=np.uint8).reshape(days, -1)
+    return np.unpackbits(packed, axis=1, count=stocks).astype(bool)
+
+
+def forward_return_stats(mask: np.ndarray, close: np.ndarray, horizon: int) -> dict:
+    """
+    计算入选股票池在 horizon 个交易日后的收益统计
+
+    Args:
+        mask: (回放交易日, 股票) 入选矩阵
+        close: (回放交易日 + 之后的交易日, 股票) 收盘价矩阵，前 len(mask) 行与 mask 对齐
+        horizon: 持有交易日数
+
+    Returns:
+        统计结果，没有可统计的交易日时各项为 None
+    """
+    days = min(len(mask), len(close) - horizon)
+    empty = {
+        "horizon": horizon,
+        "days": 0,
+        "mean_return": None,
+        "median_return": None,
+        "win_rate": None,
+        "mean_excess": None,
+        "excess_win_rate": None,
+        "hit_rate": None,
+    }
+    if days <= 0:
+        return empty
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        forward = close[horizon : horizon + days] / close[:days] - 1
+    forward[~np.isfinite(forward)] = np.nan
+
+    picked = np.where(mask[:days], forward, np.nan)
+    picked_valid = ~np.isnan(picked)
+    picked_count = picked_valid.sum(axis=1)
+    market_count = (~np.isnan(forward)).sum(axis=1)
+
+    # 逐日等权平均，避免 nanmean 对全空行告警
+    pool = np.where(picked_count > 0, np.nansum(picked, axis=1) / np.maximum(picked_count, 1), np.nan)
+    market = np.where(market_count > 0, np.nansum(forward, axis=1) / np.maximum(market_count, 1), np.nan)
+
+    active = ~np.isnan(pool)
+    if not active.any():
+        return empty
+
+    pool, excess = pool[active], (pool - market)[active]
+    return {
+        "horizon": horizon,
+        "days": int(active.sum()),
+        "mean_return": float(pool.mean()),
+        "median_return": float(np.median(pool)),
+        "win_rate": float((pool > 0).mean()),
+        "mean_excess": float(np.nanmean(excess)) if not np.isnan(excess).all() else None,
+        "excess_win_rate": float((excess > 0).mean()),
+        "hit_rate": float((picked[picked_valid] > 0).mean()),
+    }
@@ -1,28 +1,35 @@
 """进行数据同步的服务（APScheduler 任务入口 + 同步编排）
 
-- 日线：使用 backend.core.provider.get_price(code, end_date, count, frequency="1d", fields=[])
+- 日线：使用 backend.core.provider.aget_prices 并发拉取（连接池 + 并发上限 + 按数据源令牌桶限流）
 - 节假日：GET https://publicapi.xiaoai.me/holiday/year?date={year}
 
 实现要点：
 1) 用 PostgreSQL 做"互斥锁 + 游标(sync_state)"：避免定时任务重入、支持增量同步
-2) 日线按 trade_date 增量 upsert（unique_together = stock_code + trade_date）
-3) 失败可重试/可续跑：cursor 只在成功后推进
+2) 日线按 trade_date 增量 upsert（unique_together = stock_code + trade_date），经 COPY 临时表合并写入
+3) 失败可重试/可续跑：每只股票的游标（stock_sync_state）只在成功后推进，补数见 services/backfill.py
 """
 
-import asyncio
-from datetime import date, datetime, timedelta
+from datetime import date, datetime
 
 import httpx
-from tortoise.transactions import in_transaction
 from tqdm.asyncio import tqdm
 
+from backend.core.calendar import get_trading_calendar, trading_calendar
+from backend.core.config import Settings
 from backend.core.logger import logger
-from backend.core.provider import get_price
+from backend.core.provider import aget_prices
+from backend.db.market_store import market_store
+from backend.db.timescale import timescale
 from backend.enums.sync import SyncStatus
 from backend.models import DailyLine, Holiday, Stock, SyncConfig, SyncLog
 from backend.schemas import PaginatedData
-from backend.schemas.market import DateBar
 from backend.schemas.sync import SchedulerInfo, SyncLogItem, SyncSummaryResponse
+from backend.services.backfill import backfill_service
+from backend.services.indicator import indicator_service
+from backend.services.ingest import DailyLineIngestor
+from backend.services.selector_cache import stock_list_version
+from backend.services.selector_engine import selector_engine
+from backend.services.selector_panel import selector_panel
 
 
 class SyncService:
@@ -39,6 +46,7 @@ class SyncService:
         existing = await Holiday.filter(date__gte=year_start, date__lt=year_end).exists()
         if existing:
             logger.info(f"已存在{current_year}节假日信息，跳过同步")
+            await trading_calendar.ensure_loaded()
             return
 
         url = f"https://publicapi.xiaoai.me/holiday/year?date={current_year}"
@@ -54,54 +62,55 @@ class SyncService:
         for holiday in holidays:
             await Holiday.update_or_create(date=holiday["date"], defaults={"name": holiday["holiday"]})
         logger.info(f"{current_year}节假日信息同步完成")
+        await trading_calendar.load()
 
     async def sync_stock_daily_line(self, start_date: datetime, end_date: datetime):
         """
         批量同步日线数据，会定时调度
+
+        并发拉取全市场行情（连接池 + 限流），边拉取边通过 COPY 分批写库。
         """
-        trade_days = 0
-        current = start_date
-
-        holidays = await Holiday.filter(date__gte=start_date, date__lte=end_date).values_list("date", flat=True)
-        holiday_set = set(holidays)
-
-        while current <= end_date:
-            if current.weekday() < 5 and current not in holiday_set:
-                trade_days += 1
-            current += timedelta(days=1)
-
-        stock_objs = await Stock.all()
-
-        stock_codes = [stock.full_stock_code for stock in stock_objs]
-
-        all_data: list[DateBar] = []
-        for code in tqdm(stock_codes, desc="获取股票数据"):
-            data: list[DateBar] = get_price(code, end_date=end_date, count=trade_days)
-            all_data.extend(data)
-            await asyncio.sleep(0.05)
-
-        new_records = [
-            DailyLine(
-                stock_code=item.stock_code,
-                trade_date=item.trade_date,
-                open=item.open_,
-                close=item.close,
-                high=item.high,
-                low=item.low,
-                volume=item.volume,
-            )
-            for item in all_data
-            if not item or item.trade_date >= start_date.date()
-        ]
+        trade_days = (await get_trading_calendar()).count(start_date, end_date)
+
+        stock_codes = await Stock.all().values_list("full_stock_code", flat=True)
+
+        failed = set()
+        async with DailyLineIngestor() as ingestor:
+            with tqdm(total=len(stock_codes), desc="获取股票数据") as progress:
+                async for code, bars in aget_prices(
+                    stock_codes, end_date=end_date, count=trade_days, return_exceptions=True
+                ):
+                    progress.update(1)
+                    if isinstance(bars, Exception):
+                        failed.add(code)
+                        continue
+                    await ingestor.add_bars(bar for bar in bars if bar and bar.trade_date >= start_date.date())
+
+        logger.info(f"批量写入 {ingestor.total} 条记录成功")
+
+        # 推进与已同步区间相接的股票游标，断档的留给补数任务处理
+        await backfill_service.advance_cursors(
+            [code for code in stock_codes if code not in failed],
+            start_date.date(),
+            end_date.date(),
+            require_contiguous=True,
+        )
 
-        async with in_transaction() as conn:
-            await DailyLine.bulk_create(
-                new_records,
-                using_db=conn,
-                on_conflict=["stock_code", "trade_date"],
-                update_fields=["open", "high", "low", "close", "volume", "turnover"],
-            )
-            logger.info(f"批量插入 {len(new_records)} 条记录成功")
+        await self._after_daily_line_sync(start_date.date())
+
+    async def _after_daily_line_sync(self, start_date: date):
+        """日线写库后的派生数据刷新"""
+        stock_list_version.invalidate()  # 股票列表由外部脚本随日线同步更新，此时重新计算其摘要
+        await market_store.sync(since=start_date)
+        await timescale.refresh(start_date)
+        await indicator_service.refresh(start_date)
+        await selector_panel.refresh(since=start_date)
+
+        if Settings.SELECTOR_BATCH_AFTER_SYNC:
+            try:
+                await selector_engine.execute_all()
+            except Exception as e:
+                logger.exception(f"同步后批量选股失败: {e}")
 
     async def get_summary(self) -> SyncSummaryResponse:
         """
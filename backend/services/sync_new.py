@@ -1,15 +1,15 @@
-import asyncio
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Any, Dict, List
 
-from tortoise.transactions import in_transaction
 from tqdm.asyncio import tqdm
 
+from backend.core.calendar import get_trading_calendar
 from backend.core.logger import logger
-from backend.core.provider import get_price
+from backend.core.provider import aget_prices
 from backend.enums.sync import SyncStatus, SyncType
-from backend.models import DailyLine, Holiday, Stock, SyncConfig, SyncLog
+from backend.models import Stock, SyncConfig, SyncLog
 from backend.schemas import PaginatedData, SyncSummaryResponse
+from backend.services.ingest import DailyLineIngestor
 from backend.utils import get_previous_trading_day
 
 
@@ -34,79 +34,32 @@ async def sync_stock_daily_line(start_date: datetime, end_date: datetime, symbol
         start_date, end_date = end_date, start_date
 
     # 交易天数统计
-    trade_days = 0
-    current = start_date
+    trade_days = (await get_trading_calendar()).count(start_date, end_date)
 
-    # 获取日期范围内的所有节假日
-    holidays = await Holiday.filter(date__gte=start_date, date__lte=end_date).values_list("date", flat=True)
-    holiday_set = set(holidays)
-
-    while current <= end_date:
-        # 排除周六周日（weekday() 5=周六, 6=周日）
-        if current.weekday() < 5 and current not in holiday_set:
-            trade_days += 1
-        current += timedelta(days=1)
-
-    # 一次性获取所有股票的数据
+    # 并发获取所有股票的数据（连接池 + 限流 + 数据源路由，见 core/provider.aget_prices）
     all_data = {}
-    for symbol in tqdm(symbols, desc="获取股票数据"):
-        try:
-            bars = get_price(symbol, end_date=end_date, count=trade_days)
-
-            # 过滤数据：交易时间大于开始日期，跳过空数据
-            bars = [bar for bar in bars if bar.trade_date >= start_date.date()]
-
-            if not bars:
+    with tqdm(total=len(symbols), desc="获取股票数据") as progress:
+        async for symbol, bars in aget_prices(symbols, end_date=end_date, count=trade_days, return_exceptions=True):
+            progress.update(1)
+            if isinstance(bars, Exception):
+                tqdm.write(f"获取 {symbol} 数据失败: {bars}")
                 continue
 
-            all_data[symbol] = bars
-
-            await asyncio.sleep(0.01)  # 避免获取频繁，导致服务异常
-
-        except Exception as e:
-            logger.error(f"获取 {symbol} 数据失败: {e}")
-            tqdm.write(f"获取 {symbol} 数据失败: {e}")
+            # 过滤数据：交易时间大于开始日期，跳过空数据
+            bars = [bar for bar in bars if bar and bar.trade_date >= start_date.date()]
+            if bars:
+                all_data[symbol] = bars
 
     if not all_data:
         logger.warning("未获取到任何股票数据")
         return
     logger.info(f"获取到 {len(all_data)} 条数据")
 
-    # 一次性查询所有已存在的记录
-    async with in_transaction() as conn:
-        existing_records = (
-            await DailyLine.filter(
-                stock_code__in=symbols, trade_date__gte=start_date.date(), trade_date__lte=end_date.date()
-            )
-            .using_db(conn)
-            .all()
-        )
-
-        # 构建 (stock_code, trade_date) 的集合，快速查询
-        existing_set = {(record.stock_code, record.trade_date) for record in existing_records}
-        new_records = []
-
-        # 遍历所有股票数据，构建新记录列表
-        for symbol, bars in all_data.items():
-            for bar in bars:
-                if (symbol, bar.trade_date) not in existing_set:
-                    new_records.append(
-                        DailyLine(
-                            stock_code=symbol,
-                            trade_date=bar.trade_date,
-                            open=bar.open_,
-                            high=bar.high,
-                            low=bar.low,
-                            close=bar.close,
-                            volume=int(bar.volume),
-                            turnover=None,
-                        )
-                    )
-
-        # 一次性批量插入
-        if new_records:
-            await DailyLine.bulk_create(new_records, using_db=conn)
-            logger.info(f"批量插入 {len(new_records)} 条记录成功")
+    # 通过 COPY 临时表合并写入，已存在的 (stock_code, trade_date) 覆盖更新
+    async with DailyLineIngestor() as ingestor:
+        for bars in all_data.values():
+            await ingestor.add_bars(bars)
+    logger.info(f"批量写入 {ingestor.total} 条记录成功")
 
 
 class SyncService:
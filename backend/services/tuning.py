@@ -0,0 +1,243 @@
+"""策略参数调优服务
+
+基于 Optuna，在一批股票上搜索策略模板的最优参数：
+- 行情一次性加载到共享内存，多个子进程共享同一个 study（存储见 Settings.TUNING_STORAGE）并发执行试验
+- 试验按检查点上报中间收益，MedianPruner 提前终止落后的试验
+- 结束后将最优参数与排名靠前的试验写入 StrategyTuning
+- 取消时在 study 上设置停止标记，子进程完成当前试验后退出
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+
+import optuna
+
+from backend.core.config import Settings
+from backend.core.logger import logger
+from backend.enums.strategy import ExecutionStatus
+from backend.models.strategy import Strategy, StrategyTuning
+from backend.trading.batch import SharedPanel, init_worker, spawn_context
+from backend.trading.tuning import (
+    OBJECTIVES,
+    STOP_ATTR,
+    TuningTask,
+    build_search_space,
+    make_storage,
+    run_tuning_worker,
+    warmup_steps,
+)
+from backend.trading.vector_engine import load_market_panel
+
+# 保存的最优试验数
+TOP_TRIALS = 10
+
+
+def summarize_study(storage_url: str, study_name: str) -> dict:
+    """统计 study 的试验结果（阻塞调用，需在线程中执行）"""
+    study = optuna.load_study(study_name=study_name, storage=make_storage(storage_url))
+    trials = study.get_trials(deepcopy=False)
+    states = optuna.trial.TrialState
+
+    completed = [t for t in trials if t.state == states.COMPLETE and t.value is not None]
+    completed.sort(key=lambda t: t.value, reverse=study.direction == optuna.study.StudyDirection.MAXIMIZE)
+
+    return {
+        "best_params": completed[0].params if completed else None,
+        "best_value": completed[0].value if completed else None,
+        "best_trials": [{"number": t.number, "value": t.value, "params": t.params} for t in completed[:TOP_TRIALS]],
+        "completed_trials": len(completed),
+        "pruned_trials": sum(t.state == states.PRUNED for t in trials),
+        "failed_trials": sum(t.state == states.FAIL for t in trials),
+    }
+
+
+class TuningService:
+    """策略参数调优服务"""
+
+    def __init__(self):
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    @property
+    def storage_url(self) -> str:
+        return Settings.TUNING_STORAGE
+
+    async def start(
+        self,
+        template_id: str,
+        codes: list[str],
+        start_date: date,
+        end_date: date | None = None,
+        n_trials: int = 100,
+        n_jobs: int | None = None,
+        objective: str = "annual_return",
+        init_cash: float | None = None,
+        name: str | None = None,
+        strategy_id: str | None = None,
+    ) -> StrategyTuning:
+        """
+        创建调优记录并在后台执行
+
+        Args:
+            template_id: 策略模板ID
+            codes: 股票代码列表
+            start_date: 回测开始日期
+            end_date: 回测结束日期，为空时为今天
+            n_trials: 试验总数
+            n_jobs: 并行进程数，默认 Settings.TUNING_WORKERS
+            objective: 优化目标，见 OBJECTIVES
+            init_cash: 初始资金，默认 Settings.INIT_CACHE
+            name: 调优名称
+            strategy_id: 关联的策略ID
+
+        Returns:
+            调优记录
+        """
+        if objective not in OBJECTIVES:
+            raise ValueError(f"不支持的优化目标: {objective}")
+        space = build_search_space(template_id)
+
+        strategy = None
+        if strategy_id:
+            strategy = await Strategy.get_or_none(id=strategy_id)
+            if not strategy:
+                raise ValueError("策略不存在")
+
+        codes = list(dict.fromkeys(codes))
+        n_jobs = min(n_jobs or Settings.TUNING_WORKERS or os.cpu_count() or 1, n_trials)
+        init_cash = float(Settings.INIT_CACHE if init_cash is None else init_cash)
+        end_date = end_date or date.today()
+
+        record = await StrategyTuning.create(
+            strategy=strategy,
+            name=name or f"{template_id} 参数调优",
+            template_id=template_id,
+            study_name=f"tuning-{datetime.now():%Y%m%d%H%M%S%f}",
+            stock_codes=codes,
+            start_date=start_date,
+            end_date=end_date,
+            initial_capital=Decimal(str(init_cash)),
+            objective=objective,
+            n_trials=n_trials,
+            n_jobs=n_jobs,
+        )
+        self._tasks[str(record.id)] = asyncio.create_task(self._run(record, space))
+        logger.info(f"参数调优已提交: {record.study_name}, 模板 {template_id}, 股票 {len(codes)} 只, 试验 {n_trials} 次")
+        return record
+
+    async def get_detail(self, tuning_id: str) -> StrategyTuning | None:
+        """获取调优记录，运行中时从 Optuna 存储读取实时的试验统计"""
+        record = await StrategyTuning.get_or_none(id=tuning_id)
+        if record and record.status == ExecutionStatus.RUNNING:
+            try:
+                summary = await asyncio.to_thread(summarize_study, self.storage_url, record.study_name)
+                for key, value in summary.items():
+                    setattr(record, key, value)
+            except KeyError:
+                pass  # study 尚未创建
+        return record
+
+    async def cancel(self, tuning_id: str) -> bool:
+        task = self._tasks.get(tuning_id)
+        if not task or task.done():
+            return False
+        task.cancel()
+        return True
+
+    async def shutdown(self) -> None:
+        """服务关闭时停止所有运行中的调优"""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    @staticmethod
+    async def recover_interrupted() -> int:
+        """服务重启时，将上次未正常结束的调优标记为失败"""
+        count = await StrategyTuning.filter(status__in=[ExecutionStatus.PENDING, ExecutionStatus.RUNNING]).update(
+            status=ExecutionStatus.FAILED,
+            error_message="服务重启，任务中断",
+            completed_at=datetime.now(),
+        )
+        if count:
+            logger.warning(f"{count} 个参数调优因服务重启中断")
+        return count
+
+    async def _run(self, record: StrategyTuning, space: dict) -> None:
+        loop = asyncio.get_running_loop()
+        shared = None
+        executor = None
+
+        try:
+            record.status = ExecutionStatus.RUNNING
+            await record.save(update_fields=["status"])
+
+            panel = await load_market_panel(record.stock_codes, record.start_date, record.end_date)
+            if not panel.dates.size:
+                raise ValueError("回测区间内没有行情数据")
+            shared = SharedPanel(panel)
+
+            await asyncio.to_thread(
+                optuna.create_study,
+                study_name=record.study_name,
+                storage=make_storage(self.storage_url),
+                direction=OBJECTIVES[record.objective],
+            )
+            task = TuningTask(
+                storage_url=self.storage_url,
+                study_name=record.study_name,
+                meta=shared.meta,
+                codes=shared.codes,
+                template_id=record.template_id,
+                space=space,
+                objective=record.objective,
+                total_trials=record.n_trials,
+                init_cash=float(record.initial_capital),
+                warmup=warmup_steps(record.template_id, len(panel.dates), len(shared.codes)),
+            )
+
+            executor = ProcessPoolExecutor(max_workers=record.n_jobs, mp_context=spawn_context(), initializer=init_worker)
+            workers = [loop.run_in_executor(executor, run_tuning_worker, task) for _ in range(record.n_jobs)]
+            await asyncio.gather(*workers)
+            record.status = ExecutionStatus.COMPLETED
+        except asyncio.CancelledError:
+            record.status = ExecutionStatus.CANCELLED
+            if executor is not None:
+                await asyncio.to_thread(self._request_stop, record.study_name)
+        except Exception as e:
+            logger.exception(f"参数调优失败: {record.study_name}, {e}")
+            record.status = ExecutionStatus.FAILED
+            record.error_message = str(e)
+        finally:
+            if executor is not None:
+                await asyncio.to_thread(executor.shutdown, True)
+            if shared is not None:
+                shared.close()
+            await self._finish(record)
+            self._tasks.pop(str(record.id), None)
+
+    def _request_stop(self, study_name: str) -> None:
+        study = optuna.load_study(study_name=study_name, storage=make_storage(self.storage_url))
+        study.set_user_attr(STOP_ATTR, True)
+
+    async def _finish(self, record: StrategyTuning) -> None:
+        try:
+            summary = await asyncio.to_thread(summarize_study, self.storage_url, record.study_name)
+            for key, value in summary.items():
+                setattr(record, key, value)
+        except KeyError:
+            pass  # study 未创建（加载行情阶段即失败）
+        except Exception as e:
+            logger.exception(f"读取调优结果失败: {record.study_name}, {e}")
+
+        record.completed_at = datetime.now()
+        await record.save()
+        logger.info(
+            f"参数调优结束: {record.study_name}, 状态 {record.status.value}, 最优值 {record.best_value}, "
+            f"最优参数 {record.best_params}, 完成 {record.completed_trials}, 剪枝 {record.pruned_trials}"
+        )
+
+
+tuning_service = TuningService()
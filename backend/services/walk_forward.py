@@ -0,0 +1,214 @@
+"""滚动窗口（Walk-Forward）优化服务
+
+在一批股票上对策略模板做样本外验证，窗口在进程池中并行寻优（见 trading/walk_forward.py），
+结果写入 StrategyBacktest：绩效指标为拼接后的样本外表现，result_data 中保存各窗口的最优参数与样本外资产曲线。
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+from tortoise.expressions import F
+
+from backend.core.config import Settings
+from backend.core.logger import logger
+from backend.enums.strategy import ExecutionStatus
+from backend.models.strategy import Strategy, StrategyBacktest
+from backend.services.backtest import expand_param_grid, to_decimal
+from backend.trading.batch import SharedPanel, init_worker, spawn_context
+from backend.trading.tuning import OBJECTIVES
+from backend.trading.walk_forward import (
+    GRID_POINTS,
+    WalkForwardTask,
+    build_param_grid,
+    run_window,
+    split_windows,
+    stitch_equity,
+)
+from backend.trading.vector_engine import load_market_panel
+
+# result_data.mode 标记，区分回测队列中的普通回测
+MODE = "walk_forward"
+
+
+class WalkForwardService:
+    """滚动窗口优化服务"""
+
+    def __init__(self):
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    async def start(
+        self,
+        strategy_id: str,
+        template_id: str,
+        codes: list[str],
+        start_date: date,
+        end_date: date | None = None,
+        in_sample_days: int = 250,
+        out_sample_days: int = 60,
+        anchored: bool = False,
+        objective: str = "annual_return",
+        param_grid: dict[str, list] | None = None,
+        grid_points: int = GRID_POINTS,
+        n_jobs: int | None = None,
+        init_cash: float | None = None,
+        name: str | None = None,
+    ) -> StrategyBacktest:
+        """
+        创建回测记录并在后台执行滚动窗口优化
+
+        Args:
+            strategy_id: 关联的策略ID
+            template_id: 策略模板ID，需支持向量化回测
+            codes: 股票代码列表
+            start_date: 回测开始日期（第一个样本内窗口的开始）
+            end_date: 回测结束日期，为空时为今天
+            in_sample_days: 样本内交易日数
+            out_sample_days: 样本外交易日数（滚动步长）
+            anchored: 样本内区间是否固定从开始日期起算
+            objective: 优化目标，见 tuning.OBJECTIVES
+            param_grid: 参数网格 {参数名: 候选值列表}，为空时由模板参数范围生成
+            grid_points: 自动生成网格时每个数值参数的取值个数
+            n_jobs: 并行进程数，默认 Settings.BACKTEST_WORKERS
+            init_cash: 初始资金，默认 Settings.INIT_CACHE
+            name: 回测名称
+
+        Returns:
+            回测记录
+        """
+        if objective not in OBJECTIVES:
+            raise ValueError(f"不支持的优化目标: {objective}")
+        strategy = await Strategy.get_or_none(id=strategy_id)
+        if not strategy:
+            raise ValueError("策略不存在")
+
+        grid = build_param_grid(template_id, grid_points)
+        grid.update(param_grid or {})
+        combos = expand_param_grid(grid)
+        init_cash = float(Settings.INIT_CACHE if init_cash is None else init_cash)
+
+        record = await StrategyBacktest.create(
+            strategy=strategy,
+            version=await strategy.get_current_version(),
+            name=name or f"{strategy.name} 滚动窗口优化",
+            start_date=start_date,
+            end_date=end_date or date.today(),
+            initial_capital=to_decimal(init_cash, 2),
+            status=ExecutionStatus.RUNNING,
+            started_at=datetime.now(),
+            result_data={
+                "mode": MODE,
+                "template_id": template_id,
+                "codes": list(dict.fromkeys(codes)),
+                "in_sample_days": in_sample_days,
+                "out_sample_days": out_sample_days,
+                "anchored": anchored,
+                "objective": objective,
+                "param_grid": grid,
+            },
+        )
+        workers = n_jobs or Settings.BACKTEST_WORKERS or os.cpu_count() or 1
+        self._tasks[str(record.id)] = asyncio.create_task(self._run(record, combos, workers))
+        logger.info(f"滚动窗口优化已提交: {record.name}({record.id}), 模板 {template_id}, 参数 {len(combos)} 组")
+        return record
+
+    def cancel(self, backtest_id: str) -> bool:
+        task = self._tasks.get(backtest_id)
+        if not task or task.done():
+            return False
+        task.cancel()
+        return True
+
+    async def shutdown(self) -> None:
+        """服务关闭时停止所有运行中的优化"""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    @staticmethod
+    async def recover_interrupted() -> int:
+        """服务重启时，将上次未正常结束的滚动窗口优化标记为失败"""
+        count = await StrategyBacktest.filter(
+            status=ExecutionStatus.RUNNING, result_data__filter={"mode": MODE}
+        ).update(status=ExecutionStatus.FAILED, error_message="服务重启，任务中断", completed_at=datetime.now())
+        if count:
+            logger.warning(f"{count} 个滚动窗口优化因服务重启中断")
+        return count
+
+    async def _run(self, record: StrategyBacktest, combos: list[dict], workers: int) -> None:
+        loop = asyncio.get_running_loop()
+        config = record.result_data
+        shared = None
+        executor = None
+        results: list[dict] = []
+
+        try:
+            panel = await load_market_panel(config["codes"], record.start_date, record.end_date)
+            windows = split_windows(len(panel.dates), config["in_sample_days"], config["out_sample_days"], config["anchored"])
+            shared = SharedPanel(panel)
+            task = WalkForwardTask(
+                meta=shared.meta,
+                codes=shared.codes,
+                template_id=config["template_id"],
+                combos=combos,
+                objective=config["objective"],
+                init_cash=float(record.initial_capital),
+            )
+
+            executor = ProcessPoolExecutor(
+                max_workers=min(workers, len(windows)), mp_context=spawn_context(), initializer=init_worker
+            )
+            futures = [loop.run_in_executor(executor, run_window, task, window) for window in windows]
+            for future in asyncio.as_completed(futures):
+                results.append(await future)
+                record.progress = len(results) / len(windows) * 100
+                await StrategyBacktest.filter(id=record.id).update(progress=record.progress)
+
+            summary = stitch_equity(results, task.init_cash)
+            self._apply_summary(record, summary, results)
+            record.status = ExecutionStatus.COMPLETED
+        except asyncio.CancelledError:
+            record.status = ExecutionStatus.CANCELLED
+        except Exception as e:
+            logger.exception(f"滚动窗口优化失败: {record.name}({record.id}), {e}")
+            record.status = ExecutionStatus.FAILED
+            record.error_message = str(e)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+            if shared is not None:
+                shared.close()
+            record.completed_at = datetime.now()
+            await record.save()
+            if record.status == ExecutionStatus.COMPLETED:
+                await Strategy.filter(id=record.strategy_id).update(
+                    backtest_count=F("backtest_count") + 1,
+                    latest_annual_return=record.annual_return,
+                    latest_sharpe_ratio=record.sharpe_ratio,
+                )
+            self._tasks.pop(str(record.id), None)
+            logger.info(
+                f"滚动窗口优化结束: {record.name}({record.id}), 状态 {record.status.value}, "
+                f"窗口 {len(results)}, 样本外年化收益 {record.annual_return}"
+            )
+
+    @staticmethod
+    def _apply_summary(record: StrategyBacktest, summary: dict, results: list[dict]) -> None:
+        record.final_capital = to_decimal(summary["final_capital"], 2)
+        record.total_return = to_decimal(summary["total_return"])
+        record.annual_return = to_decimal(summary["annual_return"])
+        record.max_drawdown = to_decimal(summary["max_drawdown"])
+        record.sharpe_ratio = to_decimal(summary["sharpe_ratio"])
+        record.trade_count = summary["trade_count"]
+        record.progress = 100
+        windows = [{k: v for k, v in r.items() if k not in ("dates", "equity")} for r in results]
+        record.result_data = {
+            **record.result_data,
+            "windows": sorted(windows, key=lambda w: w["index"]),
+            "equity": summary["equity"],
+        }
+
+
+walk_forward_service = WalkForwardService()
@@ -2,8 +2,10 @@ from datetime import date, datetime
 
 import httpx
 
+from backend.core.calendar import trading_calendar
 from backend.core.logger import logger
 from backend.models import Holiday
+from backend.services.minute import minute_line_service
 
 
 async def sync_holidays():
@@ -33,3 +35,12 @@ async def sync_holidays():
     for holiday in holidays:
         await Holiday.update_or_create(date=holiday["date"], defaults={"name": holiday["holiday"]})
     logger.info(f"{current_year}节假日信息同步完成")
+    await trading_calendar.load()
+
+
+async def archive_minute_lines():
+    """收盘后归档当日分钟线"""
+    try:
+        await minute_line_service.archive()
+    except Exception as e:
+        logger.exception(f"分钟线归档失败: {e}")
@@ -0,0 +1,149 @@
+"""多进程批量回测
+
+行情矩阵在主进程加载一次后写入共享内存，子进程按名称挂载，只读访问，不再逐任务序列化行情。
+每个任务为「一只股票 × 一组参数」，在子进程中用 Backtrader 执行，返回绩效指标。
+
+共享内存布局：[交易日 int64 × T][open/high/low/close/volume float64 × 5 × T × S]
+"""
+
+import hashlib
+import multiprocessing
+import sys
+import types
+from collections import OrderedDict
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import backtrader as bt
+import numpy as np
+
+from backend.trading.engine import run_bars_backtest
+from backend.trading.feeds.pg_feed import BAR_FIELDS, bars_from_columns
+from backend.trading.vector_engine import MarketPanel
+
+# 子进程中缓存的共享内存句柄、策略类数量
+_ATTACH_CACHE_SIZE = 4
+_STRATEGY_CACHE_SIZE = 16
+
+
+@dataclass(frozen=True)
+class SharedPanelMeta:
+    """子进程挂载共享行情所需的信息"""
+
+    name: str
+    days: int
+    stocks: int
+
+
+class SharedPanel:
+    """主进程持有的共享内存行情，使用完毕后须调用 close 释放"""
+
+    def __init__(self, panel: MarketPanel):
+        self.codes = list(panel.codes)
+        days, stocks = panel.close.shape
+        size = max(8 * days * (1 + len(BAR_FIELDS) * stocks), 1)
+
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self.meta = SharedPanelMeta(self._shm.name, days, stocks)
+
+        dates, values = _views(self._shm.buf, self.meta)
+        dates[:] = panel.dates.astype("datetime64[D]").astype(np.int64)
+        for i, name in enumerate(BAR_FIELDS):
+            matrix = getattr(panel, name)
+            values[i] = np.zeros((days, stocks)) if matrix is None else matrix
+        del dates, values
+
+    def close(self) -> None:
+        self._shm.close()
+        self._shm.unlink()
+
+
+def _views(buffer, meta: SharedPanelMeta) -> tuple[np.ndarray, np.ndarray]:
+    dates = np.ndarray((meta.days,), dtype=np.int64, buffer=buffer)
+    values = np.ndarray((len(BAR_FIELDS), meta.days, meta.stocks), dtype=np.float64, buffer=buffer, offset=8 * meta.days)
+    return dates, values
+
+
+# ----------------------------------------------------------------------
+#                               子进程
+# ----------------------------------------------------------------------
+
+_attached: OrderedDict[str, shared_memory.SharedMemory] = OrderedDict()
+_strategies: OrderedDict[str, type] = OrderedDict()
+
+
+def init_worker() -> None:
+    """子进程初始化：只输出警告以上日志，避免逐笔交易日志刷屏、多进程同时写日志文件"""
+    from backend.core.logger import logger
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+
+def attach_shared_panel(meta: SharedPanelMeta) -> tuple[np.ndarray, np.ndarray]:
+    """在子进程中挂载共享行情，返回 (交易日, 行情) 只读视图"""
+    shm = _attached.get(meta.name)
+    if shm is None:
+        shm = shared_memory.SharedMemory(name=meta.name)
+        _attached[meta.name] = shm
+        while len(_attached) > _ATTACH_CACHE_SIZE:
+            _attached.popitem(last=False)[1].close()
+    _attached.move_to_end(meta.name)
+    return _views(shm.buf, meta)
+
+
+def load_strategy_class(code: str) -> type:
+    """执行策略代码，返回其中定义的 Backtrader 策略类（取最后定义的一个）"""
+    key = hashlib.sha256(code.encode("utf-8")).hexdigest()
+    if key in _strategies:
+        return _strategies[key]
+
+    # Backtrader 的元类会按 __module__ 查找模块，需注册为真实模块
+    module = types.ModuleType(f"strategy_code_{key[:16]}")
+    sys.modules[module.__name__] = module
+    exec(code, module.__dict__)
+    classes = [
+        obj
+        for obj in vars(module).values()
+        if isinstance(obj, type) and issubclass(obj, bt.Strategy) and obj.__module__ == module.__name__
+    ]
+    if not classes:
+        raise ValueError("策略代码中未找到继承自 Strategy 的策略类")
+
+    _strategies[key] = classes[-1]
+    while len(_strategies) > _STRATEGY_CACHE_SIZE:
+        old_key, _ = _strategies.popitem(last=False)
+        sys.modules.pop(f"strategy_code_{old_key[:16]}", None)
+    return classes[-1]
+
+
+def run_job(meta: SharedPanelMeta, stock_index: int, code: str, params: dict, init_cash: float) -> dict | None:
+    """
+    在子进程中回测一只股票 × 一组参数
+
+    Args:
+        meta: 共享行情信息
+        stock_index: 股票在行情矩阵中的列号
+        code: 策略代码
+        params: 策略参数
+        init_cash: 初始资金
+
+    Returns:
+        绩效指标，见 engine.collect_metrics；没有行情数据时返回 None
+    """
+    dates, values = attach_shared_panel(meta)
+    column = values[:, :, stock_index]
+    valid = ~np.isnan(column[3])
+    if not valid.any():
+        return None
+
+    bars = bars_from_columns(
+        dates[valid].astype("datetime64[D]"),
+        {name: column[i][valid] for i, name in enumerate(BAR_FIELDS)},
+    )
+    return run_bars_backtest(load_strategy_class(code), bars, init_cash, **params)
+
+
+def spawn_context():
+    """子进程使用 spawn 启动，避免 fork 继承事件循环与数据库连接"""
+    return multiprocessing.get_context("spawn")
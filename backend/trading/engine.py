@@ -1,8 +1,12 @@
+import asyncio
+from typing import Callable
+
 import backtrader as bt
 
 from backend.core.config import Settings
 from backend.core.logger import logger
-from backend.utils import date_process, format_code, get_stock_data
+from backend.trading.feeds.pg_feed import make_feed
+from backend.utils import date_process, format_code, get_stock_bars
 
 
 async def run_backtest(
@@ -28,32 +32,14 @@ async def run_backtest(
     fromdate, todate = date_process(start_date, end_date)
 
     # 获取数据
-    stock_data = await get_stock_data(code, fromdate, todate)
+    bars = await get_stock_bars(code, fromdate, todate)
 
-    data = bt.feeds.PandasData(
-        dataname=stock_data,
-        fromdate=fromdate,
-        todate=todate,
-        name=code,
-    )
+    data = make_feed(bars, name=code)
     cerebro.adddata(data)
+    setup_cerebro(cerebro, strategy, init_cash, **kwargs)
 
-    # 添加策略
-    cerebro.addstrategy(strategy, **kwargs)
-
-    # 设置初始资金
-    cerebro.broker.setcash(init_cash)
-
-    # 设置佣金
-    cerebro.broker.setcommission(commission=Settings.COMMISSION)
-
-    # 添加分析器
-    cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name="sharpe")
-    cerebro.addanalyzer(bt.analyzers.DrawDown, _name="drawdown")
-    cerebro.addanalyzer(bt.analyzers.Returns, _name="returns")
-
-    # 运行回测
-    results = cerebro.run()
+    # 运行回测（CPU 密集，放到线程中执行，避免阻塞事件循环）
+    results = await asyncio.to_thread(cerebro.run)
     strat = results[0]
 
     # 输出结果
@@ -86,3 +72,94 @@ async def run_backtest(
             final_asset,
             f"{returns:.2f}%",
         )
+
+
+def run_bars_backtest(
+    strategy: bt.Strategy,
+    bars,
+    init_cash: float,
+    name: str | None = None,
+    progress: Callable[[int], bool] | None = None,
+    **kwargs,
+) -> dict:
+    """
+    同步执行单只股票的回测（在线程或子进程中调用）
+
+    Args:
+        strategy: 策略类
+        bars: 日线或分钟线数组，见 feeds.pg_feed.BAR_DTYPE / MINUTE_BAR_DTYPE
+        init_cash: 初始资金
+        name: 数据源名称
+        progress: 进度回调，见 ProgressAnalyzer
+        **kwargs: 策略参数
+
+    Returns:
+        绩效指标，见 collect_metrics
+    """
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.adddata(make_feed(bars, name=name))
+    setup_cerebro(cerebro, strategy, init_cash, **kwargs)
+    if progress:
+        cerebro.addanalyzer(ProgressAnalyzer, callback=progress)
+    strat = cerebro.run()[0]
+    return collect_metrics(cerebro, strat, init_cash)
+
+
+def setup_cerebro(cerebro: bt.Cerebro, strategy: bt.Strategy, init_cash: float, **kwargs) -> None:
+    """添加策略、资金、佣金与分析器"""
+    # 添加策略
+    cerebro.addstrategy(strategy, **kwargs)
+
+    # 设置初始资金
+    cerebro.broker.setcash(init_cash)
+
+    # 设置佣金
+    cerebro.broker.setcommission(commission=float(Settings.COMMISSION))
+
+    # 添加分析器
+    cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name="sharpe")
+    cerebro.addanalyzer(bt.analyzers.DrawDown, _name="drawdown")
+    cerebro.addanalyzer(bt.analyzers.Returns, _name="returns")
+    cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name="trades")
+
+
+def collect_metrics(cerebro: bt.Cerebro, strat: bt.Strategy, init_cash: float) -> dict:
+    """汇总回测绩效指标，字段与 StrategyBacktest 对应"""
+    final_capital = cerebro.broker.getvalue()
+    returns = strat.analyzers.returns.get_analysis()
+    sharpe = strat.analyzers.sharpe.get_analysis().get("sharperatio")
+    trades = strat.analyzers.trades.get_analysis()
+
+    closed = trades.get("total", {}).get("closed", 0)
+    won = trades.get("won", {}).get("total", 0)
+    lost = trades.get("lost", {}).get("total", 0)
+
+    return {
+        "final_capital": round(final_capital, 2),
+        "total_return": (final_capital / init_cash - 1) * 100,
+        "annual_return": returns.get("rnorm100"),
+        "max_drawdown": strat.analyzers.drawdown.get_analysis()["max"]["drawdown"],
+        "sharpe_ratio": sharpe,
+        "win_rate": won / closed * 100 if closed else None,
+        "trade_count": closed,
+        "win_count": won,
+        "loss_count": lost,
+    }
+
+
+class ProgressAnalyzer(bt.Analyzer):
+    """
+    回测进度分析器
+
+    每 interval 根 K 线调用一次 callback(已处理 K 线数)，callback 返回 True 时中止回测。
+    """
+
+    params = (("callback", None), ("interval", 50))
+
+    def start(self):
+        self.bars = 0
+
+    def next(self):
+        self.bars += 1
+        if self.p.callback and self.bars % self.p.interval == 0 and self.p.callback(self.bars):
+            self.strategy.env.runstop()
@@ -0,0 +1,215 @@
+"""PostgreSQL 日线 / 分钟线数据源
+
+通过 COPY ... TO STDOUT (FORMAT binary) 一次读取多只股票的日线或已归档的 1 分钟线，用 NumPy 按定长记录直接解析：
+- 价格在 SQL 中转为 float8、缺失值转为 NaN，每行都是定长记录，无需逐行构造 Python 对象
+- 股票代码在 SQL 中转为其在请求列表中的序号，结果按 (序号, 时间) 排序后按股票切片
+- PGData 直接从 NumPy 数组向 Backtrader 推送 K 线，不经过 DataFrame；分钟线数组用 make_feed 创建分钟周期的数据源
+"""
+
+from datetime import date, datetime
+
+import backtrader as bt
+import numpy as np
+
+from backend.db.market_store import market_store
+from backend.db.session import raw_connection
+
+# 日线数组的结构
+BAR_DTYPE = np.dtype(
+    [
+        ("date", "datetime64[D]"),
+        ("open", "f8"),
+        ("high", "f8"),
+        ("low", "f8"),
+        ("close", "f8"),
+        ("volume", "f8"),
+    ]
+)
+
+# 分钟线数组的结构，date 精确到分钟
+MINUTE_BAR_DTYPE = np.dtype(
+    [
+        ("date", "datetime64[m]"),
+        ("open", "f8"),
+        ("high", "f8"),
+        ("low", "f8"),
+        ("close", "f8"),
+        ("volume", "f8"),
+    ]
+)
+
+BAR_FIELDS = ("open", "high", "low", "close", "volume")
+
+DAILY_BARS_SQL = f"""
+SELECT array_position($1::text[], stock_code::text)::int4,
+       trade_date,
+       {", ".join(f"COALESCE({name}::float8, 'NaN')" for name in BAR_FIELDS)}
+FROM stock_daily_line
+WHERE stock_code = ANY($1::text[]) AND trade_date BETWEEN $2 AND $3
+ORDER BY 1, trade_date
+"""
+
+MINUTE_BARS_SQL = f"""
+SELECT array_position($1::text[], stock_code::text)::int4,
+       trade_time,
+       {", ".join(f"COALESCE({name}::float8, 'NaN')" for name in BAR_FIELDS)}
+FROM stock_minute_line
+WHERE stock_code = ANY($1::text[]) AND trade_time BETWEEN $2 AND $3
+ORDER BY 1, trade_time
+"""
+
+# 二进制 COPY 格式：11 字节签名 + 4 字节标志位 + 4 字节扩展区长度，结尾为 2 字节的 -1
+COPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+COPY_HEADER_SIZE = 19
+COPY_TRAILER_SIZE = 2
+
+
+def _row_dtype(time_type: str) -> np.dtype:
+    # 每行：2 字节字段数，每个字段 4 字节长度 + 数据（此处均为定长、非空）
+    return np.dtype(
+        [("_fields", ">i2"), ("_len_index", ">i4"), ("index", ">i4"), ("_len_date", ">i4"), ("date", time_type)]
+        + [item for name in BAR_FIELDS for item in ((f"_len_{name}", ">i4"), (name, ">f8"))]
+    )
+
+
+# 日期为 4 字节天数，时间戳为 8 字节微秒数
+_ROW_DTYPE = _row_dtype(">i4")
+_MINUTE_ROW_DTYPE = _row_dtype(">i8")
+
+# PostgreSQL 二进制日期、时间戳以 2000-01-01 为零点
+PG_EPOCH = np.datetime64("2000-01-01", "D")
+PG_EPOCH_US = np.datetime64("2000-01-01T00:00:00", "us")
+
+
+def _parse_rows(payload: bytes, row_dtype: np.dtype) -> np.ndarray:
+    if not payload.startswith(COPY_SIGNATURE):
+        raise ValueError("无效的二进制 COPY 数据")
+    extension = int.from_bytes(payload[15:COPY_HEADER_SIZE], "big")
+    body = memoryview(payload)[COPY_HEADER_SIZE + extension : len(payload) - COPY_TRAILER_SIZE]
+    return np.frombuffer(body, dtype=row_dtype)
+
+
+def _split(rows: np.ndarray, bars: np.ndarray, stocks: int) -> list[np.ndarray]:
+    for name in BAR_FIELDS:
+        bars[name] = rows[name]
+    # 序号从 1 开始且已排序，按边界切片
+    bounds = np.searchsorted(rows["index"], np.arange(1, stocks + 2))
+    return [bars[bounds[i] : bounds[i + 1]] for i in range(stocks)]
+
+
+def parse_daily_bars(payload: bytes, stocks: int) -> list[np.ndarray]:
+    """
+    解析 DAILY_BARS_SQL 的二进制 COPY 输出
+
+    Args:
+        payload: COPY 输出的完整字节流
+        stocks: 请求的股票数
+
+    Returns:
+        按请求顺序排列的每只股票的日线数组（BAR_DTYPE），没有数据的股票为空数组
+    """
+    rows = _parse_rows(payload, _ROW_DTYPE)
+    bars = np.empty(len(rows), dtype=BAR_DTYPE)
+    bars["date"] = PG_EPOCH + rows["date"].astype(np.int64)
+    return _split(rows, bars, stocks)
+
+
+def parse_minute_bars(payload: bytes, stocks: int) -> list[np.ndarray]:
+    """
+    解析 MINUTE_BARS_SQL 的二进制 COPY 输出，返回每只股票的分钟线数组（MINUTE_BAR_DTYPE）
+
+    trade_time 为不带时区的 timestamp（见 models/minute.py），二进制值即北京时间距 2000-01-01 的微秒数
+    """
+    rows = _parse_rows(payload, _MINUTE_ROW_DTYPE)
+    bars = np.empty(len(rows), dtype=MINUTE_BAR_DTYPE)
+    bars["date"] = (PG_EPOCH_US + rows["date"].astype(np.int64)).astype("datetime64[m]")
+    return _split(rows, bars, stocks)
+
+
+async def fetch_daily_bars(codes: list[str], start_date: date, end_date: date) -> dict[str, np.ndarray]:
+    """
+    一次查询读取多只股票 [start_date, end_date] 的日线
+
+    Returns:
+        {股票代码: 日线数组}，按交易日升序
+    """
+    codes = list(dict.fromkeys(codes))
+    snapshot = market_store.snapshot()
+    if snapshot is not None:
+        return {code: bars_from_columns(*snapshot.series(code, start_date, end_date, BAR_FIELDS)) for code in codes}
+
+    payload = await _copy_binary(DAILY_BARS_SQL, codes, start_date, end_date)
+    return dict(zip(codes, parse_daily_bars(payload, len(codes))))
+
+
+async def fetch_minute_bars(codes: list[str], start: datetime, end: datetime) -> dict[str, np.ndarray]:
+    """
+    一次查询读取多只股票 [start, end] 内已归档的 1 分钟线（见 services/minute.py）
+
+    Returns:
+        {股票代码: 分钟线数组}，按时间升序
+    """
+    codes = list(dict.fromkeys(codes))
+    payload = await _copy_binary(MINUTE_BARS_SQL, codes, start, end)
+    return dict(zip(codes, parse_minute_bars(payload, len(codes))))
+
+
+async def _copy_binary(sql: str, *args) -> bytes:
+    chunks: list[bytes] = []
+
+    async def _sink(chunk: bytes) -> None:
+        chunks.append(chunk)
+
+    async with raw_connection() as conn:
+        await conn.copy_from_query(sql, *args, output=_sink, format="binary")
+    return b"".join(chunks)
+
+
+class PGData(bt.feed.DataBase):
+    """
+    基于日线数组的 Backtrader 数据源
+
+    用法：
+        bars = await fetch_daily_bars(codes, start_date, end_date)
+        cerebro.adddata(PGData(bars=bars[code], name=code))
+    """
+
+    params = (("bars", None),)
+
+    def start(self):
+        super().start()
+        bars = self.p.bars if self.p.bars is not None else np.empty(0, dtype=BAR_DTYPE)
+        # Backtrader 时间数值 = 公历序数（0001-01-01 为 1）+ 当日已过的比例，datetime64 以 1970-01-01 为零点
+        days = bars["date"].astype("datetime64[m]").astype(np.int64) / 1440
+        ordinals = days + date(1970, 1, 1).toordinal()
+        self._rows = zip(
+            ordinals.tolist(),
+            *(bars[name].tolist() for name in BAR_FIELDS),
+        )
+
+    def _load(self):
+        row = next(self._rows, None)
+        if row is None:
+            return False
+
+        lines = self.lines
+        lines.datetime[0], lines.open[0], lines.high[0], lines.low[0], lines.close[0], lines.volume[0] = row
+        lines.openinterest[0] = 0.0
+        return True
+
+
+def make_feed(bars: np.ndarray | None, name: str | None = None) -> PGData:
+    """按数组类型创建数据源，分钟线数组（MINUTE_BAR_DTYPE）设置为 1 分钟周期"""
+    if bars is not None and bars.dtype == MINUTE_BAR_DTYPE:
+        return PGData(bars=bars, name=name, timeframe=bt.TimeFrame.Minutes, compression=1)
+    return PGData(bars=bars, name=name)
+
+
+def bars_from_columns(dates: np.ndarray, columns: dict[str, np.ndarray]) -> np.ndarray:
+    """由交易日与各价格列组装日线数组"""
+    bars = np.empty(len(dates), dtype=BAR_DTYPE)
+    bars["date"] = dates.astype("datetime64[D]")
+    for name in BAR_FIELDS:
+        bars[name] = columns[name]
+    return bars
+
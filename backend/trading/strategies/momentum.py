@@ -1,15 +1,43 @@
-import math
-
 import backtrader as bt
 import numpy as np
 
+from backend.trading.vector_engine import rolling_momentum
+
 """
 通过计算 stock 的动量得分来选择股票进行投资。
 得分计算：周期内的年化收益率 * R²，连续3日跌幅超过5%的股票得分为0。
 每20个交易日调仓一次，选择1个或2个最高的股票进行买入，其他卖出。
 
+得分在回测开始时对每只股票的全部K线一次性向量化算出（见 momentum_scores），调仓时直接按下标读取。
 """
 
+# 年化天数，与原逐窗口拟合的口径一致
+ANNUAL_DAYS = 250
+
+
+def momentum_scores(close: np.ndarray, period: int) -> np.ndarray:
+    """
+    计算每根K线的动量得分：年化收益率 * R²，连续3日跌幅超过5%时为0
+
+    Args:
+        close: 收盘价，一维 (K线) 或二维 (K线, 股票)
+        period: 回归窗口长度
+
+    Returns:
+        与 close 形状相同的得分，K线不足 period 处为 NaN
+    """
+    close = np.asarray(close, dtype=np.float64)
+    matrix = close.reshape(len(close), -1)
+    annual, r2 = rolling_momentum(matrix, period, ANNUAL_DAYS)
+    score = annual * r2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = matrix[1:] / matrix[:-1]
+    falling = np.zeros(matrix.shape, dtype=bool)
+    falling[3:] = (ratio[2:] < 0.95) & (ratio[1:-1] < 0.95) & (ratio[:-2] < 0.95)
+    score = np.where(falling & ~np.isnan(score), 0.0, score)
+    return score.reshape(close.shape)
+
 
 class MomentumStrategy(bt.Strategy):
     params = (
@@ -42,43 +70,33 @@ class MomentumStrategy(bt.Strategy):
         for d in self.datas:
             self.orders[d] = None
 
+    def start(self):
+        # 数据已预加载时，一次性算出每只股票全部K线的得分
+        self.scores = {}
+        for data in self.datas:
+            close = np.asarray(data.close.array, dtype=np.float64)
+            if not len(close):
+                continue
+            for period in {self.p.short_period, self.p.long_period}:
+                self.scores[(data, period)] = momentum_scores(close, period)
+
     def calculate_score(self, data, period):
         """
         计算stock的动量得分
         """
-        # 获取收盘价和最高价
-        prices = np.array([data.close.get(i, size=1)[0] for i in range(-period, 0)])
-
-        # 设置参数
-        y = np.log(prices)
-        x = np.arange(len(y))
-        weights = np.linspace(1, 2, len(y))
-
-        # 计算年化收益率
-        slope, intercept = np.polyfit(x, y, 1, w=weights)
-        annualized_returns = math.exp(slope * 250) - 1
-
-        # 计算R²
-        ss_res = np.sum(weights * (y - (slope * x + intercept)) ** 2)
-        ss_tot = np.sum(weights * (y - np.mean(y)) ** 2)
-        r2 = 1 - ss_res / ss_tot if ss_tot else 0
-
-        # 计算得分
-        score = annualized_returns * r2
-
-        # 过滤近3日跌幅超过5%的stock
-        if (
-            max(
-                prices[-1] / prices[-2],
-                prices[-2] / prices[-3],
-                prices[-3] / prices[-4],
-            )
-            < 0.95,
-        ):
-            print(f"过滤 {data._name}，近3日跌幅超过5%")
-            score = 0
-
-        return score
+        scores = self.scores.get((data, period))
+        # 回归窗口截至上一根K线，不含当前K线
+        index = len(data) - 2
+        if index < 0:
+            return 0
+        if scores is not None and index < len(scores):
+            score = scores[index]
+        else:
+            # 未预加载（如实盘逐根推送）时只计算最新窗口
+            prices = np.asarray(data.close.get(ago=-1, size=min(index + 1, period + 3)), dtype=np.float64)
+            score = momentum_scores(prices, period)[-1]
+
+        return 0 if np.isnan(score) else float(score)
 
     def filter_stocks(self, max_score, period):
         """根据动量和R²过滤tocks"""
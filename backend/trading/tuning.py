@@ -0,0 +1,225 @@
+"""Optuna 参数调优的子进程逻辑
+
+- 搜索空间由策略模板的 params 生成：INT/FLOAT 参数在 [min, max] 内采样，BOOL 在 True/False 中选择，
+  缺少范围或字符串参数固定为默认值
+- 行情通过共享内存传入（见 trading/batch.py），每个子进程缓存压缩后的面板与指标，多个试验之间复用
+- 支持向量化回测的模板按检查点上报截至当前的平均收益率，其余模板逐只股票用 Backtrader 回测并上报，
+  配合 MedianPruner 提前终止表现落后的试验
+- 多个子进程共享同一个 Optuna 存储，并发执行同一个 study
+"""
+
+import math
+from dataclasses import dataclass
+
+import numpy as np
+import optuna
+from sqlalchemy import event
+
+from backend.strategy_templates import ParamType, registry
+from backend.trading.batch import SharedPanelMeta, attach_shared_panel, run_job
+from backend.trading.vector_engine import SIGNALS, IndicatorCache, MarketPanel, run_vector_backtest
+
+# 优化目标 -> 优化方向
+OBJECTIVES = {
+    "annual_return": "maximize",
+    "sharpe": "maximize",
+    "final_value": "maximize",
+    "max_drawdown": "minimize",
+}
+
+# 向量化回测的检查点间隔（K 线数，约半年）
+CHECKPOINT_BARS = 126
+
+# 每个子进程缓存的指标数量
+INDICATOR_CACHE_ENTRIES = 32
+
+# study 的用户属性，为真时子进程在当前试验结束后停止
+STOP_ATTR = "stop_requested"
+
+
+def build_search_space(template_id: str) -> dict[str, dict]:
+    """
+    由策略模板参数生成搜索空间
+
+    Returns:
+        {参数名: {"type": ..., "low": ..., "high": ...} 或 {"type": "fixed", "value": ...}}
+    """
+    template = registry.get(template_id)
+    if not template:
+        raise ValueError(f"策略模板不存在: {template_id}")
+
+    space = {}
+    for param in template.params:
+        if param.type in (ParamType.INT, ParamType.FLOAT) and param.min is not None and param.max is not None:
+            if param.type == ParamType.INT:
+                space[param.name] = {"type": "int", "low": int(param.min), "high": int(param.max)}
+            else:
+                space[param.name] = {"type": "float", "low": float(param.min), "high": float(param.max)}
+        elif param.type == ParamType.BOOL:
+            space[param.name] = {"type": "bool"}
+        else:
+            space[param.name] = {"type": "fixed", "value": param.default}
+
+    if not any(spec["type"] != "fixed" for spec in space.values()):
+        raise ValueError(f"策略模板 {template_id} 没有可调优的参数")
+    return space
+
+
+def suggest_params(trial: optuna.Trial, space: dict[str, dict]) -> dict:
+    params = {}
+    for name, spec in space.items():
+        if spec["type"] == "int":
+            params[name] = trial.suggest_int(name, spec["low"], spec["high"])
+        elif spec["type"] == "float":
+            params[name] = trial.suggest_float(name, spec["low"], spec["high"])
+        elif spec["type"] == "bool":
+            params[name] = trial.suggest_categorical(name, [True, False])
+        else:
+            params[name] = spec["value"]
+    return params
+
+
+def warmup_steps(template_id: str, bars: int, stocks: int) -> int:
+    """剪枝前的预热步数：向量化回测为一个检查点，逐只回测为四分之一的股票"""
+    if template_id in SIGNALS:
+        return min(CHECKPOINT_BARS, max(bars - 1, 0))
+    return max(stocks // 4, 1)
+
+
+def make_storage(url: str) -> optuna.storages.BaseStorage:
+    """
+    多进程共享的 Optuna 存储
+
+    SQLite 每次上报中间值都会提交事务，默认的同步提交是主要耗时，
+    改为 WAL + synchronous=NORMAL，并加长锁等待时间以容纳多进程并发写入。
+    """
+    if not url.startswith("sqlite"):
+        return optuna.storages.RDBStorage(url)
+
+    storage = optuna.storages.RDBStorage(url, engine_kwargs={"connect_args": {"timeout": 60}})
+
+    @event.listens_for(storage.engine, "connect")
+    def _set_pragmas(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    storage.engine.dispose()  # 丢弃建表时创建的连接，之后的连接均应用上述设置
+    return storage
+
+
+def make_pruner(warmup: int) -> optuna.pruners.BasePruner:
+    return optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=warmup)
+
+
+@dataclass
+class TuningTask:
+    """子进程执行调优所需的参数"""
+
+    storage_url: str
+    study_name: str
+    meta: SharedPanelMeta
+    codes: list[str]
+    template_id: str
+    space: dict[str, dict]
+    objective: str
+    total_trials: int
+    init_cash: float
+    warmup: int
+
+
+# ----------------------------------------------------------------------
+#                               子进程
+# ----------------------------------------------------------------------
+
+_indicator_caches: dict[str, IndicatorCache] = {}
+
+
+def _indicator_cache(task: TuningTask) -> IndicatorCache:
+    """按共享内存名缓存压缩面板与指标，只保留当前使用的一份"""
+    meta = task.meta
+    cache = _indicator_caches.get(meta.name)
+    if cache is None:
+        dates, values = attach_shared_panel(meta)
+        panel = MarketPanel(dates.astype("datetime64[D]"), task.codes, *values)
+        _indicator_caches.clear()
+        cache = _indicator_caches[meta.name] = IndicatorCache(panel.compact(), INDICATOR_CACHE_ENTRIES)
+    return cache
+
+
+def _mean(values) -> float:
+    values = np.asarray([np.nan if v is None else v for v in values], dtype=np.float64)
+    return float(np.nanmean(values)) if np.isfinite(values).any() else 0.0
+
+
+def _vector_objective(task: TuningTask, trial: optuna.Trial, params: dict) -> float:
+    def _checkpoint(bars: int, values: np.ndarray) -> None:
+        trial.report(_mean((values / task.init_cash - 1) * 100), bars)
+        if trial.should_prune():
+            raise optuna.TrialPruned()
+
+    cache = _indicator_cache(task)
+    result = run_vector_backtest(
+        cache.panel,
+        task.template_id,
+        [params],
+        init_cash=task.init_cash,
+        on_checkpoint=_checkpoint,
+        checkpoint_every=CHECKPOINT_BARS,
+        cache=cache,
+    )
+    return _mean(getattr(result, task.objective))
+
+
+def _backtrader_objective(task: TuningTask, trial: optuna.Trial, params: dict) -> float:
+    code = registry.get(task.template_id).code
+    keys = {"annual_return": "annual_return", "sharpe": "sharpe_ratio", "final_value": "final_capital"}
+    key = keys.get(task.objective, task.objective)
+
+    results, returns = [], []
+    for index in range(task.meta.stocks):
+        metrics = run_job(task.meta, index, code, params, task.init_cash)
+        if metrics is None:
+            continue
+        results.append(metrics[key])
+        returns.append(metrics["total_return"])
+
+        trial.report(_mean(returns), index)
+        if trial.should_prune():
+            raise optuna.TrialPruned()
+    return _mean(results)
+
+
+def run_tuning_worker(task: TuningTask) -> int:
+    """
+    在子进程中执行同一 study 的试验，直到 study 的试验总数达到 total_trials
+
+    Returns:
+        本进程执行的试验数
+    """
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    study = optuna.load_study(
+        study_name=task.study_name,
+        storage=make_storage(task.storage_url),
+        pruner=make_pruner(task.warmup),
+    )
+    evaluate = _vector_objective if task.template_id in SIGNALS else _backtrader_objective
+    executed = 0
+
+    def _objective(trial: optuna.Trial) -> float:
+        nonlocal executed
+        executed += 1
+        value = evaluate(task, trial, suggest_params(trial, task.space))
+        return value if math.isfinite(value) else 0.0
+
+    def _stop_if_requested(study: optuna.Study, trial: optuna.trial.FrozenTrial) -> None:
+        if study.user_attrs.get(STOP_ATTR):
+            study.stop()
+
+    study.optimize(
+        _objective,
+        callbacks=[optuna.study.MaxTrialsCallback(task.total_trials, states=None), _stop_if_requested],
+        catch=(Exception,),
+    )
+    return executed
@@ -0,0 +1,672 @@
+"""向量化回测引擎
+
+面向信号类策略（双均线、MACD、RSI、布林带），在 (交易日 × 股票) 矩阵上一次性完成回测，
+用于大批量股票、参数寻优等场景；单只股票的细粒度回测仍使用 trading/engine.py（Backtrader）。
+
+撮合规则与内置 Backtrader 策略保持一致：
+- 收盘产生信号，下一根 K 线开盘价成交；持仓期间只处理卖出信号，挂单期间不处理新信号
+- 买入数量按 99% 可用资金、以信号当日收盘价计算，按 100 股整手取整；开盘价成交金额超出现金时订单作废
+- 手续费按成交金额 × Settings.COMMISSION 双边收取
+A 股规则：
+- T+1：买入成交当日不能卖出（次日开盘成交的撮合方式天然满足）
+- 涨跌停：开盘涨停无法买入、开盘跌停无法卖出，订单顺延到下一根 K 线（block_limit=False 时与 Backtrader 完全一致）；
+  涨跌停价为近似值：按前复权的昨收乘以幅度、四舍五入到 2 位小数（复权价与交易所实际价格有差异），
+  幅度只按板块区分（见 limit_ratio），ST 股票的 ±5% 未建模
+停牌日不产生 K 线：每只股票的数据先压缩为连续的有效 K 线序列再计算指标，与 Backtrader 逐只加载数据的行为一致。
+
+绩效指标与 Backtrader 分析器口径一致：
+- annual_return: Returns.rnorm100（按 K 线数对数收益年化，252 个交易日/年）
+- max_drawdown: DrawDown.max.drawdown（%）
+- sharpe: SharpeRatio 默认参数（年度收益，无风险利率 1%，总体标准差，不足两年为 None）
+"""
+
+import math
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date
+from itertools import product
+from typing import Callable, Iterable
+
+import numpy as np
+
+from backend.core.config import Settings
+from backend.db.market_store import market_store
+from backend.db.session import raw_connection
+
+TRADING_DAYS_PER_YEAR = 252
+RISK_FREE_RATE = 0.01
+LOT_SIZE = 100
+CASH_BUFFER = 0.99
+
+
+def limit_ratio(code: str) -> float:
+    """涨跌停幅度：创业板、科创板 20%，北交所 30%，其余 10%"""
+    digits = "".join(ch for ch in code if ch.isdigit())
+    if code.lower().startswith("bj") or digits.startswith(("8", "4", "92")):
+        return 0.3
+    if digits.startswith(("300", "301", "688", "689")):
+        return 0.2
+    return 0.1
+
+
+# ----------------------------------------------------------------------
+#                               数据
+# ----------------------------------------------------------------------
+
+
+@dataclass
+class MarketPanel:
+    """(交易日 × 股票) 行情矩阵，停牌等无数据处为 NaN"""
+
+    dates: np.ndarray  # datetime64[D]，升序
+    codes: list[str]
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray | None = None
+
+    def compact(self) -> "CompactPanel":
+        """将每只股票的有效 K 线前移为连续序列（列内保持时间顺序）"""
+        valid = ~np.isnan(self.close) & ~np.isnan(self.open)
+        bars = valid.sum(axis=0)
+        length = int(bars.max()) if len(bars) else 0
+
+        rows = np.cumsum(valid, axis=0) - 1
+        t_idx, s_idx = np.nonzero(valid)
+        target = rows[t_idx, s_idx]
+
+        def _pack(values: np.ndarray, fill=np.nan, dtype=np.float64) -> np.ndarray:
+            out = np.full((length, len(self.codes)), fill, dtype=dtype)
+            out[target, s_idx] = values[t_idx, s_idx]
+            return out
+
+        dates = np.broadcast_to(self.dates[:, None], self.close.shape)
+        return CompactPanel(
+            codes=list(self.codes),
+            bars=bars,
+            dates=_pack(dates, np.datetime64("NaT"), "datetime64[D]"),
+            open=_pack(self.open),
+            high=_pack(self.high),
+            low=_pack(self.low),
+            close=_pack(self.close),
+            limit=np.array([limit_ratio(code) for code in self.codes]),
+        )
+
+
+@dataclass
+class CompactPanel:
+    """按股票压缩后的行情，第 t 行为每只股票的第 t 根有效 K 线"""
+
+    codes: list[str]
+    bars: np.ndarray  # 每只股票的有效 K 线数
+    dates: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    limit: np.ndarray  # 每只股票的涨跌停幅度
+
+    def tile(self, repeats: int) -> "CompactPanel":
+        """按列复制，用于同一批股票上并行回测多组参数"""
+        if repeats == 1:
+            return self
+        return CompactPanel(
+            codes=self.codes * repeats,
+            bars=np.tile(self.bars, repeats),
+            dates=np.tile(self.dates, (1, repeats)),
+            open=np.tile(self.open, (1, repeats)),
+            high=np.tile(self.high, (1, repeats)),
+            low=np.tile(self.low, (1, repeats)),
+            close=np.tile(self.close, (1, repeats)),
+            limit=np.tile(self.limit, repeats),
+        )
+
+    def slice_dates(self, start: np.datetime64, end: np.datetime64) -> tuple["CompactPanel", np.ndarray]:
+        """
+        截取每只股票在 [start, end) 内的 K 线
+
+        Returns:
+            (截取后的行情, 行号矩阵)；行号用于以同样方式截取在完整面板上算好的指标、信号（见 take_rows），无效处为 -1
+        """
+        has_date = ~np.isnat(self.dates)
+        first = ((self.dates < start) & has_date).sum(axis=0)
+        bars = ((self.dates < end) & has_date).sum(axis=0) - first
+        length = int(bars.max()) if len(bars) else 0
+        offset = np.arange(length)[:, None]
+        rows = np.where(offset < bars, first + offset, -1)
+        window = CompactPanel(
+            codes=list(self.codes),
+            bars=bars,
+            dates=take_rows(self.dates, rows),
+            open=take_rows(self.open, rows),
+            high=take_rows(self.high, rows),
+            low=take_rows(self.low, rows),
+            close=take_rows(self.close, rows),
+            limit=self.limit,
+        )
+        return window, rows
+
+
+def take_rows(values: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """按行号矩阵逐列取值，行号为 -1 处填充 NaN / NaT / False"""
+    out = values[np.maximum(rows, 0), np.arange(values.shape[1])]
+    if out.dtype == np.bool_:
+        out[rows < 0] = False
+    elif np.issubdtype(out.dtype, np.datetime64):
+        out[rows < 0] = np.datetime64("NaT")
+    else:
+        out[rows < 0] = np.nan
+    return out
+
+
+async def load_market_panel(codes: list[str], start_date: date, end_date: date) -> MarketPanel:
+    """加载 [start_date, end_date] 的行情矩阵，启用本地行情库时从库中读取，否则查询 stock_daily_line"""
+    snapshot = market_store.snapshot()
+    if snapshot is not None:
+        dates, matrices = snapshot.select(list(codes), start_date, end_date)
+        return MarketPanel(dates, list(codes), *(matrices[name] for name in ("open", "high", "low", "close", "volume")))
+
+    async with raw_connection() as conn:
+        records = await conn.fetch(
+            "SELECT stock_code, trade_date, open::float8, high::float8, low::float8, close::float8, volume::float8 "
+            "FROM stock_daily_line WHERE stock_code = ANY($1) AND trade_date BETWEEN $2 AND $3",
+            list(codes),
+            start_date,
+            end_date,
+        )
+
+    dates = sorted({r[1] for r in records})
+    day_index = {d: i for i, d in enumerate(dates)}
+    code_index = {c: i for i, c in enumerate(codes)}
+
+    shape = (len(dates), len(codes))
+    matrices = [np.full(shape, np.nan) for _ in range(5)]
+    if records:
+        t = np.fromiter((day_index[r[1]] for r in records), dtype=np.int64, count=len(records))
+        s = np.fromiter((code_index[r[0]] for r in records), dtype=np.int64, count=len(records))
+        for offset, matrix in enumerate(matrices, start=2):
+            matrix[t, s] = np.array([r[offset] for r in records], dtype=np.float64)
+
+    return MarketPanel(np.array(dates, dtype="datetime64[D]"), list(codes), *matrices)
+
+
+# ----------------------------------------------------------------------
+#                               指标
+# ----------------------------------------------------------------------
+
+
+class IndicatorCache:
+    """
+    指标缓存，同一面板上的多组参数共享相同周期的指标
+
+    所有指标均按 Backtrader 的定义计算，未满足最小周期的位置为 NaN。
+    max_entries 限制缓存的指标数量（按 LRU 淘汰），跨多次回测复用同一缓存时避免内存无限增长。
+    """
+
+    def __init__(self, panel: CompactPanel, max_entries: int | None = None):
+        self.panel = panel
+        self.max_entries = max_entries
+        self._cache: OrderedDict[tuple, np.ndarray] = OrderedDict()
+
+    def _get(self, key: tuple, func: Callable[[], np.ndarray]) -> np.ndarray:
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        value = func()
+        self._cache[key] = value
+        if self.max_entries:
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return value
+
+    @staticmethod
+    def _rolling_sum(values: np.ndarray, period: int) -> np.ndarray:
+        out = np.full(values.shape, np.nan)
+        if period <= len(values):
+            csum = np.cumsum(np.vstack([np.zeros((1, values.shape[1])), values]), axis=0)
+            out[period - 1 :] = csum[period:] - csum[:-period]
+        return out
+
+    @staticmethod
+    def _seeded_average(values: np.ndarray, period: int, alpha: float) -> np.ndarray:
+        """以前 period 个有效值的简单平均为种子的指数平滑（EMA/SMMA），逐列处理前导 NaN"""
+        out = np.full(values.shape, np.nan)
+        valid = ~np.isnan(values)
+        count = np.cumsum(valid, axis=0)
+        seed_row = np.argmax(count >= period, axis=0)
+        has_seed = (count >= period).any(axis=0)
+        csum = np.cumsum(np.where(valid, values, 0), axis=0)
+
+        prev = np.full(values.shape[1], np.nan)
+        for t in range(len(values)):
+            seeding = has_seed & (seed_row == t)
+            if seeding.any():
+                prev = np.where(seeding, csum[t] / period, prev)
+            running = has_seed & (seed_row < t)
+            prev = np.where(running, prev + alpha * (values[t] - prev), prev)
+            out[t] = np.where(has_seed & (seed_row <= t), prev, np.nan)
+        return out
+
+    def sma(self, period: int) -> np.ndarray:
+        return self._get(("sma", period), lambda: self._rolling_sum(self.panel.close, period) / period)
+
+    def stddev(self, period: int) -> np.ndarray:
+        def _calc():
+            mean = self.sma(period)
+            mean_sq = self._rolling_sum(self.panel.close**2, period) / period
+            return np.sqrt(np.maximum(mean_sq - mean**2, 0))
+
+        return self._get(("stddev", period), _calc)
+
+    def ema(self, period: int, source: str = "close", values: np.ndarray | None = None) -> np.ndarray:
+        data = self.panel.close if values is None else values
+        return self._get(("ema", source, period), lambda: self._seeded_average(data, period, 2.0 / (period + 1)))
+
+    def macd(self, fast: int, slow: int, signal: int) -> tuple[np.ndarray, np.ndarray]:
+        macd = self._get(("macd", fast, slow), lambda: self.ema(fast) - self.ema(slow))
+        return macd, self.ema(signal, source=f"macd_{fast}_{slow}", values=macd)
+
+    def rsi(self, period: int) -> np.ndarray:
+        def _calc():
+            diff = np.vstack([np.full((1, self.panel.close.shape[1]), np.nan), np.diff(self.panel.close, axis=0)])
+            up = self._seeded_average(np.where(np.isnan(diff), np.nan, np.maximum(diff, 0)), period, 1.0 / period)
+            down = self._seeded_average(np.where(np.isnan(diff), np.nan, np.maximum(-diff, 0)), period, 1.0 / period)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                rsi = 100.0 - 100.0 / (1.0 + up / down)
+            return np.where((down == 0) & ~np.isnan(up), 100.0, rsi)
+
+        return self._get(("rsi", period), _calc)
+
+    def momentum(self, period: int, annual_days: int = TRADING_DAYS_PER_YEAR) -> tuple[np.ndarray, np.ndarray]:
+        return self._get(("momentum", period, annual_days), lambda: rolling_momentum(self.panel.close, period, annual_days))
+
+
+def rolling_momentum(
+    close: np.ndarray, period: int, annual_days: int = TRADING_DAYS_PER_YEAR
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    滚动加权对数线性回归，口径与 np.polyfit(k, ln(收盘价), 1, w=w) 一致
+
+    窗口内序号 k = 0..period-1，权重 w 由 1 线性增至 2（越近期权重越大）；polyfit 按 w² 加权拟合，
+    R² = 1 - Σw·残差² / Σw·(y - 均值)²，均值为简单平均。
+    窗口内的各项加权和由累计和相减得到，对所有股票、所有交易日一次算出，不再逐窗口拟合。
+
+    Args:
+        close: 收盘价，(K 线, 股票)
+        period: 窗口长度
+        annual_days: 年化天数
+
+    Returns:
+        (年化收益率 exp(斜率 × annual_days) - 1, R²)，窗口内有效 K 线不足 period 处为 NaN
+    """
+    close = np.asarray(close, dtype=np.float64)
+    length, columns = close.shape
+    annual = np.full((length, columns), np.nan)
+    r2 = np.full((length, columns), np.nan)
+    if period < 2 or length < period:
+        return annual, r2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        y = np.log(close)
+    valid = np.isfinite(y)
+    # 减去每列均值，斜率与 R² 不变，累计和的量级更小、相减时精度更高
+    y = np.where(valid, y - np.where(valid, y, 0).sum(axis=0) / np.maximum(valid.sum(axis=0), 1), 0.0)
+
+    # 序号的高次幂在长序列上会放大累计和的舍入误差，按块计算，每块的序号从块内起算
+    block = 4 * period
+    for end in range(period - 1, length, block):
+        rows = slice(end - period + 1, min(end + block, length))
+        slope, fit, count = _momentum_block(y[rows], valid[rows], period)
+        out = slice(end, rows.stop)
+        annual[out] = np.where(count == period, np.expm1(slope * annual_days), np.nan)
+        r2[out] = np.where(count == period, fit, np.nan)
+    return annual, r2
+
+
+def _momentum_block(y: np.ndarray, valid: np.ndarray, period: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """rolling_momentum 的一块：返回块内每个完整窗口的 (斜率, R², 有效 K 线数)"""
+    length, columns = y.shape
+    j = np.arange(length, dtype=np.float64)[:, None] - length // 2
+
+    def _window_sum(values: np.ndarray) -> np.ndarray:
+        total = np.zeros((length + 1, columns))
+        np.cumsum(values, axis=0, out=total[1:])
+        return total[period:] - total[:-period]
+
+    count = _window_sum(valid.astype(np.float64))
+    jy = j * y
+    sum_y, sum_jy, sum_jjy, sum_jjjy = _window_sum(y), _window_sum(jy), _window_sum(j * jy), _window_sum(j * j * jy)
+    sum_yy, sum_jyy = _window_sum(y * y), _window_sum(jy * y)
+
+    # 换算为窗口内序号 k = j - s 的加权和，s 为窗口起点
+    s = j[: length - period + 1]
+    s0 = sum_y
+    s1 = sum_jy - s * sum_y
+    s2 = sum_jjy - 2 * s * sum_jy + s * s * sum_y
+    s3 = sum_jjjy - 3 * s * sum_jjy + 3 * s * s * sum_jy - s**3 * sum_y
+    skyy = sum_jyy - s * sum_yy
+
+    c = 1.0 / (period - 1)
+    k = np.arange(period, dtype=np.float64)
+    w = 1 + k * c
+    v = w * w
+
+    # 拟合（权重 w²）
+    v0, v1, v2 = v.sum(), (v * k).sum(), (v * k * k).sum()
+    vy = s0 + 2 * c * s1 + c * c * s2
+    vky = s1 + 2 * c * s2 + c * c * s3
+    slope = (v0 * vky - v1 * vy) / (v0 * v2 - v1 * v1)
+    intercept = (vy - slope * v1) / v0
+
+    # R²（权重 w）
+    w0, w1, w2 = w.sum(), (w * k).sum(), (w * k * k).sum()
+    wy = s0 + c * s1
+    wky = s1 + c * s2
+    wyy = sum_yy + c * skyy
+    ss_res = (
+        wyy - 2 * intercept * wy - 2 * slope * wky
+        + intercept**2 * w0 + 2 * intercept * slope * w1 + slope**2 * w2
+    )
+    mean = s0 / period
+    ss_tot = wyy - 2 * mean * wy + mean * mean * w0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fit = np.where(ss_tot > 1e-12, 1 - ss_res / ss_tot, 0.0)
+    return slope, fit, count
+
+
+def _shift(values: np.ndarray) -> np.ndarray:
+    """上一根 K 线的值"""
+    out = np.full(values.shape, np.nan)
+    out[1:] = values[:-1]
+    return out
+
+
+# ----------------------------------------------------------------------
+#                               信号
+# ----------------------------------------------------------------------
+
+# 信号函数：(指标缓存, **参数) -> (买入信号, 卖出信号)
+SignalFunc = Callable[..., tuple[np.ndarray, np.ndarray]]
+
+
+def ma_cross_signals(cache: IndicatorCache, short_period: int = 5, long_period: int = 20):
+    short, long = cache.sma(int(short_period)), cache.sma(int(long_period))
+    prev_short, prev_long = _shift(short), _shift(long)
+    entry = (short > long) & (prev_short <= prev_long)
+    exit_ = (short < long) & (prev_short >= prev_long)
+    return entry, exit_
+
+
+def macd_signals(cache: IndicatorCache, fast_period: int = 12, slow_period: int = 26, signal_period: int = 9):
+    macd, signal = cache.macd(int(fast_period), int(slow_period), int(signal_period))
+    prev_macd, prev_signal = _shift(macd), _shift(signal)
+    entry = (macd > signal) & (prev_macd < prev_signal)
+    exit_ = (macd < signal) & (prev_macd > prev_signal)
+    return entry, exit_
+
+
+def rsi_signals(cache: IndicatorCache, rsi_period: int = 14, rsi_low: float = 30, rsi_high: float = 70):
+    rsi = cache.rsi(int(rsi_period))
+    return rsi < rsi_low, rsi > rsi_high
+
+
+def bollinger_signals(cache: IndicatorCache, period: int = 20, dev_factor: float = 2.0):
+    mid, dev = cache.sma(int(period)), cache.stddev(int(period))
+    close = cache.panel.close
+    return close <= mid - dev_factor * dev, close >= mid + dev_factor * dev
+
+
+# 与 strategy_templates 中的内置模板 id 对应
+SIGNALS: dict[str, SignalFunc] = {
+    "ma_cross_strategy": ma_cross_signals,
+    "macd_strategy": macd_signals,
+    "rsi_strategy": rsi_signals,
+    "bollinger_strategy": bollinger_signals,
+}
+
+
+# ----------------------------------------------------------------------
+#                               回测
+# ----------------------------------------------------------------------
+
+
+@dataclass
+class VectorBacktestResult:
+    """回测结果，每列对应一只股票 × 一组参数"""
+
+    codes: list[str]
+    params: list[dict]
+    final_value: np.ndarray
+    annual_return: np.ndarray
+    max_drawdown: np.ndarray
+    sharpe: np.ndarray
+    trades: np.ndarray
+    values: np.ndarray | None = field(default=None, repr=False)  # (K 线, 列) 每日资产，keep_values=True 时保留
+
+    def to_records(self) -> list[dict]:
+        def _num(x, digits):
+            return None if x is None or not np.isfinite(x) else round(float(x), digits)
+
+        return [
+            {
+                "code": self.codes[i],
+                "params": self.params[i],
+                "final_value": _num(self.final_value[i], 2),
+                "annual_return": _num(self.annual_return[i], 4),
+                "max_drawdown": _num(self.max_drawdown[i], 4),
+                "sharpe": _num(self.sharpe[i], 3),
+                "trades": int(self.trades[i]),
+            }
+            for i in range(len(self.codes))
+        ]
+
+
+# 检查点回调：(已处理的 K 线数, 截至当前的每列资产) -> None，抛出异常可中止回测（用于寻优剪枝）
+CheckpointFunc = Callable[[int, np.ndarray], None]
+
+
+def simulate(
+    panel: CompactPanel,
+    entry: np.ndarray,
+    exit_: np.ndarray,
+    init_cash: float | None = None,
+    commission: float | None = None,
+    block_limit: bool = True,
+    on_checkpoint: CheckpointFunc | None = None,
+    checkpoint_every: int = TRADING_DAYS_PER_YEAR,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    逐 K 线撮合（对所有列向量化），返回 (每日资产, 成交次数)
+
+    Args:
+        panel: 压缩后的行情
+        entry: 买入信号
+        exit_: 卖出信号
+        init_cash: 初始资金，默认 Settings.INIT_CACHE
+        commission: 手续费率，默认 Settings.COMMISSION
+        block_limit: 是否按涨跌停限制成交
+        on_checkpoint: 检查点回调
+        checkpoint_every: 检查点间隔（K 线数）
+    """
+    init_cash = float(Settings.INIT_CACHE if init_cash is None else init_cash)
+    commission = float(Settings.COMMISSION if commission is None else commission)
+
+    length, columns = panel.close.shape
+    cash = np.full(columns, init_cash)
+    position = np.zeros(columns)
+    pending = np.zeros(columns, dtype=np.int8)  # 1 买入挂单，-1 卖出挂单
+    pending_size = np.zeros(columns)
+    trades = np.zeros(columns, dtype=np.int64)
+    values = np.full((length, columns), np.nan)
+
+    prev_close = _shift(panel.close)
+    with np.errstate(invalid="ignore"):
+        limit_up = panel.open >= np.round(prev_close * (1 + panel.limit), 2) - 1e-6
+        limit_down = panel.open <= np.round(prev_close * (1 - panel.limit), 2) + 1e-6
+
+    for t in range(length):
+        active = t < panel.bars
+        open_, close = panel.open[t], panel.close[t]
+
+        # 1) 开盘撮合上一根 K 线的挂单
+        buying = active & (pending == 1)
+        if block_limit:
+            buying &= ~limit_up[t]
+        if buying.any():
+            cost = pending_size * open_ * (1 + commission)
+            filled = buying & (cost <= cash)
+            cash = np.where(filled, cash - cost, cash)
+            position = np.where(filled, position + pending_size, position)
+            trades += filled
+            pending = np.where(buying, 0, pending)  # 资金不足的订单作废
+
+        selling = active & (pending == -1)
+        if block_limit:
+            selling &= ~limit_down[t]
+        if selling.any():
+            cash = np.where(selling, cash + position * open_ * (1 - commission), cash)
+            position = np.where(selling, 0, position)
+            trades += selling
+            pending = np.where(selling, 0, pending)
+
+        # 2) 收盘计算资产
+        values[t] = np.where(active, cash + position * np.nan_to_num(close), np.nan)
+
+        # 3) 收盘产生信号，挂单下一根 K 线开盘成交
+        idle = active & (pending == 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            size = np.floor(cash * CASH_BUFFER / close / LOT_SIZE) * LOT_SIZE
+        buy = idle & (position == 0) & entry[t] & (size > 0)
+        sell = idle & (position > 0) & exit_[t]
+        pending = np.where(buy, 1, np.where(sell, -1, pending)).astype(np.int8)
+        pending_size = np.where(buy, size, pending_size)
+
+        if on_checkpoint and (t + 1) % checkpoint_every == 0:
+            on_checkpoint(t + 1, _last_values(values[: t + 1], np.minimum(panel.bars, t + 1)))
+
+    return values, trades
+
+
+def _last_values(values: np.ndarray, bars: np.ndarray) -> np.ndarray:
+    """每列最后一根有效 K 线的资产"""
+    out = np.full(values.shape[1], np.nan)
+    has = bars > 0
+    out[has] = values[bars[has] - 1, np.flatnonzero(has)]
+    return out
+
+
+def compute_metrics(
+    values: np.ndarray,
+    dates: np.ndarray,
+    bars: np.ndarray,
+    init_cash: float,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """按 Backtrader 分析器口径计算 (期末资产, 年化收益%, 最大回撤%, 夏普比率)"""
+    final_value = _last_values(values, bars)
+
+    # Returns.rnorm100
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ravg = np.log(final_value / init_cash) / bars
+        annual_return = np.where(ravg > -1, np.expm1(ravg * TRADING_DAYS_PER_YEAR), ravg) * 100
+
+    # DrawDown.max.drawdown
+    peak = np.fmax.accumulate(np.where(np.isnan(values), -np.inf, values), axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown = np.where(np.isnan(values), 0, (peak - values) / peak * 100)
+    max_drawdown = np.where(bars > 0, drawdown.max(axis=0, initial=0), np.nan)
+
+    # SharpeRatio：自然年末资产 -> 年度收益
+    years = np.where(np.isnat(dates), -1, dates.astype("datetime64[Y]").astype(np.int64))
+    next_years = np.vstack([years[1:], np.full((1, years.shape[1]), -1)])
+    year_end = (years >= 0) & (years != next_years)
+
+    sharpe = np.full(values.shape[1], np.nan)
+    for col in range(values.shape[1]):
+        year_values = values[year_end[:, col], col]
+        if len(year_values) < 1:
+            continue
+        returns = np.diff(np.concatenate([[init_cash], year_values])) / np.concatenate([[init_cash], year_values[:-1]])
+        excess = returns - RISK_FREE_RATE
+        std = excess.std()
+        if std > 0 and math.isfinite(std):
+            sharpe[col] = excess.mean() / std
+
+    return final_value, annual_return, max_drawdown, sharpe
+
+
+def run_vector_backtest(
+    panel: MarketPanel | CompactPanel,
+    strategy: str,
+    param_grid: dict[str, Iterable] | list[dict] | None = None,
+    init_cash: float | None = None,
+    commission: float | None = None,
+    block_limit: bool = True,
+    keep_values: bool = False,
+    on_checkpoint: CheckpointFunc | None = None,
+    checkpoint_every: int = TRADING_DAYS_PER_YEAR,
+    cache: IndicatorCache | None = None,
+) -> VectorBacktestResult:
+    """
+    在一批股票上回测一组或多组参数
+
+    Args:
+        panel: 行情矩阵
+        strategy: 策略模板 id，见 SIGNALS
+        param_grid: 参数网格 {参数名: 候选值列表}，或参数组合列表；为空时使用默认参数
+        init_cash: 初始资金，默认 Settings.INIT_CACHE
+        commission: 手续费率，默认 Settings.COMMISSION
+        block_limit: 是否按涨跌停限制成交
+        keep_values: 是否在结果中保留每日资产矩阵
+        on_checkpoint: 检查点回调，见 simulate
+        checkpoint_every: 检查点间隔（K 线数）
+        cache: 复用的指标缓存，须基于同一面板创建；为空时新建
+
+    Returns:
+        每列对应一只股票 × 一组参数，列顺序为参数组合在外、股票在内
+    """
+    if strategy not in SIGNALS:
+        raise ValueError(f"不支持向量化回测的策略: {strategy}")
+
+    if param_grid is None:
+        combos = [{}]
+    elif isinstance(param_grid, dict):
+        names = list(param_grid)
+        combos = [dict(zip(names, values)) for values in product(*(list(param_grid[n]) for n in names))]
+    else:
+        combos = [dict(c) for c in param_grid]
+
+    if cache is not None:
+        compact = cache.panel
+    else:
+        compact = panel.compact() if isinstance(panel, MarketPanel) else panel
+        cache = IndicatorCache(compact)
+    signals = [SIGNALS[strategy](cache, **combo) for combo in combos]
+    entry = np.hstack([s[0] for s in signals])
+    exit_ = np.hstack([s[1] for s in signals])
+
+    tiled = compact.tile(len(combos))
+    init_cash = float(Settings.INIT_CACHE if init_cash is None else init_cash)
+    values, trades = simulate(
+        tiled,
+        entry,
+        exit_,
+        init_cash=init_cash,
+        commission=commission,
+        block_limit=block_limit,
+        on_checkpoint=on_checkpoint,
+        checkpoint_every=checkpoint_every,
+    )
+    final_value, annual_return, max_drawdown, sharpe = compute_metrics(values, tiled.dates, tiled.bars, init_cash)
+
+    return VectorBacktestResult(
+        codes=tiled.codes,
+        params=[combo for combo in combos for _ in compact.codes],
+        final_value=final_value,
+        annual_return=annual_return,
+        max_drawdown=max_drawdown,
+        sharpe=sharpe,
+        trades=trades,
+        values=values if keep_values else None,
+    )
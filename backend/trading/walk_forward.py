@@ -0,0 +1,241 @@
+"""滚动窗口（Walk-Forward）优化
+
+把回测区间按交易日切分为若干「样本内 + 样本外」窗口：
+- 样本内：在参数网格上用向量化引擎回测，按优化目标选出最优参数
+- 样本外：用该参数回测紧随其后的区间，各窗口的样本外资产曲线首尾相接即为整体的样本外表现
+
+窗口之间相互独立，由主进程分发到进程池并行执行；行情通过共享内存传递（见 trading/batch.py）。
+指标在完整区间上只计算一次并在子进程中缓存，各窗口按日期截取（见 CompactPanel.slice_dates），
+窗口开始时指标已完成预热，与实盘中持续运行的策略一致。
+
+每个样本外窗口以初始资金、空仓开始，窗口结束时的持仓按收盘价计入资产；组合按股票等权。
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from backend.trading.batch import SharedPanelMeta, attach_shared_panel
+from backend.trading.tuning import OBJECTIVES, build_search_space
+from backend.trading.vector_engine import (
+    SIGNALS,
+    IndicatorCache,
+    MarketPanel,
+    compute_metrics,
+    simulate,
+    take_rows,
+)
+
+# 由模板参数范围生成网格时，每个数值参数的取值个数
+GRID_POINTS = 5
+
+# 单次撮合的最大列数（参数组合 × 股票），控制内存占用
+MAX_COLUMNS = 4096
+
+
+def build_param_grid(template_id: str, points: int = GRID_POINTS) -> dict[str, list]:
+    """由策略模板参数的 min/max 生成等距参数网格"""
+    if template_id not in SIGNALS:
+        raise ValueError(f"策略模板 {template_id} 不支持向量化回测，无法进行滚动窗口优化")
+
+    grid = {}
+    for name, spec in build_search_space(template_id).items():
+        if spec["type"] == "int":
+            grid[name] = sorted({int(round(v)) for v in np.linspace(spec["low"], spec["high"], points)})
+        elif spec["type"] == "float":
+            grid[name] = [round(float(v), 4) for v in np.linspace(spec["low"], spec["high"], points)]
+        elif spec["type"] == "bool":
+            grid[name] = [True, False]
+        else:
+            grid[name] = [spec["value"]]
+    return grid
+
+
+@dataclass(frozen=True)
+class WalkForwardWindow:
+    """一个窗口，均为交易日序号，区间左闭右开"""
+
+    index: int
+    in_sample_start: int
+    in_sample_end: int
+    out_sample_start: int
+    out_sample_end: int
+
+
+def split_windows(days: int, in_sample: int, out_sample: int, anchored: bool = False) -> list[WalkForwardWindow]:
+    """
+    切分滚动窗口，样本外区间首尾相接、不重叠
+
+    Args:
+        days: 交易日总数
+        in_sample: 样本内交易日数
+        out_sample: 样本外交易日数（即滚动步长）
+        anchored: 为 True 时样本内区间始终从第一个交易日开始（扩展窗口）
+    """
+    if in_sample <= 0 or out_sample <= 0:
+        raise ValueError("样本内、样本外交易日数必须大于 0")
+    if days <= in_sample:
+        raise ValueError(f"回测区间只有 {days} 个交易日，不足一个样本内窗口（{in_sample}）")
+
+    windows = []
+    for start in range(in_sample, days, out_sample):
+        windows.append(
+            WalkForwardWindow(
+                index=len(windows),
+                in_sample_start=0 if anchored else start - in_sample,
+                in_sample_end=start,
+                out_sample_start=start,
+                out_sample_end=min(start + out_sample, days),
+            )
+        )
+    return windows
+
+
+@dataclass
+class WalkForwardTask:
+    """子进程执行窗口优化所需的参数"""
+
+    meta: SharedPanelMeta
+    codes: list[str]
+    template_id: str
+    combos: list[dict]
+    objective: str
+    init_cash: float
+
+
+# ----------------------------------------------------------------------
+#                               子进程
+# ----------------------------------------------------------------------
+
+_panels: dict[str, tuple[np.ndarray, IndicatorCache]] = {}
+
+
+def _indicator_cache(task: WalkForwardTask) -> tuple[np.ndarray, IndicatorCache]:
+    """按共享内存名缓存交易日与完整区间的指标，同一进程执行的各窗口共用"""
+    meta = task.meta
+    cached = _panels.get(meta.name)
+    if cached is None:
+        dates, values = attach_shared_panel(meta)
+        panel = MarketPanel(dates.astype("datetime64[D]"), task.codes, *values)
+        _panels.clear()
+        cached = _panels[meta.name] = (panel.dates, IndicatorCache(panel.compact()))
+    return cached
+
+
+def _evaluate(task: WalkForwardTask, cache: IndicatorCache, combos: list[dict], start, end, keep_values=False):
+    """在 [start, end) 上回测多组参数，返回 (截取后的行情, 每日资产, 成交次数, 各项指标)"""
+    window, rows = cache.panel.slice_dates(start, end)
+    signals = [SIGNALS[task.template_id](cache, **combo) for combo in combos]
+    entry = np.hstack([take_rows(s[0], rows) for s in signals])
+    exit_ = np.hstack([take_rows(s[1], rows) for s in signals])
+
+    tiled = window.tile(len(combos))
+    values, trades = simulate(tiled, entry, exit_, init_cash=task.init_cash)
+    metrics = compute_metrics(values, tiled.dates, tiled.bars, task.init_cash)
+    return window, (values if keep_values else None), trades, metrics
+
+
+def _optimize(task: WalkForwardTask, cache: IndicatorCache, start, end) -> tuple[dict, float]:
+    """样本内寻优：各参数组合在全部股票上的目标值取平均，返回 (最优参数, 目标值)"""
+    stocks = len(task.codes)
+    chunk = max(MAX_COLUMNS // stocks, 1)
+    metric_index = {"final_value": 0, "annual_return": 1, "max_drawdown": 2, "sharpe": 3}[task.objective]
+
+    scores = []
+    for i in range(0, len(task.combos), chunk):
+        combos = task.combos[i : i + chunk]
+        _, _, _, metrics = _evaluate(task, cache, combos, start, end)
+        per_combo = metrics[metric_index].reshape(len(combos), stocks)
+        finite = np.isfinite(per_combo)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scores.extend(np.where(finite, per_combo, 0).sum(axis=1) / finite.sum(axis=1))
+
+    scores = np.asarray(scores, dtype=np.float64)
+    if not np.isfinite(scores).any():
+        return task.combos[0], float("nan")
+    best = np.nanargmax(scores) if OBJECTIVES[task.objective] == "maximize" else np.nanargmin(scores)
+    return task.combos[best], float(scores[best])
+
+
+def _equity_curve(window_dates: np.ndarray, panel, values: np.ndarray, init_cash: float) -> np.ndarray:
+    """各股票每日资产对齐到交易日、停牌日沿用前值，按股票等权合成为净值曲线（期初为 1）"""
+    nav = np.full((len(window_dates), values.shape[1]), np.nan)
+    valid = ~np.isnan(values)
+    rows, cols = np.nonzero(valid)
+    nav[np.searchsorted(window_dates, panel.dates[rows, cols]), cols] = values[rows, cols] / init_cash
+
+    # 前值填充，窗口开始前无数据的部分视为持有现金
+    index = np.where(np.isnan(nav), 0, np.arange(len(window_dates))[:, None])
+    np.maximum.accumulate(index, axis=0, out=index)
+    nav = nav[index, np.arange(nav.shape[1])]
+    nav = np.where(np.isnan(nav), 1.0, nav)
+    return nav.mean(axis=1)
+
+
+def run_window(task: WalkForwardTask, window: WalkForwardWindow) -> dict:
+    """
+    在子进程中执行一个窗口：样本内寻优，样本外用最优参数回测
+
+    Returns:
+        窗口结果，equity 为样本外每个交易日的组合净值（期初为 1）
+    """
+    dates, cache = _indicator_cache(task)
+    day = np.timedelta64(1, "D")
+    in_start, in_end = dates[window.in_sample_start], dates[window.in_sample_end - 1] + day
+    out_start, out_end = dates[window.out_sample_start], dates[window.out_sample_end - 1] + day
+
+    params, in_sample_value = _optimize(task, cache, in_start, in_end)
+    panel, values, trades, metrics = _evaluate(task, cache, [params], out_start, out_end, keep_values=True)
+    window_dates = dates[window.out_sample_start : window.out_sample_end]
+    equity = _equity_curve(window_dates, panel, values, task.init_cash)
+
+    _, annual_return, max_drawdown, _ = metrics
+    return {
+        "index": window.index,
+        "in_sample_start": str(in_start),
+        "in_sample_end": str(in_end - day),
+        "out_sample_start": str(out_start),
+        "out_sample_end": str(out_end - day),
+        "params": params,
+        "in_sample_value": in_sample_value if np.isfinite(in_sample_value) else None,
+        "out_sample_return": round(float(equity[-1] - 1) * 100, 4),
+        "out_sample_annual_return": _nanmean(annual_return),
+        "out_sample_max_drawdown": _nanmean(max_drawdown),
+        "trades": int(trades.sum()),
+        "dates": [str(d) for d in window_dates],
+        "equity": equity.tolist(),
+    }
+
+
+def _nanmean(values: np.ndarray) -> float | None:
+    values = values[np.isfinite(values)]
+    return round(float(values.mean()), 4) if values.size else None
+
+
+def stitch_equity(results: list[dict], init_cash: float) -> dict:
+    """
+    按窗口顺序首尾相接样本外净值，计算整体绩效
+
+    Returns:
+        绩效指标（与 engine.collect_metrics 同名）及 equity [[日期, 资产], ...]
+    """
+    dates, values, level = [], [], 1.0
+    for result in sorted(results, key=lambda r: r["index"]):
+        dates.extend(result["dates"])
+        values.extend(level * v for v in result["equity"])
+        level = values[-1]
+
+    values = np.asarray(values)[:, None] * init_cash
+    date_matrix = np.asarray(dates, dtype="datetime64[D]")[:, None]
+    final_value, annual_return, max_drawdown, sharpe = compute_metrics(
+        values, date_matrix, np.array([len(dates)]), init_cash
+    )
+    return {
+        "final_capital": float(final_value[0]),
+        "total_return": float(final_value[0] / init_cash - 1) * 100,
+        "annual_return": float(annual_return[0]),
+        "max_drawdown": float(max_drawdown[0]),
+        "sharpe_ratio": float(sharpe[0]) if np.isfinite(sharpe[0]) else None,
+        "trade_count": sum(r["trades"] for r in results),
+        "equity": [[d, round(float(v), 2)] for d, v in zip(dates, values[:, 0])],
+    }
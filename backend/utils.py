@@ -1,47 +1,51 @@
 import smtplib
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from typing import Tuple
 
+import numpy as np
 import pandas as pd
-from tortoise.expressions import Q
 
 import backend.core.config as config
+from backend.core.calendar import get_trading_calendar
 from backend.core.logger import logger
 from backend.db.session import with_db
-from backend.models import DailyLine, Holiday
+from backend.models import DailyLine
+from backend.trading.feeds.pg_feed import fetch_daily_bars
 
 
-@with_db
-async def get_stock_data(stock_code: str, fromdate: datetime, todate: datetime) -> pd.DataFrame:
-    """数据获取与预处理函数"""
+def _exclusive_range(fromdate: datetime, todate: datetime) -> Tuple[date, date]:
+    """(fromdate, todate) 开区间对应的交易日闭区间"""
+    start = fromdate.date() + timedelta(days=1)
+    end = todate.date() if todate.time() != time.min else todate.date() - timedelta(days=1)
+    return start, end
 
-    q = Q(stock_code=stock_code) & Q(trade_date__gt=fromdate)
-    q &= Q(trade_date__lt=todate)
 
-    stock_daily_data = await DailyLine.filter(q).all()
-
-    df = pd.DataFrame([item.__dict__ for item in stock_daily_data])
+@with_db
+async def get_stock_bars(stock_code: str, fromdate: datetime, todate: datetime) -> np.ndarray:
+    """获取 (fromdate, todate) 区间的日线数组，用于 PGData"""
+    start, end = _exclusive_range(fromdate, todate)
+    bars = await fetch_daily_bars([stock_code], start, end)
+    return bars[stock_code]
 
-    # 时间转换及索引设置
-    df["trade_date"] = pd.to_datetime(df["trade_date"])
-    df.set_index("trade_date", inplace=True)
 
-    # 数据预处理
-    parse_df = df.copy()
-    parse_df = parse_df.rename(
-        columns={
-            "open": "Open",
-            "high": "High",
-            "low": "Low",
-            "close": "Close",
-            "volume": "Volume",
-        }
+@with_db
+async def get_stock_data(stock_code: str, fromdate: datetime, todate: datetime) -> pd.DataFrame:
+    """数据获取与预处理函数"""
+    start, end = _exclusive_range(fromdate, todate)
+    bars = (await fetch_daily_bars([stock_code], start, end))[stock_code]
+
+    parse_df = pd.DataFrame(
+        {
+            "Open": bars["open"],
+            "High": bars["high"],
+            "Low": bars["low"],
+            "Close": bars["close"],
+            "Volume": bars["volume"],
+        },
+        index=pd.DatetimeIndex(bars["date"], name="trade_date"),
     )
-    parse_df = parse_df[["Open", "High", "Low", "Close", "Volume"]]
-
-    parse_df.sort_index(ascending=True, inplace=True)
 
     return parse_df
 
@@ -94,20 +98,8 @@ async def get_previous_trading_day(date=None):
     if date is None:
         date = datetime.today()
 
-    previous_day = date
-
-    while True:
-        previous_day -= timedelta(days=1)
-        weekday = previous_day.weekday()  # weekday() 返回0-6，代表周一到周日
-
-        # 跳过周末
-        if weekday in (5, 6):
-            continue
-
-        # 检查是否为节假日
-        holiday = await Holiday.get_or_none(date=previous_day.date())
-        if holiday is None:
-            return previous_day.strftime("%Y-%m-%d")
+    calendar = await get_trading_calendar()
+    return calendar.prev_trading_day(date).strftime("%Y-%m-%d")
 
 
 def send_email(subject: str, body: str, to_email: str = ""):